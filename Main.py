@@ -6,35 +6,70 @@ Combina os módulos:
     - Distribuição Temporal - Método Huff
 """
 
+import argparse
+import asyncio
+import cProfile
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+import urllib.parse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from http import HTTPStatus
+
 import pandas as pd
 import numpy as np
-import geopandas as gpd
-from shapely.geometry import Point
+
+# geopandas e shapely são importados apenas quando uma isozona é consultada
+# (ver LocalizadorIsozonas), para que a Distribuição Temporal não pague
+# o custo dessas bibliotecas.
 
 
 # =============================================================================
 # CONFIGURAÇÃO DE CAMINHOS
 # =============================================================================
-CSV_COEFICIENTES = (
-    r"C:\Users\joser\projects\Codes\Python\Trabalho Qgis Areas"
-    r"\Dados de entrada\isozonas_coeficientes.csv"
-)
-CSV_PRECIPITACAO = (
-    r"C:\Users\joser\projects\Codes\Python\Trabalho Qgis Areas"
-    r"\Dados de entrada\precipitacao-teste.csv"
-)
-SHAPEFILE_PATH = (
-    r"C:\Users\joser\projects\Codes\Python\Trabalho Qgis Areas"
-    r"\Dados de entrada\Shapefile\Isozonas_GrausDecimais.shp"
-)
-CSV_HUFF_ENTRADA = (
-    r"C:\Users\joser\projects\Codes\Python\Trabalho Qgis Areas"
-    r"\Dados de saída\precipitacao_zona_E.csv"
-)
-CSV_HUFF_SAIDA = (
-    r"C:\Users\joser\projects\Codes\Python\Trabalho Qgis Areas"
-    r"\Dados de Saída\precipitacao_huff_saida.csv"
-)
+# Caminhos padrão, relativos à pasta deste script. Podem ser alterados por
+# configurar_caminhos() ou pelas opções --coeficientes, --precipitacao e
+# --shapefile da linha de comando.
+DIRETORIO_BASE = os.path.dirname(os.path.abspath(__file__))
+DIRETORIO_ENTRADA = os.path.join(DIRETORIO_BASE, "Dados de entrada")
+DIRETORIO_SAIDA = os.path.join(DIRETORIO_BASE, "Dados de saída")
+# Saídas geradas pelo subcomando 'atualizar' (fora de DIRETORIO_SAIDA, que
+# guarda as tabelas de referência usadas pelo benchmark)
+DIRETORIO_SAIDA_INCREMENTAL = os.path.join(DIRETORIO_BASE, "Dados de saída incremental")
+# Arquivos intermediários recriáveis (cache compilado das isozonas)
+DIRETORIO_CACHE = os.path.join(DIRETORIO_BASE, ".cache")
+
+CSV_COEFICIENTES = os.path.join(DIRETORIO_ENTRADA, "isozonas_coeficientes.csv")
+CSV_PRECIPITACAO = os.path.join(DIRETORIO_ENTRADA, "precipitacao-teste.csv")
+SHAPEFILE_PATH = os.path.join(DIRETORIO_ENTRADA, "Shapefile", "Isozonas_GrausDecimais.shp")
+CSV_HUFF_ENTRADA = os.path.join(DIRETORIO_SAIDA, "precipitacao_zona_E.csv")
+CSV_HUFF_SAIDA = os.path.join(DIRETORIO_SAIDA, "precipitacao_huff_saida.csv")
+
+
+def configurar_caminhos(
+    coeficientes: str = None, precipitacao: str = None, shapefile: str = None,
+    huff_entrada: str = None, huff_saida: str = None
+) -> None:
+    """
+    Altera os caminhos padrão dos arquivos de entrada e saída.
+
+    Argumentos omitidos (None) mantêm o caminho atual.
+    """
+    global CSV_COEFICIENTES, CSV_PRECIPITACAO, SHAPEFILE_PATH
+    global CSV_HUFF_ENTRADA, CSV_HUFF_SAIDA
+    CSV_COEFICIENTES = coeficientes or CSV_COEFICIENTES
+    CSV_PRECIPITACAO = precipitacao or CSV_PRECIPITACAO
+    SHAPEFILE_PATH = shapefile or SHAPEFILE_PATH
+    CSV_HUFF_ENTRADA = huff_entrada or CSV_HUFF_ENTRADA
+    CSV_HUFF_SAIDA = huff_saida or CSV_HUFF_SAIDA
+
+
 # =============================================================================
 """
 O CSV de precipitação deve conter apenas 2 colunas:
@@ -52,14 +87,573 @@ DURACOES_HORAS = [
     1, 2, 3, 4, 6, 8, 10, 12, 18, 24
 ]
 
+# Conversão da chuva máxima de 1 dia para a de 24 horas
+FATOR_1DIA_24H = 1.14
+
+# =============================================================================
+# INSTRUMENTAÇÃO (opcional)
+# =============================================================================
+"""
+Medição de tempo, número de chamadas, linhas processadas e pico de memória
+de cada etapa. Desativada por padrão; ative com:
+    - variável de ambiente PRECIP_PERFIL=relatorio.json, ou
+    - python Main.py --perfil relatorio.json ...
+O relatório JSON também é um trace do Chrome (abrir em chrome://tracing
+ou ui.perfetto.dev). Para o cProfile, use PRECIP_CPROFILE=saida.prof
+ou --cprofile saida.prof.
+
+Etapas podem rodar em várias threads ao mesmo tempo (ex: pool do
+serviço): cada thread tem a sua pilha de etapas. O pico de memória do
+tracemalloc, porém, é do processo inteiro: enquanto houver etapas em
+outras threads ele não é zerado, e o pico de uma etapa inclui a memória
+alocada pelas etapas simultâneas.
+"""
+_PERFIL = {
+    'ativo': False,
+    'etapas': {},
+    'eventos': [],
+    'ativas': 0,
+    'inicio': time.perf_counter(),
+}
+# Protege _PERFIL entre threads; a pilha de etapas é própria de cada thread
+_TRAVA_PERFIL = threading.Lock()
+_PILHAS_PERFIL = threading.local()
+
+
+def ativar_perfil(ativo: bool = True) -> None:
+    """Ativa (ou desativa) a instrumentação das etapas e zera as medições."""
+    _PERFIL.update(ativo=ativo, etapas={}, eventos=[], ativas=0, inicio=time.perf_counter())
+    if ativo and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not ativo and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _pilha_etapas() -> list:
+    """Pilha das etapas em andamento na thread atual."""
+    pilha = getattr(_PILHAS_PERFIL, 'pilha', None)
+    if pilha is None:
+        pilha = _PILHAS_PERFIL.pilha = []
+    return pilha
+
+
+def _contar_linhas(resultado, args: tuple) -> int | None:
+    """Número de linhas do resultado (ou do primeiro argumento tabular)."""
+    for objeto in (resultado, *args[:2]):
+        if isinstance(objeto, (pd.DataFrame, np.ndarray)):
+            return len(objeto)
+        if isinstance(objeto, TabelaIDF):
+            return len(objeto.valores)
+    return None
+
+
+def medir_etapa(nome: str):
+    """
+    Decorador que registra uma etapa do processamento quando o perfil está ativo.
+
+    Com o perfil desativado, apenas repassa a chamada.
+
+    Argumentos:
+        nome: Nome da etapa no relatório.
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            if not _PERFIL['ativo']:
+                return funcao(*args, **kwargs)
+
+            # O pico de memória é global no tracemalloc: ao entrar em uma
+            # etapa aninhada, o pico acumulado até aqui é guardado na etapa
+            # externa antes de ser zerado. Com etapas em andamento em outras
+            # threads, o pico não é zerado (ver o texto da seção).
+            pilha = _pilha_etapas()
+            with _TRAVA_PERFIL:
+                if pilha:
+                    pilha[-1]['pico'] = max(pilha[-1]['pico'], tracemalloc.get_traced_memory()[1])
+                if _PERFIL['ativas'] == len(pilha):
+                    tracemalloc.reset_peak()
+                _PERFIL['ativas'] += 1
+            quadro = {'pico': 0, 'memoria_inicial': tracemalloc.get_traced_memory()[0]}
+            pilha.append(quadro)
+            inicio = time.perf_counter()
+            try:
+                resultado = funcao(*args, **kwargs)
+            finally:
+                duracao = time.perf_counter() - inicio
+                pilha.pop()
+                with _TRAVA_PERFIL:
+                    _PERFIL['ativas'] = max(_PERFIL['ativas'] - 1, 0)
+                pico = max(quadro['pico'], tracemalloc.get_traced_memory()[1])
+                if pilha:
+                    pilha[-1]['pico'] = max(pilha[-1]['pico'], pico)
+                pico_etapa = max(pico - quadro['memoria_inicial'], 0)
+
+            linhas = _contar_linhas(resultado, args)
+            with _TRAVA_PERFIL:
+                etapa = _PERFIL['etapas'].setdefault(nome, {
+                    'chamadas': 0, 'tempo_total_s': 0.0, 'tempo_max_s': 0.0,
+                    'linhas': 0, 'pico_memoria_bytes': 0,
+                })
+                etapa['chamadas'] += 1
+                etapa['tempo_total_s'] += duracao
+                etapa['tempo_max_s'] = max(etapa['tempo_max_s'], duracao)
+                etapa['linhas'] += linhas or 0
+                etapa['pico_memoria_bytes'] = max(etapa['pico_memoria_bytes'], pico_etapa)
+                _PERFIL['eventos'].append({
+                    'name': nome, 'cat': 'etapa', 'ph': 'X',
+                    'ts': (inicio - _PERFIL['inicio']) * 1e6, 'dur': duracao * 1e6,
+                    'pid': os.getpid(), 'tid': threading.get_ident(),
+                    'args': {'linhas': linhas, 'pico_memoria_bytes': pico_etapa},
+                })
+            return resultado
+        return envoltorio
+    return decorador
+
+
+def relatorio_perfil() -> dict:
+    """
+    Retorna o relatório das etapas medidas.
+
+    Retornos:
+        Dicionário com 'etapas' (totais por etapa) e 'traceEvents'
+        (eventos no formato de trace do Chrome).
+    """
+    return {
+        'tempo_total_s': time.perf_counter() - _PERFIL['inicio'],
+        'etapas': _PERFIL['etapas'],
+        'traceEvents': _PERFIL['eventos'],
+        'displayTimeUnit': 'ms',
+    }
+
+
+def gravar_relatorio_perfil(caminho: str) -> None:
+    """Grava o relatório de perfil em JSON (também legível como trace do Chrome)."""
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio_perfil(), arquivo, indent=1, default=str)
+
+
+def exibir_relatorio_perfil() -> None:
+    """Exibe o resumo das etapas medidas no console."""
+    etapas = sorted(
+        _PERFIL['etapas'].items(), key=lambda item: item[1]['tempo_total_s'], reverse=True
+    )
+    print("\n" + "=" * 70)
+    print("   PERFIL DE EXECUÇÃO")
+    print("=" * 70)
+    print(f"{'Etapa':<28}{'Chamadas':>10}{'Tempo (s)':>12}{'Linhas':>10}{'Pico (MB)':>10}")
+    print("-" * 70)
+    for nome, etapa in etapas:
+        print(
+            f"{nome:<28}{etapa['chamadas']:>10}{etapa['tempo_total_s']:>12.4f}"
+            f"{etapa['linhas']:>10}{etapa['pico_memoria_bytes'] / 2**20:>10.1f}"
+        )
+    print("=" * 70)
+
+
+if os.environ.get('PRECIP_PERFIL'):
+    ativar_perfil()
+
+
 # =============================================================================
 # Cálculo de Precipitação por Isozonas
 # =============================================================================
 
+EXTENSOES_SHAPEFILE = ('.shp', '.shx', '.dbf', '.prj', '.cpg')
+# Cache compilado das geometrias (ver compilar_cache_isozonas)
+SUFIXO_CACHE_ISOZONAS = '.geometrias.npz'
+VERSAO_CACHE_ISOZONAS = 1
+
+
+def calcular_hash_shapefile(caminho_shapefile: str = None) -> str:
+    """
+    Calcula o hash (sha256) do conteúdo dos arquivos do shapefile.
+
+    Argumentos:
+        caminho_shapefile: Caminho do .shp (padrão: SHAPEFILE_PATH).
+
+    Retornos:
+        Hash hexadecimal.
+    """
+    h = hashlib.sha256()
+    _atualizar_hash_arquivos(h, _arquivos_shapefile(caminho_shapefile or SHAPEFILE_PATH))
+    return h.hexdigest()
+
+
+def _arquivos_shapefile(caminho_shapefile: str) -> list[str]:
+    """Arquivos existentes que compõem o shapefile (.shp, .shx, .dbf, ...)."""
+    base = os.path.splitext(caminho_shapefile)[0]
+    return [base + ext for ext in EXTENSOES_SHAPEFILE if os.path.exists(base + ext)]
+
+
+def _atualizar_hash_arquivos(h, caminhos) -> None:
+    """Acrescenta o conteúdo dos arquivos ao hash h."""
+    for caminho in caminhos:
+        with open(caminho, 'rb') as f:
+            for bloco in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloco)
+
+
+def caminho_cache_isozonas(caminho_shapefile: str = None) -> str:
+    """Caminho padrão do cache compilado: DIRETORIO_CACHE/<nome>.geometrias.npz."""
+    nome = os.path.splitext(os.path.basename(caminho_shapefile or SHAPEFILE_PATH))[0]
+    return os.path.join(DIRETORIO_CACHE, nome + SUFIXO_CACHE_ISOZONAS)
+
+
+def _ler_shapefile(caminho_shapefile: str) -> tuple[np.ndarray, np.ndarray]:
+    """Lê o shapefile com geopandas e reprojeta para EPSG:4326."""
+    import geopandas as gpd
+
+    gdf = gpd.read_file(caminho_shapefile)
+    if gdf.crs is not None and gdf.crs != "EPSG:4326":
+        gdf = gdf.to_crs("EPSG:4326")
+    return gdf['ZONA'].to_numpy(), gdf.geometry.to_numpy()
+
+
+@medir_etapa('compilar_cache_isozonas')
+def compilar_cache_isozonas(
+    caminho_shapefile: str = None, caminho_cache: str = None, hash_shapefile: str = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Converte o shapefile em um cache binário (.npz), lido sem geopandas.
+
+    O cache guarda as geometrias já em EPSG:4326 como WKB concatenado
+    (bytes + deslocamentos), as zonas, os retângulos envolventes e o hash
+    do shapefile de origem. A STRtree não é serializável; ela é
+    reconstruída na leitura, o que leva microssegundos para as isozonas.
+
+    Argumentos:
+        caminho_shapefile: Caminho do .shp (padrão: SHAPEFILE_PATH).
+        caminho_cache: Arquivo de saída (padrão: caminho_cache_isozonas).
+        hash_shapefile: Hash já calculado do shapefile (opcional).
+
+    Retornos:
+        Tupla (zonas, geometrias) lidas do shapefile. Se o cache não puder
+        ser gravado (ex: diretório somente leitura), apenas as retorna.
+    """
+    import shapely
+
+    caminho_shapefile = caminho_shapefile or SHAPEFILE_PATH
+    caminho_cache = caminho_cache or caminho_cache_isozonas(caminho_shapefile)
+    hash_shapefile = hash_shapefile or calcular_hash_shapefile(caminho_shapefile)
+    zonas, geometrias = _ler_shapefile(caminho_shapefile)
+
+    wkb = shapely.to_wkb(geometrias)
+    deslocamentos = np.zeros(len(wkb) + 1, dtype=np.int64)
+    deslocamentos[1:] = np.cumsum([len(g) for g in wkb])
+    try:
+        os.makedirs(os.path.dirname(caminho_cache) or '.', exist_ok=True)
+        temporario = caminho_cache + '.tmp'
+        with open(temporario, 'wb') as f:
+            np.savez(
+                f,
+                versao=np.array(VERSAO_CACHE_ISOZONAS),
+                hash_shapefile=np.array(hash_shapefile),
+                zonas=np.array([str(z) for z in zonas]),
+                wkb=np.frombuffer(b''.join(wkb), dtype=np.uint8),
+                deslocamentos=deslocamentos,
+                limites=shapely.bounds(geometrias),
+            )
+        os.replace(temporario, caminho_cache)
+    except OSError:
+        pass
+    return zonas, geometrias
+
+
+def _ler_cache_isozonas(caminho_cache: str, hash_shapefile: str) -> tuple[np.ndarray, np.ndarray] | None:
+    """Lê o cache compilado; None se ausente, inválido ou de outro shapefile."""
+    import shapely
+
+    try:
+        with np.load(caminho_cache, allow_pickle=False) as dados:
+            if (int(dados['versao']) != VERSAO_CACHE_ISOZONAS
+                    or str(dados['hash_shapefile']) != hash_shapefile):
+                return None
+            wkb = dados['wkb'].tobytes()
+            deslocamentos = dados['deslocamentos']
+            zonas = dados['zonas'].astype(object)
+    except (OSError, KeyError, ValueError):
+        return None
+    geometrias = shapely.from_wkb(
+        [wkb[a:b] for a, b in zip(deslocamentos[:-1], deslocamentos[1:])]
+    )
+    return zonas, geometrias
+
+
+class LocalizadorIsozonas:
+    """
+    Localizador de isozonas com o shapefile carregado uma única vez.
+
+    As geometrias, em EPSG:4326, vêm do cache compilado (compilar_cache_isozonas),
+    que é validado pelo hash do shapefile e recompilado quando ele muda;
+    sem cache válido, o shapefile é lido com geopandas. As geometrias são
+    preparadas e indexadas em uma STRtree, de modo que cada consulta de
+    ponto avalia apenas os polígonos candidatos.
+
+    Argumentos:
+        caminho_shapefile: Caminho do shapefile das isozonas.
+        caminho_cache: Cache compilado (padrão: caminho_cache_isozonas).
+        usar_cache: Se False, sempre lê o shapefile com geopandas.
+    """
+
+    @medir_etapa('carregar_shapefile')
+    def __init__(self, caminho_shapefile: str = None, caminho_cache: str = None, usar_cache: bool = True):
+        import shapely
+
+        self.caminho_shapefile = caminho_shapefile or SHAPEFILE_PATH
+        inicio = time.perf_counter()
+        dados = None
+        self.origem = 'shapefile'
+        if usar_cache:
+            caminho_cache = caminho_cache or caminho_cache_isozonas(self.caminho_shapefile)
+            hash_shapefile = calcular_hash_shapefile(self.caminho_shapefile)
+            dados = _ler_cache_isozonas(caminho_cache, hash_shapefile)
+            if dados is None:
+                dados = compilar_cache_isozonas(self.caminho_shapefile, caminho_cache, hash_shapefile)
+            else:
+                self.origem = 'cache'
+        else:
+            dados = _ler_shapefile(self.caminho_shapefile)
+        self.zonas, self.geometrias = dados
+        self.limites = shapely.bounds(self.geometrias)
+        shapely.prepare(self.geometrias)
+        self.arvore = shapely.STRtree(self.geometrias)
+        self.tempo_carga = time.perf_counter() - inicio
+        self.consultas = 0
+        self.tempo_consultas = 0.0
+
+    @property
+    def extensao(self) -> tuple[float, float, float, float]:
+        """Retângulo envolvente de todas as isozonas (lon_min, lat_min, lon_max, lat_max)."""
+        return (
+            float(self.limites[:, 0].min()), float(self.limites[:, 1].min()),
+            float(self.limites[:, 2].max()), float(self.limites[:, 3].max()),
+        )
+
+    @functools.cached_property
+    def gdf(self):
+        """GeoDataFrame (ZONA, geometry) das isozonas, montado sob demanda."""
+        import geopandas as gpd
+
+        return gpd.GeoDataFrame({'ZONA': self.zonas}, geometry=self.geometrias, crs="EPSG:4326")
+
+    def consultar(self, lat: float, lon: float) -> str | None:
+        """
+        Retorna a zona que contém a coordenada.
+
+        Em caso de polígonos sobrepostos, prevalece o primeiro na ordem
+        do shapefile, como na leitura sequencial original.
+
+        Argumentos:
+            lat: Latitude da coordenada em graus decimais.
+            lon: Longitude da coordenada em graus decimais.
+
+        Retornos:
+            Nome da zona ou None se a coordenada estiver fora das isozonas.
+        """
+        import shapely
+
+        inicio = time.perf_counter()
+        candidatos = self.arvore.query(shapely.Point(lon, lat), predicate='within')
+        self.consultas += 1
+        self.tempo_consultas += time.perf_counter() - inicio
+        if len(candidatos) == 0:
+            return None
+        return self.zonas[candidatos.min()]
+
+    @medir_etapa('consultar_isozonas_lote')
+    def consultar_lote(self, lats, lons) -> pd.DataFrame:
+        """
+        Resolve a zona de muitas coordenadas com uma única consulta à STRtree.
+
+        Cada ponto é classificado em:
+            - 'dentro': no interior de um polígono (ZONA preenchida);
+            - 'fronteira': sobre a borda de um ou mais polígonos. ZONA só é
+              preenchida se todos os polígonos tocados forem da mesma zona;
+            - 'fora': fora de todas as isozonas (ou coordenada inválida).
+
+        Argumentos:
+            lats: Sequência de latitudes em graus decimais.
+            lons: Sequência de longitudes em graus decimais.
+
+        Retornos:
+            DataFrame (um registro por ponto, na ordem de entrada) com as
+            colunas ZONA, situacao_isozona e zonas_candidatas.
+        """
+        import shapely
+
+        inicio = time.perf_counter()
+        pontos = shapely.points(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float))
+        n = len(pontos)
+        idx_ponto, idx_poligono = self.arvore.query(pontos, predicate='intersects')
+        na_borda = shapely.touches(pontos[idx_ponto], self.geometrias[idx_poligono])
+
+        zona = np.full(n, None, dtype=object)
+        situacao = np.full(n, 'fora', dtype=object)
+        candidatas = np.full(n, '', dtype=object)
+
+        # Interior: vale o primeiro polígono na ordem do shapefile
+        interior = pd.DataFrame({
+            'ponto': idx_ponto[~na_borda], 'poligono': idx_poligono[~na_borda]
+        }).groupby('ponto')['poligono'].min()
+        zona[interior.index.to_numpy()] = self.zonas[interior.to_numpy()]
+        situacao[interior.index.to_numpy()] = 'dentro'
+
+        # Borda: pontos sem nenhum polígono que os contenha no interior
+        borda = pd.DataFrame({
+            'ponto': idx_ponto[na_borda], 'zona': self.zonas[idx_poligono[na_borda]]
+        })
+        borda = borda[~borda['ponto'].isin(interior.index)]
+        if not borda.empty:
+            zonas_borda = borda.groupby('ponto')['zona'].agg(
+                lambda z: ';'.join(sorted(set(z)))
+            )
+            idx = zonas_borda.index.to_numpy()
+            situacao[idx] = 'fronteira'
+            candidatas[idx] = zonas_borda.to_numpy()
+            unica = ~zonas_borda.str.contains(';').to_numpy()
+            zona[idx[unica]] = zonas_borda.to_numpy()[unica]
+
+        candidatas[situacao == 'dentro'] = zona[situacao == 'dentro']
+        self.consultas += n
+        self.tempo_consultas += time.perf_counter() - inicio
+        return pd.DataFrame({
+            'ZONA': pd.Series(zona, dtype=object),
+            'situacao_isozona': situacao,
+            'zonas_candidatas': candidatas,
+        })
+
+    @medir_etapa('rasterizar_isozonas')
+    def rasterizar(self, lats, lons, linhas_por_bloco: int = 64) -> np.ndarray:
+        """
+        Resolve a zona do centro de cada célula de uma grade regular.
+
+        A grade é percorrida em blocos de linhas; cada bloco é consultado
+        de uma vez na STRtree ('within'). Como em consultar, prevalece o
+        primeiro polígono na ordem do shapefile.
+
+        Argumentos:
+            lats: Latitudes dos centros das linhas da grade, forma (n_lat,).
+            lons: Longitudes dos centros das colunas da grade, forma (n_lon,).
+            linhas_por_bloco: Número de linhas da grade por consulta.
+
+        Retornos:
+            Array (n_lat, n_lon) com o índice do polígono em self.zonas,
+            ou -1 para células fora das isozonas.
+        """
+        import shapely
+
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        n_lon = len(lons)
+        sem_poligono = len(self.geometrias)
+        indices = np.full((len(lats), n_lon), sem_poligono, dtype=np.int32)
+        for inicio in range(0, len(lats), linhas_por_bloco):
+            bloco_lats = lats[inicio:inicio + linhas_por_bloco]
+            pontos = shapely.points(
+                np.tile(lons, len(bloco_lats)), np.repeat(bloco_lats, n_lon)
+            )
+            idx_ponto, idx_poligono = self.arvore.query(pontos, predicate='within')
+            bloco = indices[inicio:inicio + len(bloco_lats)].reshape(-1)
+            np.minimum.at(bloco, idx_ponto, idx_poligono.astype(np.int32))
+        indices[indices == sem_poligono] = -1
+        return indices
+
+    @functools.cached_property
+    def _geometrias_validas(self) -> np.ndarray:
+        """Geometrias corrigidas (make_valid) para as operações de sobreposição."""
+        import shapely
+
+        return shapely.make_valid(self.geometrias)
+
+    @medir_etapa('sobrepor_isozonas')
+    def sobrepor(self, poligonos) -> pd.DataFrame:
+        """
+        Intersecta muitos polígonos (ex: bacias) com as isozonas de uma vez.
+
+        Os pares candidatos vêm de uma única consulta à STRtree; as
+        interseções são calculadas em lote e as áreas medidas em projeção de
+        áreas iguais (ver areas_km2).
+
+        Argumentos:
+            poligonos: Sequência de polígonos em EPSG:4326.
+
+        Retornos:
+            DataFrame com uma linha por par (polígono, zona) com área de
+            interseção positiva: poligono (posição na entrada), ZONA e area_km2.
+        """
+        import shapely
+
+        poligonos = shapely.make_valid(np.asarray(poligonos, dtype=object))
+        idx_poligono, idx_zona = self.arvore.query(poligonos, predicate='intersects')
+        intersecoes = shapely.intersection(
+            poligonos[idx_poligono], self._geometrias_validas[idx_zona]
+        )
+        pares = pd.DataFrame({
+            'poligono': idx_poligono,
+            'ZONA': self.zonas[idx_zona],
+            'area_km2': areas_km2(intersecoes),
+        })
+        pares = pares.groupby(['poligono', 'ZONA'], as_index=False, sort=True)['area_km2'].sum()
+        return pares[pares['area_km2'] > 0].reset_index(drop=True)
+
+    def estatisticas(self) -> dict:
+        """Retorna tempo de carga, número de consultas e tempo médio por consulta."""
+        return {
+            'caminho_shapefile': self.caminho_shapefile,
+            'origem': self.origem,
+            'poligonos': len(self.geometrias),
+            'tempo_carga_s': self.tempo_carga,
+            'consultas': self.consultas,
+            'tempo_medio_consulta_s': (
+                self.tempo_consultas / self.consultas if self.consultas else 0.0
+            ),
+        }
+
+
+# Localizadores já carregados, por caminho do shapefile
+_LOCALIZADORES: dict[str, LocalizadorIsozonas] = {}
+_CACHE_LOCALIZADOR = {'acertos': 0, 'falhas': 0}
+
+
+def obter_localizador(caminho_shapefile: str = None) -> LocalizadorIsozonas:
+    """
+    Retorna o localizador do shapefile, carregando-o apenas na primeira chamada.
+
+    Argumentos:
+        caminho_shapefile: Caminho do shapefile (padrão: SHAPEFILE_PATH).
+
+    Retornos:
+        LocalizadorIsozonas reaproveitado entre chamadas.
+    """
+    caminho = caminho_shapefile or SHAPEFILE_PATH
+    localizador = _LOCALIZADORES.get(caminho)
+    if localizador is None:
+        _CACHE_LOCALIZADOR['falhas'] += 1
+        localizador = LocalizadorIsozonas(caminho)
+        _LOCALIZADORES[caminho] = localizador
+    else:
+        _CACHE_LOCALIZADOR['acertos'] += 1
+    return localizador
+
+
+def estatisticas_localizador() -> dict:
+    """
+    Retorna acertos/falhas do cache de shapefiles e as estatísticas
+    de carga e consulta de cada localizador carregado.
+    """
+    return {
+        'acertos_cache': _CACHE_LOCALIZADOR['acertos'],
+        'falhas_cache': _CACHE_LOCALIZADOR['falhas'],
+        'localizadores': [loc.estatisticas() for loc in _LOCALIZADORES.values()],
+    }
+
+
+@medir_etapa('get_isozona')
 def get_isozona(lat: float, lon: float) -> str | None:
     """
-    Carrega o shapefile e retorna a zona correspondente à coordenada.
-    Shapefile = arquivo que contém informações geográficas.
+    Retorna a zona correspondente à coordenada.
+    O shapefile é carregado e indexado apenas na primeira chamada
+    (ver obter_localizador).
 
     Argumentos:
         lat: Latitude da coordenada em graus decimais.
@@ -68,14 +662,74 @@ def get_isozona(lat: float, lon: float) -> str | None:
     Retornos:
         Nome da zona ou None se a coordenada estiver fora das isozonas.
     """
-    gdf = gpd.read_file(SHAPEFILE_PATH)
-    ponto = gpd.GeoSeries([Point(lon, lat)], crs="EPSG:4326")
-    ponto = ponto.to_crs(gdf.crs).iloc[0]
-    
-    for _, row in gdf.iterrows():
-        if row.geometry.contains(ponto):
-            return row['ZONA']
-    return None
+    return obter_localizador().consultar(lat, lon)
+
+
+def _encontrar_coluna(df: pd.DataFrame, nomes: tuple) -> str | None:
+    """Retorna a primeira coluna cujo nome (sem caixa/espaços) está em nomes."""
+    return next((col for col in df.columns if str(col).lower().strip() in nomes), None)
+
+
+def ler_tabela_sitios(caminho: str) -> pd.DataFrame:
+    """
+    Lê uma tabela de sítios em CSV (separador , ou ;) ou Parquet.
+
+    Argumentos:
+        caminho: Caminho do arquivo (.csv, .parquet ou .pq).
+
+    Retornos:
+        DataFrame com os sítios.
+    """
+    if caminho.lower().endswith(('.parquet', '.pq')):
+        return pd.read_parquet(caminho)
+    with open(caminho, encoding='utf-8-sig') as arquivo:
+        cabecalho = arquivo.readline()
+    sep = ';' if ';' in cabecalho else ','
+    return pd.read_csv(caminho, sep=sep, encoding='utf-8-sig')
+
+
+@medir_etapa('gravar_tabela_sitios')
+def gravar_tabela_sitios(df: pd.DataFrame, caminho: str) -> None:
+    """Grava a tabela de sítios em Parquet ou CSV (;), conforme a extensão."""
+    if caminho.lower().endswith(('.parquet', '.pq')):
+        df.to_parquet(caminho, index=False)
+    else:
+        df.to_csv(caminho, index=False, sep=';', decimal='.')
+
+
+@medir_etapa('resolver_isozonas_lote')
+def resolver_isozonas_lote(df_sitios: pd.DataFrame) -> pd.DataFrame:
+    """
+    Atribui a isozona a cada sítio de uma tabela com latitude/longitude.
+
+    As colunas de coordenadas são detectadas pelo nome
+    (lat/latitude e lon/long/longitude). As demais colunas
+    (ex: identificador do sítio) são preservadas.
+
+    Argumentos:
+        df_sitios: DataFrame com os sítios.
+
+    Retornos:
+        Cópia do DataFrame com as colunas ZONA, situacao_isozona
+        ('dentro', 'fronteira' ou 'fora') e zonas_candidatas.
+
+    Exceções:
+        ValueError: Se as colunas de latitude/longitude não forem encontradas.
+    """
+    col_lat = _encontrar_coluna(df_sitios, ('lat', 'latitude'))
+    col_lon = _encontrar_coluna(df_sitios, ('lon', 'long', 'longitude'))
+    if col_lat is None or col_lon is None:
+        raise ValueError(
+            "Colunas de coordenadas não encontradas. "
+            "Esperadas: lat/latitude e lon/longitude"
+        )
+    lats = pd.to_numeric(df_sitios[col_lat], errors='coerce')
+    lons = pd.to_numeric(df_sitios[col_lon], errors='coerce')
+    zonas = obter_localizador().consultar_lote(lats, lons)
+    resultado = df_sitios.reset_index(drop=True).copy()
+    for col in zonas.columns:
+        resultado[col] = zonas[col].to_numpy()
+    return resultado
 
 
 def validar_csv_precipitacao(df: pd.DataFrame) -> bool:
@@ -107,7 +761,7 @@ def carregar_csv_com_decimal(caminho: str) -> pd.DataFrame:
     """
     df = pd.read_csv(caminho)
     for col in df.columns:
-        if df[col].dtype == 'object' and col != 'isozona':
+        if not pd.api.types.is_numeric_dtype(df[col]) and col != 'isozona':
             try:
                 df[col] = df[col].str.replace(',', '.').astype(float)
             except (ValueError, AttributeError):
@@ -115,6 +769,149 @@ def carregar_csv_com_decimal(caminho: str) -> pd.DataFrame:
     return df
 
 
+class ArmazemCoeficientes:
+    """
+    Tabelas de precipitação e de coeficientes carregadas uma única vez.
+
+    Os dois CSVs são lidos e validados na criação, os nomes das isozonas são
+    normalizados (sem espaços, em maiúsculas) e os dados de cada zona ficam
+    prontos em dicionários: por zona (tabela já combinada com a precipitação)
+    e por (isozona, tempo_retorno) para consulta direta dos coeficientes.
+    Se algum dos arquivos for modificado (mtime), ele é recarregado
+    automaticamente na próxima consulta.
+
+    Argumentos:
+        caminho_precipitacao: CSV de precipitação (padrão: CSV_PRECIPITACAO).
+        caminho_coeficientes: CSV de coeficientes (padrão: CSV_COEFICIENTES).
+    """
+
+    def __init__(self, caminho_precipitacao: str = None, caminho_coeficientes: str = None):
+        self.caminho_precipitacao = caminho_precipitacao or CSV_PRECIPITACAO
+        self.caminho_coeficientes = caminho_coeficientes or CSV_COEFICIENTES
+        self.carregamentos = 0
+        self._mtimes = None
+        self._carregar()
+
+    def _mtimes_atuais(self) -> tuple:
+        return (
+            os.stat(self.caminho_precipitacao).st_mtime_ns,
+            os.stat(self.caminho_coeficientes).st_mtime_ns,
+        )
+
+    @medir_etapa('carregar_csvs')
+    def _carregar(self) -> None:
+        """Lê os dois CSVs e monta os índices por zona."""
+        mtimes = self._mtimes_atuais()
+        df_precip = carregar_csv_com_decimal(self.caminho_precipitacao)
+        df_coef = carregar_csv_com_decimal(self.caminho_coeficientes)
+
+        if not validar_csv_precipitacao(df_precip):
+            raise ValueError(
+                "CSV de precipitação inválido. "
+                "Colunas esperadas: tempo_retorno, precipitacao"
+            )
+
+        df_coef['isozona'] = df_coef['isozona'].astype(str).str.strip().str.upper()
+        colunas_coef = ['tempo_retorno', 'coef_1h_24h', 'coef_6min_24h']
+
+        self.df_precipitacao = df_precip
+        self.df_coeficientes = df_coef
+        self._por_zona = {
+            zona: df_precip.merge(grupo[colunas_coef], on='tempo_retorno', how='left')
+            for zona, grupo in df_coef.groupby('isozona', sort=False)
+        }
+        self._coeficientes = {
+            (zona, int(tr)): (c_1h, c_6min)
+            for zona, tr, c_1h, c_6min in df_coef[['isozona'] + colunas_coef].itertuples(index=False)
+        }
+        self._mtimes = mtimes
+        self.carregamentos += 1
+
+    def _recarregar_se_modificado(self) -> None:
+        if self._mtimes_atuais() != self._mtimes:
+            self._carregar()
+
+    @property
+    def zonas(self) -> list[str]:
+        """Isozonas disponíveis (normalizadas)."""
+        self._recarregar_se_modificado()
+        return list(self._por_zona)
+
+    def dados_zona(self, zona: str) -> pd.DataFrame:
+        """
+        Retorna a precipitação combinada com os coeficientes da zona.
+
+        Argumentos:
+            zona: Nome da isozona (sem distinção de maiúsculas/espaços).
+
+        Retornos:
+            Cópia do DataFrame com precipitação + coeficientes da zona.
+
+        Exceções:
+            ValueError: Se a zona não for encontrada.
+        """
+        self._recarregar_se_modificado()
+        df_zona = self._por_zona.get(zona.strip().upper())
+        if df_zona is None:
+            raise ValueError(
+                f"Zona '{zona}' não encontrada. "
+                f"Zonas: {list(self._por_zona)}"
+            )
+        return df_zona.copy()
+
+    def coeficientes(self, zona: str, tempo_retorno: int) -> tuple[float, float]:
+        """
+        Retorna (coef_1h_24h, coef_6min_24h) da zona e tempo de retorno.
+
+        Exceções:
+            KeyError: Se a combinação não existir no CSV de coeficientes.
+        """
+        self._recarregar_se_modificado()
+        return self._coeficientes[(zona.strip().upper(), int(tempo_retorno))]
+
+    def matriz_coeficientes(self, zonas, tempos_retorno) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Retorna os coeficientes de várias zonas e tempos de retorno em arrays.
+
+        Retornos:
+            Tupla (coef_1h_24h, coef_6min_24h), cada um com forma
+            (n_zonas, n_tr); combinações ausentes ficam NaN.
+        """
+        self._recarregar_se_modificado()
+        c_1h = np.full((len(zonas), len(tempos_retorno)), np.nan)
+        c_6min = np.full_like(c_1h, np.nan)
+        for i, zona in enumerate(zonas):
+            chave_zona = str(zona).strip().upper()
+            for j, tr in enumerate(tempos_retorno):
+                c_1h[i, j], c_6min[i, j] = self._coeficientes.get(
+                    (chave_zona, int(tr)), (np.nan, np.nan)
+                )
+        return c_1h, c_6min
+
+
+# Armazéns já carregados, por par de caminhos (precipitação, coeficientes)
+_ARMAZENS: dict[tuple[str, str], ArmazemCoeficientes] = {}
+
+
+def obter_armazem(
+    caminho_precipitacao: str = None, caminho_coeficientes: str = None
+) -> ArmazemCoeficientes:
+    """
+    Retorna o armazém dos CSVs, lendo-os do disco apenas na primeira chamada
+    (ou quando algum arquivo for modificado).
+    """
+    chave = (
+        caminho_precipitacao or CSV_PRECIPITACAO,
+        caminho_coeficientes or CSV_COEFICIENTES,
+    )
+    armazem = _ARMAZENS.get(chave)
+    if armazem is None:
+        armazem = ArmazemCoeficientes(*chave)
+        _ARMAZENS[chave] = armazem
+    return armazem
+
+
+@medir_etapa('carregar_dados')
 def carregar_dados(zona: str) -> pd.DataFrame:
     """
     Carrega o CSV de precipitação e combina
@@ -122,7 +919,8 @@ def carregar_dados(zona: str) -> pd.DataFrame:
 
     O CSV de precipitação contém apenas tempo_retorno e
     precipitacao. A isozona é usada somente para buscar
-    os coeficientes no CSV de coeficientes.
+    os coeficientes no CSV de coeficientes. Os CSVs são lidos
+    uma única vez por execução (ver ArmazemCoeficientes).
 
     Argumentos:
         zona: Nome da isozona para buscar coeficientes.
@@ -133,36 +931,10 @@ def carregar_dados(zona: str) -> pd.DataFrame:
     Exceções:
         ValueError: Se a zona não for encontrada.
     """
-    df_precip = carregar_csv_com_decimal(CSV_PRECIPITACAO)
-    df_coef = carregar_csv_com_decimal(CSV_COEFICIENTES)
-
-    if not validar_csv_precipitacao(df_precip):
-        raise ValueError(
-            "CSV de precipitação inválido. "
-            "Colunas esperadas: tempo_retorno, precipitacao"
-        )
-
-    zona_upper = zona.strip().upper()
-    df_coef_zona = df_coef[
-        df_coef['isozona'].str.strip().str.upper() == zona_upper
-    ]
-
-    if df_coef_zona.empty:
-        zonas_disponiveis = df_coef['isozona'].unique()
-        raise ValueError(
-            f"Zona '{zona}' não encontrada. "
-            f"Zonas: {list(zonas_disponiveis)}"
-        )
-
-    df_zona = df_precip.merge(
-        df_coef_zona[[
-            'tempo_retorno', 'coef_1h_24h', 'coef_6min_24h'
-        ]],
-        on='tempo_retorno', how='left'
-    )
-    return df_zona
+    return obter_armazem().dados_zona(zona)
 
 
+@medir_etapa('calcular_precipitacao_base')
 def calcular_precipitacao_base(df_zona: pd.DataFrame) -> pd.DataFrame:
     """
     Calcula os valores base de precipitação para 24h, 1h e 6min.
@@ -175,12 +947,34 @@ def calcular_precipitacao_base(df_zona: pd.DataFrame) -> pd.DataFrame:
         DataFrame com as colunas de precipitação calculadas.
     """
     resultado = df_zona.copy()
-    resultado['precip_24h'] = resultado['precipitacao'] * 1.14
-    resultado['precip_1h'] = (resultado['precip_24h'] * resultado['coef_1h_24h']) / 100
-    resultado['precip_6min'] = (resultado['precip_24h'] * resultado['coef_6min_24h']) / 100
+    p_6min, p_1h, p_24h = precipitacoes_base(
+        resultado['precipitacao'], resultado['coef_1h_24h'], resultado['coef_6min_24h']
+    )
+    resultado['precip_24h'] = p_24h
+    resultado['precip_1h'] = p_1h
+    resultado['precip_6min'] = p_6min
     return resultado
 
 
+def precipitacoes_base(precipitacao, coef_1h_24h, coef_6min_24h, fator_24h=FATOR_1DIA_24H) -> tuple:
+    """
+    Aplica as fórmulas das precipitações base a arrays de qualquer forma.
+
+    Argumentos:
+        precipitacao: Chuva máxima de 1 dia (mm).
+        coef_1h_24h: Relação 1h/24h (%).
+        coef_6min_24h: Relação 6min/24h (%).
+        fator_24h: Conversão 1 dia -> 24 h (padrão: FATOR_1DIA_24H).
+
+    Retornos:
+        Tupla (p_6min, p_1h, p_24h), com a forma resultante do broadcasting.
+    """
+    p_24h = precipitacao * fator_24h
+    p_1h = (p_24h * coef_1h_24h) / 100
+    p_6min = (p_24h * coef_6min_24h) / 100
+    return p_6min, p_1h, p_24h
+
+
 def calcular_coeficientes_log(x1: float, y1: float, x2: float, y2: float) -> tuple:
     """
     Calcula coeficientes a e b da equação y = a·ln(x) + b.
@@ -241,38 +1035,292 @@ def formatar_duracao(duracao_h: float) -> str:
     return f"{int(duracao_h)} h"
 
 
-def gerar_tabela(df_base: pd.DataFrame) -> pd.DataFrame:
+def calcular_tabela_idf(
+    p_6min, p_1h, p_24h, duracoes_h=None, dtype=np.float64
+) -> tuple[np.ndarray, list[str]]:
     """
-    Gera tabela com precipitações interpoladas para todas as durações.
+    Calcula a matriz (duração × tempo de retorno) de precipitações interpoladas.
+
+    Equivale a chamar interpolar_precipitacao para cada célula, mas os
+    coeficientes a e b de cada trecho logarítmico (6min–1h e 1h–24h) são
+    calculados uma única vez por tempo de retorno e aplicados a todas as
+    durações por broadcasting.
+
+    Os argumentos de precipitação aceitam qualquer número de dimensões
+    iniciais, o que permite calcular vários sítios de uma vez:
+    (n_tr,) -> (n_duracoes, n_tr); (n_sitios, n_tr) -> (n_sitios, n_duracoes, n_tr).
 
     Argumentos:
-        df_base: DataFrame com precipitações base calculadas.
+        p_6min: Precipitações de 6 minutos (última dimensão = tempos de retorno).
+        p_1h: Precipitações de 1 hora (mesmo formato de p_6min).
+        p_24h: Precipitações de 24 horas (mesmo formato de p_6min).
+        duracoes_h: Durações em horas (padrão: DURACOES_HORAS).
+        dtype: Tipo do array de saída (ex: np.float32 para tabelas grandes).
 
     Retornos:
-        DataFrame com a tabela de precipitações interpoladas.
+        Tupla (valores, rotulos) com a matriz de precipitações e os
+        rótulos das durações formatados (ex: "6 min", "1 h").
     """
-    tabela = []
-    for duracao in DURACOES_HORAS:
-        linha = {'Duração': formatar_duracao(duracao)}
-        for _, row in df_base.iterrows():
-            tr = int(row['tempo_retorno'])
-            precip = interpolar_precipitacao(
-                duracao, row['precip_6min'], row['precip_1h'], row['precip_24h']
-            )
-            linha[f'TR {tr}'] = precip
-        tabela.append(linha)
-    return pd.DataFrame(tabela)
+    if duracoes_h is None:
+        duracoes_h = DURACOES_HORAS
+    duracoes = np.asarray(duracoes_h, dtype=np.float64)
+    p_6min = np.asarray(p_6min, dtype=np.float64)[..., np.newaxis, :]
+    p_1h = np.asarray(p_1h, dtype=np.float64)[..., np.newaxis, :]
+    p_24h = np.asarray(p_24h, dtype=np.float64)[..., np.newaxis, :]
 
+    forma = np.broadcast_shapes(p_6min.shape, p_1h.shape, p_24h.shape)
+    valores = np.empty(forma[:-2] + (len(duracoes), forma[-1]), dtype=dtype)
 
-def exibir_tabela(df_tabela: pd.DataFrame, zona: str, lat: float, lon: float) -> None:
-    """
-    Exibe a tabela de precipitações interpoladas.
+    curta = duracoes < 1
+    for mascara, (x1, y1), (x2, y2) in (
+        (curta, (0.1, p_6min), (1.0, p_1h)),
+        (~curta, (1.0, p_1h), (24.0, p_24h)),
+    ):
+        if not mascara.any():
+            continue
+        a, b = calcular_coeficientes_log(x1, y1, x2, y2)
+        valores[..., mascara, :] = a * np.log(duracoes[mascara])[:, np.newaxis] + b
 
-    Argumentos:
-        df_tabela: DataFrame com a tabela de precipitações.
-        zona: Nome da isozona.
-        lat: Latitude da coordenada.
-        lon: Longitude da coordenada.
+    return valores, [formatar_duracao(d) for d in duracoes]
+
+
+def _encontrar_coluna_duracao(df: pd.DataFrame) -> str | None:
+    """Retorna a coluna de duração de uma tabela no formato de gerar_tabela."""
+    return next((col for col in df.columns if 'dura' in str(col).lower()), None)
+
+
+def interpretar_duracoes(rotulos: pd.Series) -> pd.Series:
+    """
+    Converte rótulos de duração ("6 min", "1 h", ...) em horas.
+
+    Retornos:
+        Série de durações em horas (NaN para rótulos não reconhecidos).
+    """
+    rotulos = rotulos.astype(str).str.strip()
+    minutos = rotulos.str.contains('min')
+    horas = ~minutos & rotulos.str.contains('h')
+    duracoes = pd.Series(np.nan, index=rotulos.index)
+    duracoes[minutos] = rotulos[minutos].str.replace('min', '').astype(int) / 60
+    duracoes[horas] = rotulos[horas].str.replace('h', '').astype(float)
+    return duracoes
+
+
+def _colunas_tempo_retorno(colunas) -> tuple[list[str], list[int]]:
+    """Retorna as colunas "TR <n>" e seus tempos de retorno, na ordem da tabela."""
+    selecionadas, tempos_retorno = [], []
+    for col in colunas:
+        try:
+            tempos_retorno.append(int(str(col).replace('TR', '').strip()))
+        except ValueError:
+            continue
+        selecionadas.append(col)
+    return selecionadas, tempos_retorno
+
+
+def _valores_numericos(df: pd.DataFrame) -> np.ndarray:
+    """Converte as colunas para float, aceitando vírgula decimal."""
+    return df.apply(
+        lambda serie: pd.to_numeric(
+            serie if pd.api.types.is_numeric_dtype(serie)
+            else serie.astype(str).str.replace(',', '.'),
+            errors='coerce'
+        )
+    ).to_numpy(dtype=float)
+
+
+def _remover_colunas_repetidas(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Remove colunas de mesmo nome como faria um dicionário: a coluna fica na
+    posição da primeira ocorrência, com os valores da última.
+    """
+    nomes = df.columns
+    if not nomes.has_duplicates:
+        return df
+    ultima = {nome: i for i, nome in enumerate(nomes)}
+    return df.iloc[:, [ultima[nome] for nome in nomes[~nomes.duplicated(keep='first')]]]
+
+
+@dataclass(frozen=True)
+class TabelaIDF:
+    """
+    Tabela de precipitações (duração × tempo de retorno) em memória.
+
+    É o resultado do Cálculo de Precipitação por Isozonas e a entrada da
+    Distribuição Temporal, sem conversão para texto entre as etapas.
+    A leitura/gravação em CSV fica restrita às bordas (de_dataframe,
+    ler_csv, para_dataframe, gravar_csv).
+
+    Atributos:
+        duracoes_horas: Durações em horas, forma (n_duracoes,).
+        tempos_retorno: Tempos de retorno em anos (inteiros), forma (n_tr,).
+        valores: Precipitações em mm, forma (n_duracoes, n_tr).
+    """
+    duracoes_horas: np.ndarray
+    tempos_retorno: np.ndarray
+    valores: np.ndarray
+
+    @classmethod
+    @medir_etapa('calcular_tabela_idf')
+    def de_precipitacao_base(cls, df_base: pd.DataFrame, duracoes_h=None) -> 'TabelaIDF':
+        """
+        Calcula a tabela a partir das precipitações base (calcular_precipitacao_base).
+
+        Argumentos:
+            df_base: DataFrame com precipitações base calculadas.
+            duracoes_h: Durações em horas (padrão: DURACOES_HORAS).
+        """
+        duracoes = np.asarray(DURACOES_HORAS if duracoes_h is None else duracoes_h, dtype=float)
+        valores, _ = calcular_tabela_idf(
+            df_base['precip_6min'].to_numpy(dtype=float),
+            df_base['precip_1h'].to_numpy(dtype=float),
+            df_base['precip_24h'].to_numpy(dtype=float),
+            duracoes,
+        )
+        return cls(duracoes, df_base['tempo_retorno'].to_numpy().astype(int), valores)
+
+    @classmethod
+    def de_dataframe(cls, df: pd.DataFrame) -> 'TabelaIDF':
+        """
+        Converte uma tabela no formato de gerar_tabela (Duração;TR 2;TR 5;...).
+
+        Linhas com duração não reconhecida e colunas que não sejam "TR <n>"
+        são ignoradas, como em converter_csv_para_huff.
+
+        Exceções:
+            ValueError: Se a coluna 'Duração' não for encontrada.
+        """
+        col_duracao = _encontrar_coluna_duracao(df)
+        if col_duracao is None:
+            raise ValueError("Coluna 'Duração' não encontrada no CSV")
+
+        duracoes = interpretar_duracoes(df[col_duracao])
+        linhas = duracoes.notna().to_numpy()
+        colunas, tempos_retorno = _colunas_tempo_retorno(df.columns)
+        return cls(
+            duracoes[linhas].to_numpy(dtype=float),
+            np.array(tempos_retorno, dtype=int),
+            _valores_numericos(df.loc[linhas, colunas]),
+        )
+
+    @classmethod
+    def ler_csv(cls, caminho: str) -> 'TabelaIDF':
+        """Lê uma tabela salva por gravar_csv (separador ;)."""
+        return cls.de_dataframe(pd.read_csv(caminho, sep=';', decimal='.'))
+
+    def para_dataframe(self) -> pd.DataFrame:
+        """Retorna a tabela no formato de gerar_tabela (Duração;TR 2;TR 5;...)."""
+        colunas = [f'TR {tr}' for tr in self.tempos_retorno]
+        tabela = pd.DataFrame(self.valores, columns=colunas)
+        tabela.insert(0, 'Duração', [formatar_duracao(d) for d in self.duracoes_horas])
+        return _remover_colunas_repetidas(tabela)
+
+    def precipitacao_em(self, duracoes_h) -> np.ndarray:
+        """
+        Precipitação (mm) em durações quaisquer, por interpolação em ln(duração).
+
+        Entre as durações da tabela a precipitação é linear em ln(t), como
+        nas fórmulas de interpolar_precipitacao (o resultado é exato quando
+        a tabela contém 6 min, 1 h e 24 h). Acima da maior duração o último
+        trecho é prolongado; abaixo da menor, a intensidade é mantida
+        constante até zero (P = P_min × t / t_min).
+
+        Argumentos:
+            duracoes_h: Durações em horas (qualquer forma).
+
+        Retornos:
+            Array com forma duracoes_h.shape + (n_tr,).
+        """
+        duracoes = np.asarray(duracoes_h, dtype=float)
+        ordem = np.argsort(self.duracoes_horas)
+        x = np.log(self.duracoes_horas[ordem])
+        y = self.valores[ordem]
+        t = np.maximum(duracoes, 1e-12)[..., np.newaxis]
+        if len(x) == 1:
+            return y[0] * np.minimum(t / self.duracoes_horas[ordem][0], 1.0)
+
+        i = np.clip(np.searchsorted(x, np.log(t[..., 0])) - 1, 0, len(x) - 2)
+        inclinacao = (y[i + 1] - y[i]) / (x[i + 1] - x[i])[..., np.newaxis]
+        valores = y[i] + inclinacao * (np.log(t) - x[i][..., np.newaxis])
+        curta = t < self.duracoes_horas[ordem][0]
+        valores = np.where(curta, y[0] * t / self.duracoes_horas[ordem][0], valores)
+        return np.where(duracoes[..., np.newaxis] > 0, valores, 0.0)
+
+    @medir_etapa('gravar_tabela_idf')
+    def gravar_csv(self, caminho: str) -> None:
+        """Grava a tabela em CSV (separador ;), no formato lido por ler_csv."""
+        self.para_dataframe().to_csv(caminho, index=False, sep=';', decimal='.')
+
+
+@medir_etapa('gerar_tabela')
+def gerar_tabela(df_base: pd.DataFrame) -> pd.DataFrame:
+    """
+    Gera tabela com precipitações interpoladas para todas as durações.
+
+    Argumentos:
+        df_base: DataFrame com precipitações base calculadas.
+
+    Retornos:
+        DataFrame com a tabela de precipitações interpoladas.
+    """
+    return TabelaIDF.de_precipitacao_base(df_base).para_dataframe()
+
+
+def calcular_tabela_zona(zona: str) -> TabelaIDF:
+    """
+    Calcula a tabela de precipitação (IDF) de uma isozona, sem interação.
+
+    Argumentos:
+        zona: Letra da isozona.
+
+    Retornos:
+        TabelaIDF da zona.
+    """
+    df_base = calcular_precipitacao_base(carregar_dados(zona))
+    return TabelaIDF.de_precipitacao_base(df_base)
+
+
+def calcular_precipitacao_coordenada(
+    latitude: float, longitude: float, caminho_estacoes: str = None, k_estacoes: int = 1
+) -> tuple[str, TabelaIDF]:
+    """
+    Identifica a isozona da coordenada e calcula sua tabela de precipitação,
+    sem interação.
+
+    Argumentos:
+        latitude: Latitude do ponto.
+        longitude: Longitude do ponto.
+        caminho_estacoes: CSV de estações; se informado, a precipitação vem
+            da(s) estação(ões) mais próxima(s) em vez de CSV_PRECIPITACAO.
+        k_estacoes: Número de estações da média ponderada (1 = mais próxima).
+
+    Retornos:
+        Tupla (zona, TabelaIDF).
+
+    Exceções:
+        ValueError: Se a coordenada estiver fora das isozonas.
+    """
+    zona = get_isozona(latitude, longitude)
+    if zona is None:
+        raise ValueError(f"Coordenada ({latitude}, {longitude}) está fora das isozonas.")
+    if caminho_estacoes is None:
+        return zona, calcular_tabela_zona(zona)
+
+    estacoes = obter_armazem_estacoes(caminho_estacoes)
+    precipitacoes, _, _ = estacoes.consultar_lote([latitude], [longitude], k_estacoes)
+    duracoes = np.asarray(DURACOES_HORAS, dtype=float)
+    valores = calcular_tabelas_sitios([zona], precipitacoes, estacoes.tempos_retorno, duracoes)
+    return zona, TabelaIDF(duracoes, estacoes.tempos_retorno.copy(), valores[0])
+
+
+def exibir_tabela(df_tabela: pd.DataFrame, zona: str, lat: float, lon: float) -> None:
+    """
+    Exibe a tabela de precipitações interpoladas.
+
+    Argumentos:
+        df_tabela: DataFrame com a tabela de precipitações.
+        zona: Nome da isozona.
+        lat: Latitude da coordenada.
+        lon: Longitude da coordenada.
     """
     separador = "=" * 142
     print(separador)
@@ -296,17 +1344,21 @@ def exibir_tabela(df_tabela: pd.DataFrame, zona: str, lat: float, lon: float) ->
 
 
 def executar_Precipitação_por_Isozonas(
-    salvar_automatico: bool = False, caminho_saida: str = None
-) -> str | None:
+    salvar_automatico: bool = False, caminho_saida: str = None,
+    retornar_tabela: bool = False
+) -> str | TabelaIDF | None:
     """
     Executa o Cálculo de Precipitação por Isozonas.
     
     Argumentos:
         salvar_automatico: Se True, salva o CSV sem perguntar.
         caminho_saida: Caminho opcional para salvar o arquivo.
+        retornar_tabela: Se True, retorna a TabelaIDF calculada em vez
+            do caminho do CSV (para encadear com a Distribuição Temporal).
 
     Retornos:
-        Caminho do arquivo CSV salvo (se salvo) ou None.
+        Caminho do arquivo CSV salvo (se salvo), a TabelaIDF
+        (com retornar_tabela=True) ou None.
     """
     print("\n" + "=" * 70)
     print("   CÁLCULO DE PRECIPITAÇÃO POR ISOZONAS")
@@ -327,29 +1379,29 @@ def executar_Precipitação_por_Isozonas(
     print(f"\nZona identificada: {zona}")
 
     try:
-        df_zona = carregar_dados(zona)
-        df_base = calcular_precipitacao_base(df_zona)
-        df_tabela = gerar_tabela(df_base)
+        tabela = calcular_tabela_zona(zona)
+        df_tabela = tabela.para_dataframe()
         print()
         exibir_tabela(df_tabela, zona, latitude, longitude)
 
         if caminho_saida is None:
-            caminho_saida = (
-                r"C:\Users\joser\projects\Codes\Python\Trabalho Qgis Areas"
-                rf"\Dados de Saída\precipitacao_zona_{zona.upper()}.csv"
+            caminho_saida = os.path.join(
+                DIRETORIO_SAIDA, f"precipitacao_zona_{zona.upper()}.csv"
             )
 
         if salvar_automatico:
-            df_tabela.to_csv(caminho_saida, index=False, sep=';', decimal='.')
+            tabela.gravar_csv(caminho_saida)
             print(f"\nArquivo salvo em: {caminho_saida}")
-            return caminho_saida
+            return tabela if retornar_tabela else caminho_saida
         else:
             print()
             salvar = input("Deseja salvar a tabela como CSV? (s/n): ").strip().lower()
             if salvar in ('s', 'sim', 'y', 'yes'):
-                df_tabela.to_csv(caminho_saida, index=False, sep=';', decimal='.')
+                tabela.gravar_csv(caminho_saida)
                 print(f"\nArquivo salvo em: {caminho_saida}")
-                return caminho_saida
+                return tabela if retornar_tabela else caminho_saida
+            if retornar_tabela:
+                return tabela
 
     except FileNotFoundError as e:
         print(f"Erro: Arquivo não encontrado - {e}")
@@ -359,276 +1411,3226 @@ def executar_Precipitação_por_Isozonas(
     return None
 
 
+def executar_Isozonas_em_Lote(caminho_entrada: str, caminho_saida: str) -> pd.DataFrame | None:
+    """
+    Executa a identificação de isozonas para uma tabela de sítios.
+
+    Argumentos:
+        caminho_entrada: CSV ou Parquet com os sítios (lat/lon).
+        caminho_saida: CSV ou Parquet de saída com a coluna ZONA.
+
+    Retornos:
+        DataFrame com as zonas atribuídas ou None em caso de erro.
+    """
+    print("\n" + "=" * 70)
+    print("   IDENTIFICAÇÃO DE ISOZONAS EM LOTE")
+    print("=" * 70)
+
+    try:
+        inicio = time.perf_counter()
+        df = resolver_isozonas_lote(ler_tabela_sitios(caminho_entrada))
+        gravar_tabela_sitios(df, caminho_saida)
+        duracao = time.perf_counter() - inicio
+    except FileNotFoundError as e:
+        print(f"Erro: Arquivo não encontrado - {e}")
+        return None
+    except ValueError as e:
+        print(f"Erro: {e}")
+        return None
+
+    contagem = df['situacao_isozona'].value_counts()
+    print(f"\nSítios processados: {len(df)} em {duracao:.2f} s")
+    for situacao in ('dentro', 'fronteira', 'fora'):
+        print(f"   {situacao:<10}: {contagem.get(situacao, 0)}")
+    print(f"\nArquivo salvo em: {caminho_saida}")
+    return df
+
+
 # =============================================================================
-# Distribuição Temporal - Método Huff
+# Grade de Precipitação (Raster)
 # =============================================================================
+"""
+Tabelas IDF para todas as células de uma grade regular lat/lon que cobre
+as isozonas. O shapefile é rasterizado uma única vez em uma grade de
+identificadores de zona e a tabela de cada zona é calculada uma única vez;
+o cubo (lat × lon × tempo de retorno × duração) é preenchido por indexação,
+em blocos de linhas, diretamente em um arquivo .npy mapeado em memória.
 
-def calcular_pac_huff(pb: float, duracao_horas: float) -> float:
-    """
-    Calcula a porcentagem acumulada de precipitação mm/min usando as curvas de Huff.
-    
-    Parâmetros:
-        pb: Porcentagem do tempo decorrido (0 a 100)
-        duracao_horas: Duração total da chuva em horas
-        
-    Retorna:
-        PAc: Porcentagem acumulada da precipitação (0 a 100)
-    """
-    if pb <= 0:
-        return 0.0
-    if pb >= 100:
-        return 100.0
-    #valores referentes aos cálculos matemáticos de cada quartil de huff.
-    if duracao_horas <= 6:
-        pac = (4.02817498644692E-26 * pb**17 - 3.52064227661328E-23 * pb**16 +
-               1.40597068416381E-20 * pb**15 - 3.39749477703355E-18 * pb**14 +
-               5.54497997392431E-16 * pb**13 - 6.45955102401168E-14 * pb**12 +
-               5.53311153502673E-12 * pb**11 - 3.53601335024796E-10 * pb**10 +
-               1.69157185342832E-08 * pb**9 - 6.01477294241886E-07 * pb**8 +
-               1.55857516691692E-05 * pb**7 - 2.82804931812996E-04 * pb**6 +
-               3.30423804127657E-03 * pb**5 - 1.95440226611134E-02 * pb**4 -
-               1.78285694295392E-02 * pb**3 + 0.843704743033219 * pb**2 +
-               0.460519860597484 * pb + 0.105509396306812)
-    elif duracao_horas <= 12:
-        pac = (1.38673921100494E-29 * pb**19 - 1.21613849024923E-26 * pb**18 +
-               4.81175587207619E-24 * pb**17 - 1.13061048055895E-21 * pb**16 +
-               1.74322289744585E-19 * pb**15 - 1.82955175694565E-17 * pb**14 +
-               1.29362605433794E-15 * pb**13 - 5.57716800214043E-14 * pb**12 +
-               7.05502076331805E-13 * pb**11 + 8.26435609777427E-11 * pb**10 -
-               6.63085914357193E-09 * pb**9 + 2.63606231276545E-07 * pb**8 -
-               6.63478625779216E-06 * pb**7 + 1.10122543439505E-04 * pb**6 -
-               1.19013879689829E-03 * pb**5 + 8.05401322603745E-03 * pb**4 -
-               3.34138101445273E-02 * pb**3 + 0.107328692602926 * pb**2 +
-               0.434452891319131 * pb - 9.29064257700887E-03)
-    elif duracao_horas <= 24:
-        if pb <= 56:
-            pac = (-7.60644888142597E-19 * pb**13 + 2.26532324896959E-16 * pb**12 -
-                   2.77322200030732E-14 * pb**11 + 1.74614948354883E-12 * pb**10 -
-                   5.42723072107129E-11 * pb**9 + 2.88453725150229E-10 * pb**8 +
-                   3.40120100322963E-08 * pb**7 - 9.87326768780573E-07 * pb**6 +
-                   4.6775676050966E-06 * pb**5 + 2.53896092445158E-04 * pb**4 -
-                   5.65737144328779E-03 * pb**3 + 5.39029497668964E-02 * pb**2 +
-                   0.359808518609887 * pb - 5.32553512302088E-12)
-        else:
-            pac = (7.93878771768824E-11 * pb**8 - 5.24871539129577E-08 * pb**7 +
-                   1.51310191157137E-05 * pb**6 - 2.48406960877551E-03 * pb**5 +
-                   0.25398132631186 * pb**4 - 16.5564133934408 * pb**3 +
-                   671.654540274205 * pb**2 - 15489.8757952666 * pb + 155336.538705823)
-    else:
-        if pb < 78:
-            pac = (4.45646156443285E-20 * pb**13 - 2.22681580593717E-17 * pb**12 +
-                   4.96794969032244E-15 * pb**11 - 6.5250621619299E-13 * pb**10 +
-                   5.59641539762932E-11 * pb**9 - 3.28222385169418E-09 * pb**8 +
-                   1.33763527344691E-07 * pb**7 - 3.76248289158519E-06 * pb**6 +
-                   7.06366898909776E-05 * pb**5 - 8.12975145227206E-04 * pb**4 +
-                   4.3426645265125E-03 * pb**3 + 1.05914948857879E-02 * pb**2 +
-                   0.30574957410383 * pb + 2.4217656685223E-04)
-        else:
-            pac = (4.81964349956249E-10 * pb**8 - 2.71720789296904E-07 * pb**7 +
-                   6.08665963510088E-05 * pb**6 - 0.006357548911514 * pb**5 +
-                   0.185523370306902 * pb**4 + 25.3341694344528 * pb**3 -
-                   2889.70554544436 * pb**2 + 119076.774334982 * pb - 1835700.24767339)
-    
-    return max(0.0, min(100.0, pac))
+Arquivos do diretório da grade:
+    metadados.json  origem, resolução, tempos de retorno, durações e zonas
+    zonas.npy       identificador da zona de cada célula (int16, -1 = fora)
+    idf.npy         cubo de precipitações em mm (NaN = fora das isozonas)
+"""
+ARQUIVO_METADADOS_GRADE = 'metadados.json'
+ARQUIVO_ZONAS_GRADE = 'zonas.npy'
+ARQUIVO_CUBO_GRADE = 'idf.npy'
 
 
-def formatar_nome_coluna(tempo_retorno: int, duracao_horas: float) -> str:
+def _tabelas_por_zona(zonas: list[str], duracoes_h=None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    Formata o nome da coluna no padrao TR,duracao.
-    
-    Exemplos:
-        100 anos, 0.167h -> "100,10min"
-        100 anos, 1h -> "100,1h"
-        1000 anos, 24h -> "1000,24h"
+    Calcula a tabela IDF de cada zona, alinhada a um conjunto comum de TRs.
+
+    Retornos:
+        Tupla (tabelas, tempos_retorno, duracoes) com tabelas na forma
+        (n_zonas + 1, n_tr, n_duracoes); a última linha é NaN e serve às
+        células sem zona (identificador -1).
     """
-    duracao_minutos = int(round(duracao_horas * 60))
-    if duracao_minutos < 60:
-        return f"{tempo_retorno},{duracao_minutos}min"
-    return f"{tempo_retorno},{duracao_minutos // 60}h"
+    por_zona = [
+        TabelaIDF.de_precipitacao_base(calcular_precipitacao_base(carregar_dados(z)), duracoes_h)
+        for z in zonas
+    ]
+    tempos_retorno = np.unique(np.concatenate([t.tempos_retorno for t in por_zona]))
+    duracoes = por_zona[0].duracoes_horas if por_zona else np.asarray(DURACOES_HORAS, dtype=float)
+    tabelas = np.full((len(zonas) + 1, len(tempos_retorno), len(duracoes)), np.nan)
+    for i, tabela in enumerate(por_zona):
+        colunas = np.searchsorted(tempos_retorno, tabela.tempos_retorno)
+        tabelas[i, colunas, :] = tabela.valores.T
+    return tabelas, tempos_retorno, duracoes
 
 
-def distribuir_chuva_huff(precipitacao_mm: float, duracao_horas: float) -> np.ndarray:
+@medir_etapa('gerar_grade_idf')
+def gerar_grade_idf(
+    diretorio_saida: str, resolucao: float = 0.05, limites: tuple = None,
+    dtype=np.float32, linhas_por_bloco: int = 64
+) -> 'GradeIDF':
     """
-    Distribui a precipitação total ao longo do tempo usando o Método de Huff.
-    Calcula o volume de chuva em mm minuto a minuto utilizando os quartis de Huff.
-    Para encontrar o valor de cada minuto, subtrai o volume atual - 1 minuto antes.
+    Gera a grade de precipitações (lat × lon × TR × duração) em disco.
 
     Argumentos:
-        precipitacao_mm: Precipitação total em mm (ex: 100)
-        duracao_horas: Duração da chuva em horas (ex: 2)
+        diretorio_saida: Diretório onde os arquivos da grade são gravados.
+        resolucao: Tamanho da célula em graus (ex: 0.05).
+        limites: (lon_min, lat_min, lon_max, lat_max); padrão: extensão
+            do shapefile das isozonas.
+        dtype: Tipo do cubo (float32 reduz o arquivo à metade).
+        linhas_por_bloco: Número de linhas da grade processadas por vez.
 
-    Retorna:
-        Array de intensidades em mm/min (1 valor por minuto)
-    
-    Exemplo:
-        - Minuto 1:  pb=0.83%  → PAc=0.5%  → acum=0.5mm  → intensidade=0.5mm
-        - Minuto 2:  pb=1.67%  → PAc=1.2%  → acum=1.2mm  → intensidade=0.7mm (1.2-0.5)
-        - Minuto 3:  pb=2.50%  → PAc=2.0%  → acum=2.0mm  → intensidade=0.8mm (2.0-1.2)
-        - Minuto 4:  pb=3.33%  → PAc=2.9%  → acum=2.9mm  → intensidade=0.9mm (2.9-2.0)
-        - Minuto 60: pb=50%    → PAc=70%   → acum=70mm   → intensidade=2.0mm (pico)
-        - Minuto 120: pb=100%  → PAc=100%  → acum=100mm  → intensidade=0.3mm
+    Retornos:
+        GradeIDF aberta sobre os arquivos gravados.
     """
-    duracao_minutos = int(round(duracao_horas * 60))
-    intensidades = []
-    p_acum_anterior = 0.0
-    
-    for i in range(1, duracao_minutos + 1):
-        pb = (i / duracao_minutos) * 100
-        pac = calcular_pac_huff(pb, duracao_horas)
-        p_acum = precipitacao_mm * pac / 100
-        intensidades.append(p_acum - p_acum_anterior)
-        p_acum_anterior = p_acum
-    
-    return np.array(intensidades)
+    localizador = obter_localizador()
+    armazem = obter_armazem()
+    if limites is None:
+        limites = localizador.extensao
+    lon_min, lat_min, lon_max, lat_max = (float(v) for v in limites)
+    n_lat = max(int(np.ceil((lat_max - lat_min) / resolucao)), 1)
+    n_lon = max(int(np.ceil((lon_max - lon_min) / resolucao)), 1)
+    lats = lat_min + (np.arange(n_lat) + 0.5) * resolucao
+    lons = lon_min + (np.arange(n_lon) + 0.5) * resolucao
 
+    # Rasterização: índice do polígono -> identificador da zona no armazém
+    zonas = list(armazem.zonas)
+    poligonos = localizador.rasterizar(lats, lons, linhas_por_bloco)
+    id_por_poligono = np.array(
+        [zonas.index(z) if z in zonas else -1
+         for z in (str(z).strip().upper() for z in localizador.zonas)] + [-1],
+        dtype=np.int16,
+    )
+    ids = id_por_poligono[poligonos]
 
-def converter_csv_para_huff(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Converte o formato de saída do Cálculo de Precipitação para o formato Huff.
-    
-    Formato de entrada (Cálculo de Precipitação por Isozonas):
-        Duração;TR 2;TR 5;TR 10;...
-        6 min;12,34;15,67;18,90;...
-        
-    Formato de saída (Huff):
-        tempo_retorno,duracao_horas,precipitacao_mm
-        2,0.1,12.34
-    """
-    dados = []
-    col_duracao = next((col for col in df.columns if 'dura' in col.lower()), None)
-    
-    if col_duracao is None:
-        raise ValueError("Coluna 'Duração' não encontrada no CSV")
-    
-    for _, row in df.iterrows():
-        duracao_str = str(row[col_duracao]).strip()
-        if 'min' in duracao_str:
-            duracao_horas = int(duracao_str.replace('min', '').strip()) / 60
-        elif 'h' in duracao_str:
-            duracao_horas = float(duracao_str.replace('h', '').strip())
-        else:
-            continue
-        
-        for col in df.columns:
-            if col == col_duracao:
-                continue
-            tr_str = col.replace('TR', '').strip()
-            try:
-                tempo_retorno = int(tr_str)
-            except ValueError:
-                continue
-            
-            precip = row[col]
-            if pd.isna(precip) or precip == '':
-                continue
-            if isinstance(precip, str):
-                precip = float(precip.replace(',', '.'))
-            
-            dados.append({
-                'tempo_retorno': tempo_retorno,
-                'duracao_horas': duracao_horas,
-                'precipitacao_mm': precip
-            })
-    
-    return pd.DataFrame(dados)
+    tabelas, tempos_retorno, duracoes = _tabelas_por_zona(zonas)
+    tabelas = tabelas.astype(dtype)
 
+    os.makedirs(diretorio_saida, exist_ok=True)
+    np.save(os.path.join(diretorio_saida, ARQUIVO_ZONAS_GRADE), ids)
+    cubo = np.lib.format.open_memmap(
+        os.path.join(diretorio_saida, ARQUIVO_CUBO_GRADE), mode='w+', dtype=dtype,
+        shape=(n_lat, n_lon, len(tempos_retorno), len(duracoes)),
+    )
+    for inicio in range(0, n_lat, linhas_por_bloco):
+        # ids = -1 seleciona a última linha de tabelas (NaN)
+        cubo[inicio:inicio + linhas_por_bloco] = tabelas[ids[inicio:inicio + linhas_por_bloco]]
+    cubo.flush()
+    del cubo
+
+    metadados = {
+        'lat_min': lat_min, 'lon_min': lon_min, 'resolucao': resolucao,
+        'n_lat': n_lat, 'n_lon': n_lon,
+        'tempos_retorno': tempos_retorno.tolist(),
+        'duracoes_horas': duracoes.tolist(),
+        'zonas': zonas,
+        'shapefile': localizador.caminho_shapefile,
+        'precipitacao': armazem.caminho_precipitacao,
+        'coeficientes': armazem.caminho_coeficientes,
+    }
+    with open(os.path.join(diretorio_saida, ARQUIVO_METADADOS_GRADE), 'w', encoding='utf-8') as f:
+        json.dump(metadados, f, indent=2, ensure_ascii=False)
+    return GradeIDF.abrir(diretorio_saida)
 
-def processar_csv_huff(caminho_entrada: str, caminho_saida: str = None) -> pd.DataFrame:
+
+class GradeIDF:
     """
-    Lê o CSV de entrada e gera o DataFrame de saída com distribuição Huff.
-    
-    Formato de entrada esperado (saída do Cálculo de Precipitação por Isozonas):
-        Duração;TR 2;TR 5;TR 10;...
-        6 min;12,34;15,67;18,90;...
-    
-    Parâmetros:
-        caminho_entrada: Caminho do CSV de entrada
-        caminho_saida: Caminho opcional para salvar o resultado em CSV
-        
-    Retorna:
-        DataFrame com colunas para cada combinação TR/duração
+    Grade de precipitações gerada por gerar_grade_idf, aberta em modo leitura.
+
+    O cubo é mapeado em memória: abrir a grade não lê os dados, e cada
+    consulta lê apenas as células pedidas. Uma coordenada é atribuída à
+    célula que a contém, portanto perto das bordas entre isozonas a zona
+    pode diferir da consulta exata ao shapefile (get_isozona).
+
+    Argumentos:
+        diretorio: Diretório com metadados.json, zonas.npy e idf.npy.
     """
-    df_entrada = pd.read_csv(caminho_entrada, sep=';', decimal='.')
-    df_entrada = converter_csv_para_huff(df_entrada)
-    
-    max_minutos = int(round(df_entrada['duracao_horas'].max() * 60))
-    resultado = {'minuto': list(range(1, max_minutos + 1))}
-    
-    for _, row in df_entrada.iterrows():
-        nome_coluna = formatar_nome_coluna(int(row['tempo_retorno']), row['duracao_horas'])
-        intensidades = distribuir_chuva_huff(row['precipitacao_mm'], row['duracao_horas'])
-        intensidades_completas = np.zeros(max_minutos)
-        intensidades_completas[:len(intensidades)] = intensidades
-        resultado[nome_coluna] = intensidades_completas
-    
-    df_saida = pd.DataFrame(resultado)
-    
-    def ordenar_coluna(col):
-        if col == 'minuto':
-            return (0, 0)
-        partes = col.split(',')
-        tr = int(partes[0])
-        dur = partes[1]
-        minutos = int(dur.replace('min', '')) if 'min' in dur else int(dur.replace('h', '')) * 60
-        return (tr, minutos)
-    
-    df_saida = df_saida[sorted(df_saida.columns, key=ordenar_coluna)]
-    
-    if caminho_saida:
-        df_saida.round(4).to_csv(caminho_saida, index=False, sep=';', decimal='.')
-    
-    return df_saida
 
+    def __init__(self, diretorio: str):
+        self.diretorio = diretorio
+        with open(os.path.join(diretorio, ARQUIVO_METADADOS_GRADE), encoding='utf-8') as f:
+            self.metadados = json.load(f)
+        self.lat_min = self.metadados['lat_min']
+        self.lon_min = self.metadados['lon_min']
+        self.resolucao = self.metadados['resolucao']
+        self.tempos_retorno = np.array(self.metadados['tempos_retorno'], dtype=int)
+        self.duracoes_horas = np.array(self.metadados['duracoes_horas'], dtype=float)
+        self.zonas = np.array(self.metadados['zonas'] + [None], dtype=object)
+        self.ids = np.load(os.path.join(diretorio, ARQUIVO_ZONAS_GRADE), mmap_mode='r')
+        self.cubo = np.load(os.path.join(diretorio, ARQUIVO_CUBO_GRADE), mmap_mode='r')
 
-def exibir_resumo_huff(df: pd.DataFrame):
-    """Exibe resumo dos resultados Huff no console."""
-    colunas = [c for c in df.columns if c != 'minuto']
-    print(f"\nTotal de cenários processados: {len(colunas)}")
-    print(f"Total de linhas (minutos): {len(df)}")
-    print("\nColunas geradas:")
-    for i, col in enumerate(colunas, 1):
-        print(f"   {i:2d}. {col:<20} | Pacm = {df[col].sum():.2f} mm")
-    print("\n" + "=" * 70)
+    @classmethod
+    def abrir(cls, diretorio: str) -> 'GradeIDF':
+        """Abre uma grade gravada por gerar_grade_idf."""
+        return cls(diretorio)
 
+    def indices(self, lats, lons) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Converte coordenadas em índices (linha, coluna) da grade.
 
-def executar_Distribuição_Temporal(caminho_entrada: str = None) -> None:
-    """Executa a Distribuição Temporal - Método Huff."""
-    print("\n" + "=" * 70)
-    print("   DISTRIBUIÇÃO TEMPORAL - MÉTODO HUFF")
-    print("=" * 70)
-    
-    if caminho_entrada is None:
-        caminho_entrada = CSV_HUFF_ENTRADA
-    
-    try:
-        df = processar_csv_huff(caminho_entrada, CSV_HUFF_SAIDA)
-        exibir_resumo_huff(df)
-        print(f"\nArquivo salvo em: {CSV_HUFF_SAIDA}")
-    except FileNotFoundError:
-        print(f"ERRO: Arquivo não encontrado: {caminho_entrada}")
-    except Exception as e:
-        print(f"ERRO: Erro ao processar: {e}")
+        Retornos:
+            Tupla (i, j, valido); valido é False fora da extensão da grade.
+        """
+        i = np.floor((np.asarray(lats, dtype=float) - self.lat_min) / self.resolucao)
+        j = np.floor((np.asarray(lons, dtype=float) - self.lon_min) / self.resolucao)
+        n_lat, n_lon = self.ids.shape
+        valido = (i >= 0) & (i < n_lat) & (j >= 0) & (j < n_lon)
+        i = np.where(valido, i, 0).astype(np.intp)
+        j = np.where(valido, j, 0).astype(np.intp)
+        return i, j, valido
+
+    def zona(self, lats, lons) -> np.ndarray:
+        """Retorna a zona de cada coordenada (None fora das isozonas)."""
+        i, j, valido = self.indices(lats, lons)
+        ids = np.where(valido, self.ids[i, j], -1)
+        return self.zonas[ids]
+
+    def consultar_lote(self, lats, lons) -> np.ndarray:
+        """
+        Retorna as precipitações de muitas coordenadas de uma vez.
+
+        Retornos:
+            Array (..., n_tr, n_duracoes) em mm; NaN fora das isozonas.
+        """
+        i, j, valido = self.indices(lats, lons)
+        valores = np.array(self.cubo[i, j], dtype=np.float64)
+        valores[~valido] = np.nan
+        return valores
+
+    def consultar(self, lat: float, lon: float) -> TabelaIDF | None:
+        """
+        Retorna a TabelaIDF da célula que contém a coordenada.
+
+        Retornos:
+            TabelaIDF ou None se a coordenada estiver fora das isozonas.
+        """
+        valores = self.consultar_lote(lat, lon)
+        if np.isnan(valores).all():
+            return None
+        return TabelaIDF(self.duracoes_horas, self.tempos_retorno, valores.T)
 
 
 # =============================================================================
-# MENU PRINCIPAL
+# Estações Pluviométricas (precipitação por sítio)
 # =============================================================================
+"""
+Em vez de uma única tabela de precipitação para todas as coordenadas,
+cada sítio pode usar a precipitação máxima diária por TR do posto
+pluviométrico mais próximo (ou a média ponderada pelo inverso da
+distância dos k mais próximos). A isozona continua definindo apenas os
+coeficientes.
 
-def exibir_menu():
-    """Exibe o menu principal."""
-    print("\n" + "=" * 70)
-    print("   SISTEMA DE CÁLCULO DE PRECIPITAÇÃO + DISTRIBUIÇÃO TEMPORAL")
+O CSV de estações é longo, com uma linha por estação e TR:
+    estacao, lat, lon, tempo_retorno, precipitacao
+"""
+COLUNAS_ESTACOES = ['estacao', 'lat', 'lon', 'tempo_retorno', 'precipitacao']
+RAIO_TERRA_KM = 6371.0088
+
+
+def _vetores_unitarios(lats, lons) -> np.ndarray:
+    """Converte coordenadas em vetores unitários 3D (distância euclidiana ~ arco)."""
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lon = np.radians(np.asarray(lons, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+class ArmazemEstacoes:
+    """
+    Tabelas de precipitação das estações carregadas uma única vez.
+
+    As tabelas de todas as estações ficam em um array (estações × TR) e as
+    coordenadas em uma árvore KD (scipy cKDTree) sobre vetores unitários
+    3D, de modo que a estação mais próxima de muitos sítios é resolvida
+    em uma única consulta e sem distorção perto dos polos ou do antimeridiano.
+
+    Argumentos:
+        caminho: CSV longo com as colunas de COLUNAS_ESTACOES.
+    """
+
+    @medir_etapa('carregar_estacoes')
+    def __init__(self, caminho: str):
+        from scipy.spatial import cKDTree
+
+        self.caminho = caminho
+        df = carregar_csv_com_decimal(caminho)
+        colunas = {
+            'estacao': _encontrar_coluna(df, ('estacao', 'codigo', 'id')),
+            'lat': _encontrar_coluna(df, ('lat', 'latitude')),
+            'lon': _encontrar_coluna(df, ('lon', 'long', 'longitude')),
+            'tempo_retorno': _encontrar_coluna(df, ('tempo_retorno',)),
+            'precipitacao': _encontrar_coluna(df, ('precipitacao',)),
+        }
+        if None in colunas.values():
+            raise ValueError(
+                "CSV de estações inválido. "
+                f"Colunas esperadas: {', '.join(COLUNAS_ESTACOES)}"
+            )
+        df = df.rename(columns={v: k for k, v in colunas.items()})
+
+        codigos_estacao, self.estacoes = pd.factorize(df['estacao'].astype(str).str.strip())
+        self.tempos_retorno = np.unique(df['tempo_retorno'].astype(int))
+        codigos_tr = np.searchsorted(self.tempos_retorno, df['tempo_retorno'].astype(int))
+        self.precipitacoes = np.full((len(self.estacoes), len(self.tempos_retorno)), np.nan)
+        self.precipitacoes[codigos_estacao, codigos_tr] = df['precipitacao'].to_numpy(dtype=float)
+
+        primeira = df.groupby(codigos_estacao, sort=True)[['lat', 'lon']].first()
+        self.lats = primeira['lat'].to_numpy(dtype=float)
+        self.lons = primeira['lon'].to_numpy(dtype=float)
+        self.arvore = cKDTree(_vetores_unitarios(self.lats, self.lons))
+
+    @medir_etapa('consultar_estacoes')
+    def consultar_lote(
+        self, lats, lons, k: int = 1, potencia: float = 2.0
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Resolve a precipitação por TR de muitos sítios de uma vez.
+
+        Com k = 1 usa a estação mais próxima; com k > 1, a média das k
+        mais próximas ponderada por 1 / distância**potencia (uma estação
+        na mesma coordenada do sítio prevalece). Valores ausentes de uma
+        estação são ignorados na média daquele TR.
+
+        Argumentos:
+            lats: Latitudes dos sítios.
+            lons: Longitudes dos sítios.
+            k: Número de estações consideradas.
+            potencia: Expoente da ponderação pelo inverso da distância.
+
+        Retornos:
+            Tupla (precipitacoes, estacao, distancia_km): precipitações com
+            forma (n_sitios, n_tr) na ordem de self.tempos_retorno, índice da
+            estação mais próxima (-1 para coordenada inválida) e a distância
+            até ela em km.
+        """
+        vetores = _vetores_unitarios(lats, lons)
+        n = len(vetores)
+        k = max(1, min(int(k), len(self.estacoes)))
+        validos = np.isfinite(vetores).all(axis=1)
+
+        precipitacoes = np.full((n, len(self.tempos_retorno)), np.nan)
+        estacao = np.full(n, -1, dtype=np.int64)
+        distancia_km = np.full(n, np.nan)
+        if not validos.any():
+            return precipitacoes, estacao, distancia_km
+
+        cordas, indices = self.arvore.query(vetores[validos], k=k)
+        cordas = cordas.reshape(-1, k)
+        indices = indices.reshape(-1, k)
+        distancias = 2 * RAIO_TERRA_KM * np.arcsin(np.minimum(cordas / 2, 1.0))
+        estacao[validos] = indices[:, 0]
+        distancia_km[validos] = distancias[:, 0]
+
+        if k == 1:
+            precipitacoes[validos] = self.precipitacoes[indices[:, 0]]
+            return precipitacoes, estacao, distancia_km
+
+        with np.errstate(divide='ignore'):
+            pesos = 1.0 / distancias ** potencia
+        coincidente = distancias == 0
+        pesos = np.where(coincidente.any(axis=1, keepdims=True), coincidente.astype(float), pesos)
+        valores = self.precipitacoes[indices]                     # (n, k, n_tr)
+        pesos = np.where(np.isnan(valores), 0.0, pesos[:, :, np.newaxis])
+        soma_pesos = pesos.sum(axis=1)
+        with np.errstate(invalid='ignore'):
+            precipitacoes[validos] = np.nansum(valores * pesos, axis=1) / soma_pesos
+        return precipitacoes, estacao, distancia_km
+
+
+# Armazéns de estações já carregados, por caminho
+_ARMAZENS_ESTACOES: dict[str, ArmazemEstacoes] = {}
+
+
+def obter_armazem_estacoes(caminho: str) -> ArmazemEstacoes:
+    """Retorna o armazém de estações, lendo o CSV apenas na primeira chamada."""
+    armazem = _ARMAZENS_ESTACOES.get(caminho)
+    if armazem is None:
+        armazem = ArmazemEstacoes(caminho)
+        _ARMAZENS_ESTACOES[caminho] = armazem
+    return armazem
+
+
+@medir_etapa('calcular_tabelas_sitios')
+def calcular_tabelas_sitios(
+    zonas, precipitacoes: np.ndarray, tempos_retorno, duracoes_h=None,
+    armazem: ArmazemCoeficientes = None
+) -> np.ndarray:
+    """
+    Calcula as tabelas IDF de muitos sítios, cada um com sua precipitação.
+
+    Os coeficientes vêm da isozona de cada sítio; as precipitações base
+    (calcular_precipitacao_base) e a interpolação (calcular_tabela_idf)
+    são aplicadas a todos os sítios de uma vez.
+
+    Argumentos:
+        zonas: Isozona de cada sítio, forma (n_sitios,).
+        precipitacoes: Precipitação diária por TR, forma (n_sitios, n_tr).
+        tempos_retorno: Tempos de retorno das colunas de precipitacoes.
+        duracoes_h: Durações em horas (padrão: DURACOES_HORAS).
+        armazem: Armazém dos coeficientes (padrão: obter_armazem()).
+
+    Retornos:
+        Array (n_sitios, n_duracoes, n_tr); NaN onde faltar coeficiente
+        ou precipitação.
+    """
+    precipitacoes = np.asarray(precipitacoes, dtype=float)
+    zonas_unicas, inverso = np.unique(np.asarray(zonas, dtype=str), return_inverse=True)
+    armazem = armazem or obter_armazem()
+    c_1h, c_6min = armazem.matriz_coeficientes(zonas_unicas, tempos_retorno)
+    df_base = calcular_precipitacao_base(pd.DataFrame({
+        'precipitacao': precipitacoes.ravel(),
+        'coef_1h_24h': c_1h[inverso].ravel(),
+        'coef_6min_24h': c_6min[inverso].ravel(),
+    }))
+    valores, _ = calcular_tabela_idf(
+        df_base['precip_6min'].to_numpy().reshape(precipitacoes.shape),
+        df_base['precip_1h'].to_numpy().reshape(precipitacoes.shape),
+        df_base['precip_24h'].to_numpy().reshape(precipitacoes.shape),
+        duracoes_h,
+    )
+    return valores
+
+
+# =============================================================================
+# Bacias Hidrográficas (ponderação por área)
+# =============================================================================
+"""
+Tabela IDF de uma bacia que atravessa mais de uma isozona.
+
+Cada bacia é intersectada com as isozonas (LocalizadorIsozonas.sobrepor,
+uma única consulta à STRtree para todas as bacias) e as áreas são medidas
+em projeção de áreas iguais. Os coeficientes coef_1h_24h e coef_6min_24h
+da bacia são a média dos coeficientes das zonas ponderada pela área de
+cada zona dentro da bacia; a partir deles, o cálculo segue o de uma zona
+(calcular_precipitacao_base e calcular_tabela_idf).
+"""
+# Albers de áreas iguais para a América do Sul (ESRI:102033)
+CRS_AREA_EQUIVALENTE = (
+    '+proj=aea +lat_0=-32 +lon_0=-60 +lat_1=-5 +lat_2=-42 +ellps=GRS80 +units=m +no_defs'
+)
+COLUNAS_ID_BACIA = ('bacia', 'sitio', 'id', 'nome', 'codigo')
+
+
+@functools.lru_cache(maxsize=1)
+def _transformador_area_equivalente():
+    """Transformação EPSG:4326 -> CRS_AREA_EQUIVALENTE (criada uma única vez)."""
+    from pyproj import Transformer
+
+    return Transformer.from_crs('EPSG:4326', CRS_AREA_EQUIVALENTE, always_xy=True)
+
+
+def areas_km2(geometrias) -> np.ndarray:
+    """
+    Área (km²) de geometrias em EPSG:4326, medida em projeção de áreas iguais.
+
+    Argumentos:
+        geometrias: Array de geometrias shapely.
+
+    Retornos:
+        Array de áreas, forma (n,).
+    """
+    import shapely
+
+    transformador = _transformador_area_equivalente()
+    projetadas = shapely.transform(
+        np.asarray(geometrias, dtype=object),
+        lambda xy: np.column_stack(transformador.transform(xy[:, 0], xy[:, 1])),
+    )
+    return shapely.area(projetadas) / 1e6
+
+
+def ler_bacias(caminho: str, coluna_id: str = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Lê uma camada de bacias (shapefile, GeoPackage, GeoJSON...) em EPSG:4326.
+
+    Argumentos:
+        caminho: Arquivo da camada.
+        coluna_id: Coluna com o identificador da bacia (padrão: a primeira
+            de COLUNAS_ID_BACIA encontrada, ou a posição na camada).
+
+    Retornos:
+        Tupla (ids, geometrias).
+    """
+    import geopandas as gpd
+
+    gdf = gpd.read_file(caminho)
+    if gdf.crs is not None and gdf.crs != "EPSG:4326":
+        gdf = gdf.to_crs("EPSG:4326")
+    coluna_id = coluna_id or _encontrar_coluna(gdf, COLUNAS_ID_BACIA)
+    ids = gdf[coluna_id].to_numpy() if coluna_id else np.arange(len(gdf))
+    return ids, gdf.geometry.to_numpy()
+
+
+@medir_etapa('fracoes_area_bacias')
+def fracoes_area_bacias(bacias, ids=None) -> pd.DataFrame:
+    """
+    Calcula a área e a fração de cada isozona dentro de cada bacia.
+
+    Argumentos:
+        bacias: Polígonos das bacias em EPSG:4326.
+        ids: Identificadores das bacias (padrão: posição).
+
+    Retornos:
+        DataFrame com uma linha por par (bacia, zona): bacia, ZONA,
+        area_km2 e fracao (da área total da bacia). A soma das frações de
+        uma bacia é menor que 1 quando parte dela está fora das isozonas.
+    """
+    bacias = np.asarray(bacias, dtype=object)
+    ids = np.arange(len(bacias)) if ids is None else np.asarray(ids)
+    pares = obter_localizador().sobrepor(bacias)
+    area_bacia = areas_km2(bacias)
+    return pd.DataFrame({
+        'bacia': ids[pares['poligono'].to_numpy()],
+        'ZONA': pares['ZONA'].to_numpy(),
+        'area_km2': pares['area_km2'].to_numpy(),
+        'fracao': pares['area_km2'].to_numpy() / area_bacia[pares['poligono'].to_numpy()],
+    })
+
+
+def coeficientes_ponderados(
+    fracoes: pd.DataFrame, ids, tempos_retorno, armazem: ArmazemCoeficientes = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Média dos coeficientes das zonas de cada bacia, ponderada pela área.
+
+    Zonas sem coeficiente para um TR são excluídas da média desse TR.
+
+    Argumentos:
+        fracoes: Resultado de fracoes_area_bacias.
+        ids: Identificadores das bacias, na ordem desejada da saída.
+        tempos_retorno: Tempos de retorno das colunas.
+        armazem: Armazém dos coeficientes (padrão: obter_armazem()).
+
+    Retornos:
+        Tupla (coef_1h_24h, coef_6min_24h), cada um com forma (n_bacias, n_tr);
+        NaN para bacias fora das isozonas.
+    """
+    armazem = armazem or obter_armazem()
+    zonas = armazem.zonas
+    posicao_bacia = pd.Index(ids).get_indexer(fracoes['bacia'])
+    posicao_zona = pd.Index(zonas).get_indexer(
+        fracoes['ZONA'].astype(str).str.strip().str.upper()
+    )
+    validos = (posicao_bacia >= 0) & (posicao_zona >= 0)
+    pesos = np.zeros((len(ids), len(zonas)))
+    np.add.at(
+        pesos, (posicao_bacia[validos], posicao_zona[validos]),
+        fracoes['area_km2'].to_numpy()[validos],
+    )
+
+    def ponderar(coeficientes: np.ndarray) -> np.ndarray:
+        soma = pesos @ np.nan_to_num(coeficientes)
+        peso_total = pesos @ (~np.isnan(coeficientes))
+        return np.divide(soma, peso_total, out=np.full(soma.shape, np.nan), where=peso_total > 0)
+
+    c_1h, c_6min = armazem.matriz_coeficientes(zonas, tempos_retorno)
+    return ponderar(c_1h), ponderar(c_6min)
+
+
+def calcular_tabela_bacia(poligono) -> tuple[dict[str, float], TabelaIDF]:
+    """
+    Calcula a tabela de precipitação de uma bacia, sem interação.
+
+    Argumentos:
+        poligono: Polígono da bacia em EPSG:4326.
+
+    Retornos:
+        Tupla ({zona: fração da área}, TabelaIDF).
+
+    Exceções:
+        ValueError: Se a bacia não intersectar nenhuma isozona.
+    """
+    fracoes = fracoes_area_bacias([poligono])
+    if fracoes.empty:
+        raise ValueError("A bacia não intersecta nenhuma isozona.")
+    df_precip = obter_armazem().df_precipitacao
+    c_1h, c_6min = coeficientes_ponderados(fracoes, [0], df_precip['tempo_retorno'])
+    df_bacia = df_precip.assign(coef_1h_24h=c_1h[0], coef_6min_24h=c_6min[0])
+    tabela = TabelaIDF.de_precipitacao_base(calcular_precipitacao_base(df_bacia))
+    return dict(zip(fracoes['ZONA'], fracoes['fracao'])), tabela
+
+
+@medir_etapa('calcular_tabelas_bacias')
+def calcular_tabelas_bacias(bacias, ids=None, duracoes_h=None) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """
+    Calcula, em lote, as tabelas de precipitação de uma camada de bacias.
+
+    Argumentos:
+        bacias: Polígonos das bacias em EPSG:4326.
+        ids: Identificadores das bacias (padrão: posição).
+        duracoes_h: Durações em horas (padrão: DURACOES_HORAS).
+
+    Retornos:
+        Tupla (fracoes, tempos_retorno, valores): as frações de área
+        (fracoes_area_bacias) e as precipitações, forma
+        (n_bacias, n_duracoes, n_tr), NaN para bacias fora das isozonas.
+    """
+    ids = np.arange(len(bacias)) if ids is None else np.asarray(ids)
+    fracoes = fracoes_area_bacias(bacias, ids)
+    df_precip = obter_armazem().df_precipitacao
+    tempos_retorno = df_precip['tempo_retorno'].to_numpy().astype(int)
+    c_1h, c_6min = coeficientes_ponderados(fracoes, ids, tempos_retorno)
+    p_6min, p_1h, p_24h = precipitacoes_base(
+        df_precip['precipitacao'].to_numpy(dtype=float), c_1h, c_6min
+    )
+    valores, _ = calcular_tabela_idf(p_6min, p_1h, p_24h, duracoes_h)
+    return fracoes, tempos_retorno, valores
+
+
+def empilhar_tabelas(ids, tempos_retorno, valores: np.ndarray, duracoes_h=None) -> pd.DataFrame:
+    """
+    Empilha tabelas de vários sítios/bacias no formato de gerar_tabela,
+    com uma coluna sitio (entrada de processar_huff_streaming).
+    """
+    duracoes = np.asarray(DURACOES_HORAS if duracoes_h is None else duracoes_h, dtype=float)
+    n, n_dur, n_tr = valores.shape
+    tabela = pd.DataFrame(valores.reshape(n * n_dur, n_tr), columns=[f'TR {tr}' for tr in tempos_retorno])
+    tabela.insert(0, 'Duração', np.tile([formatar_duracao(d) for d in duracoes], n))
+    tabela.insert(0, 'sitio', np.repeat(np.asarray(ids), n_dur))
+    return _remover_colunas_repetidas(tabela)
+
+
+# =============================================================================
+# Incerteza (Monte Carlo)
+# =============================================================================
+"""
+Os coeficientes de cada isozona, a precipitação e o fator 1 dia -> 24 h
+são estimativas pontuais. O modo de incerteza sorteia N conjuntos
+perturbados desses parâmetros (com semente e distribuições configuráveis)
+e calcula todas as tabelas de uma vez, como um array
+(N × duração × TR), em blocos de amostras para limitar a memória.
+O resultado são tabelas de percentis.
+
+Cada parâmetro é multiplicado por um fator sorteado por amostra, o mesmo
+para todos os TRs (um cenário com precipitação alta é alto em todos os
+TRs). Cada parâmetro tem seu próprio gerador derivado da semente, então
+o resultado não depende do tamanho do bloco.
+"""
+PARAMETROS_INCERTEZA = ('precipitacao', 'coef_1h_24h', 'coef_6min_24h', 'fator_24h')
+
+
+@dataclass(frozen=True)
+class DistribuicaoParametro:
+    """
+    Distribuição do fator multiplicativo de um parâmetro.
+
+    Atributos:
+        tipo: 'normal' (1 + escala·Z), 'lognormal' (mediana 1, desvio
+            escala em ln) ou 'uniforme' (1 ± escala)
+        escala: Coeficiente de variação (normal/lognormal) ou semiamplitude
+            relativa (uniforme)
+    """
+    tipo: str = 'normal'
+    escala: float = 0.0
+
+    def amostrar(self, gerador: np.random.Generator, n: int) -> np.ndarray:
+        """Sorteia n fatores multiplicativos."""
+        if self.tipo == 'normal':
+            return 1.0 + self.escala * gerador.standard_normal(n)
+        if self.tipo == 'lognormal':
+            return np.exp(self.escala * gerador.standard_normal(n))
+        if self.tipo == 'uniforme':
+            return 1.0 + gerador.uniform(-self.escala, self.escala, n)
+        raise ValueError(f"Distribuição inválida: '{self.tipo}'. Use normal, lognormal ou uniforme")
+
+
+DISTRIBUICOES_PADRAO = {
+    'precipitacao': DistribuicaoParametro('lognormal', 0.10),
+    'coef_1h_24h': DistribuicaoParametro('normal', 0.05),
+    'coef_6min_24h': DistribuicaoParametro('normal', 0.05),
+    'fator_24h': DistribuicaoParametro('normal', 0.02),
+}
+
+
+@medir_etapa('amostrar_ensemble_idf')
+def amostrar_ensemble_idf(
+    df_zona: pd.DataFrame, n_amostras: int, semente: int = None,
+    distribuicoes: dict = None, tamanho_bloco: int = 2000, duracoes_h=None
+) -> np.ndarray:
+    """
+    Calcula as tabelas IDF de N conjuntos de parâmetros perturbados.
+
+    Argumentos:
+        df_zona: Dados da zona (carregar_dados): precipitacao e coeficientes por TR.
+        n_amostras: Número de amostras N.
+        semente: Semente dos sorteios (None = aleatória).
+        distribuicoes: Distribuição por parâmetro (padrão: DISTRIBUICOES_PADRAO;
+            parâmetros omitidos ficam fixos).
+        tamanho_bloco: Número de amostras calculadas por vez.
+        duracoes_h: Durações em horas (padrão: DURACOES_HORAS).
+
+    Retornos:
+        Array float32 (N, n_duracoes, n_tr).
+    """
+    distribuicoes = DISTRIBUICOES_PADRAO if distribuicoes is None else distribuicoes
+    desconhecidos = set(distribuicoes) - set(PARAMETROS_INCERTEZA)
+    if desconhecidos:
+        raise ValueError(
+            f"Parâmetros inválidos: {sorted(desconhecidos)}. Use {list(PARAMETROS_INCERTEZA)}"
+        )
+    duracoes = np.asarray(DURACOES_HORAS if duracoes_h is None else duracoes_h, dtype=float)
+    nominais = {
+        'precipitacao': df_zona['precipitacao'].to_numpy(dtype=float),
+        'coef_1h_24h': df_zona['coef_1h_24h'].to_numpy(dtype=float),
+        'coef_6min_24h': df_zona['coef_6min_24h'].to_numpy(dtype=float),
+        'fator_24h': np.full(len(df_zona), FATOR_1DIA_24H),
+    }
+    geradores = dict(zip(
+        PARAMETROS_INCERTEZA,
+        (np.random.default_rng(s) for s in np.random.SeedSequence(semente).spawn(len(PARAMETROS_INCERTEZA))),
+    ))
+
+    valores = np.empty((n_amostras, len(duracoes), len(df_zona)), dtype=np.float32)
+    for inicio in range(0, n_amostras, tamanho_bloco):
+        n = min(tamanho_bloco, n_amostras - inicio)
+        # Parâmetros (n, n_tr): valor nominal × fator sorteado por amostra
+        parametros = {
+            nome: nominal * (
+                distribuicoes[nome].amostrar(geradores[nome], n)[:, np.newaxis]
+                if nome in distribuicoes else 1.0
+            )
+            for nome, nominal in nominais.items()
+        }
+        p_6min, p_1h, p_24h = precipitacoes_base(
+            parametros['precipitacao'], parametros['coef_1h_24h'],
+            parametros['coef_6min_24h'], parametros['fator_24h'],
+        )
+        valores[inicio:inicio + n], _ = calcular_tabela_idf(
+            p_6min, p_1h, p_24h, duracoes, dtype=np.float32
+        )
+    return valores
+
+
+@medir_etapa('simular_tabela_idf')
+def simular_tabela_idf(
+    zona: str, n_amostras: int = 10_000, percentis=(5, 50, 95), semente: int = None,
+    distribuicoes: dict = None, tamanho_bloco: int = 2000
+) -> dict[float, TabelaIDF]:
+    """
+    Tabelas de percentis das precipitações de uma zona (Monte Carlo).
+
+    Argumentos:
+        zona: Isozona.
+        n_amostras: Número de amostras N.
+        percentis: Percentis desejados (0 a 100).
+        semente: Semente dos sorteios (None = aleatória).
+        distribuicoes: Ver amostrar_ensemble_idf.
+        tamanho_bloco: Número de amostras calculadas por vez.
+
+    Retornos:
+        Dicionário percentil -> TabelaIDF.
+    """
+    df_zona = carregar_dados(zona)
+    duracoes = np.asarray(DURACOES_HORAS, dtype=float)
+    ensemble = amostrar_ensemble_idf(
+        df_zona, n_amostras, semente, distribuicoes, tamanho_bloco, duracoes
+    )
+    tempos_retorno = df_zona['tempo_retorno'].to_numpy().astype(int)
+    valores = np.percentile(ensemble, percentis, axis=0)
+    return {
+        q: TabelaIDF(duracoes, tempos_retorno, valores[i].astype(float))
+        for i, q in enumerate(percentis)
+    }
+
+
+def percentis_necessarios_huff(percentis) -> list[float]:
+    """Percentis das tabelas exigidos por simular_huff: cada q e 100 - q."""
+    return sorted(set(percentis) | {100 - q for q in percentis})
+
+
+def simular_huff(
+    zona: str, n_amostras: int = 10_000, percentis=(5, 50, 95), semente: int = None,
+    distribuicoes: dict = None, tamanho_bloco: int = 2000, passo_minutos: float = 1,
+    tabelas: dict = None
+) -> dict[float, pd.DataFrame]:
+    """
+    Faixas de percentis dos hietogramas Huff de uma zona (Monte Carlo).
+
+    Cada valor do hietograma é precipitação × fração do passo, com a fração
+    fixa para a duração. Para fração ≥ 0 o percentil q do produto é a fração
+    × percentil q da precipitação; para fração < 0 (pequenas oscilações
+    dos polinômios), é a fração × percentil 100 - q. Assim as faixas saem
+    das tabelas de percentis, sem distribuir cada amostra.
+
+    Argumentos:
+        tabelas: Tabelas de percentis já simuladas (simular_tabela_idf com
+            percentis_necessarios_huff(percentis)). Se informadas, o Monte
+            Carlo não é refeito e n_amostras, semente, distribuicoes e
+            tamanho_bloco são ignorados.
+
+    Retornos:
+        Dicionário percentil -> DataFrame (formato de distribuir_tabela_huff).
+
+    Exceções:
+        ValueError: Se faltar em tabelas algum percentil necessário.
+    """
+    necessarios = percentis_necessarios_huff(percentis)
+    if tabelas is None:
+        tabelas = simular_tabela_idf(
+            zona, n_amostras, necessarios, semente, distribuicoes, tamanho_bloco
+        )
+    faltando = [q for q in necessarios if q not in tabelas]
+    if faltando:
+        raise ValueError(f"Tabelas sem os percentis {faltando} (ver percentis_necessarios_huff)")
+    referencia = next(iter(tabelas.values()))
+    fracoes = distribuir_tabela_huff(
+        TabelaIDF(referencia.duracoes_horas, referencia.tempos_retorno,
+                  np.ones_like(referencia.valores)),
+        passo_minutos,
+    )
+    colunas = [c for c in fracoes.columns if c != 'minuto']
+    negativas = fracoes[colunas].to_numpy() < 0
+
+    faixas = {}
+    for q in percentis:
+        df_q = distribuir_tabela_huff(tabelas[q], passo_minutos)
+        if negativas.any():
+            df_oposto = distribuir_tabela_huff(tabelas[100 - q], passo_minutos)
+            df_q[colunas] = np.where(negativas, df_oposto[colunas].to_numpy(), df_q[colunas].to_numpy())
+        faixas[q] = df_q
+    return faixas
+
+
+# =============================================================================
+# Distribuição Temporal - Método Huff
+# =============================================================================
+
+# Coeficientes dos polinômios de Huff (PAc em função de pb), em ordem
+# crescente de grau: o índice i é o coeficiente de pb**i.
+# Chuvas de até 6 h
+HUFF_COEF_ATE_6H = np.array([
+    0.105509396306812, 0.460519860597484, 0.843704743033219,
+    -1.78285694295392E-02, -1.95440226611134E-02, 3.30423804127657E-03,
+    -2.82804931812996E-04, 1.55857516691692E-05, -6.01477294241886E-07,
+    1.69157185342832E-08, -3.53601335024796E-10, 5.53311153502673E-12,
+    -6.45955102401168E-14, 5.54497997392431E-16, -3.39749477703355E-18,
+    1.40597068416381E-20, -3.52064227661328E-23, 4.02817498644692E-26,
+])
+
+# Chuvas de 6 h até 12 h
+HUFF_COEF_ATE_12H = np.array([
+    -9.29064257700887E-03, 0.434452891319131, 0.107328692602926,
+    -3.34138101445273E-02, 8.05401322603745E-03, -1.19013879689829E-03,
+    1.10122543439505E-04, -6.63478625779216E-06, 2.63606231276545E-07,
+    -6.63085914357193E-09, 8.26435609777427E-11, 7.05502076331805E-13,
+    -5.57716800214043E-14, 1.29362605433794E-15, -1.82955175694565E-17,
+    1.74322289744585E-19, -1.13061048055895E-21, 4.81175587207619E-24,
+    -1.21613849024923E-26, 1.38673921100494E-29,
+])
+
+# Chuvas de 12 h até 24 h, pb ≤ 56%
+HUFF_COEF_ATE_24H_INICIO = np.array([
+    -5.32553512302088E-12, 0.359808518609887, 5.39029497668964E-02,
+    -5.65737144328779E-03, 2.53896092445158E-04, 4.6775676050966E-06,
+    -9.87326768780573E-07, 3.40120100322963E-08, 2.88453725150229E-10,
+    -5.42723072107129E-11, 1.74614948354883E-12, -2.77322200030732E-14,
+    2.26532324896959E-16, -7.60644888142597E-19,
+])
+
+# Chuvas de 12 h até 24 h, pb > 56%
+HUFF_COEF_ATE_24H_FIM = np.array([
+    155336.538705823, -15489.8757952666, 671.654540274205,
+    -16.5564133934408, 0.25398132631186, -2.48406960877551E-03,
+    1.51310191157137E-05, -5.24871539129577E-08, 7.93878771768824E-11,
+])
+
+# Chuvas acima de 24 h, pb < 78%
+HUFF_COEF_ACIMA_24H_INICIO = np.array([
+    2.4217656685223E-04, 0.30574957410383, 1.05914948857879E-02,
+    4.3426645265125E-03, -8.12975145227206E-04, 7.06366898909776E-05,
+    -3.76248289158519E-06, 1.33763527344691E-07, -3.28222385169418E-09,
+    5.59641539762932E-11, -6.5250621619299E-13, 4.96794969032244E-15,
+    -2.22681580593717E-17, 4.45646156443285E-20,
+])
+
+# Chuvas acima de 24 h, pb ≥ 78%
+HUFF_COEF_ACIMA_24H_FIM = np.array([
+    -1835700.24767339, 119076.774334982, -2889.70554544436,
+    25.3341694344528, 0.185523370306902, -0.006357548911514,
+    6.08665963510088E-05, -2.71720789296904E-07, 4.81964349956249E-10,
+])
+
+# Trechos de cada curva: (limite de pb, limite inclusivo, coeficientes).
+# Um valor de pb usa o primeiro trecho cujo limite ele não ultrapassa.
+CURVAS_HUFF = {
+    'ate_6h': ((100.0, True, HUFF_COEF_ATE_6H),),
+    'ate_12h': ((100.0, True, HUFF_COEF_ATE_12H),),
+    'ate_24h': (
+        (56.0, True, HUFF_COEF_ATE_24H_INICIO),
+        (100.0, True, HUFF_COEF_ATE_24H_FIM),
+    ),
+    'acima_24h': (
+        (78.0, False, HUFF_COEF_ACIMA_24H_INICIO),
+        (100.0, True, HUFF_COEF_ACIMA_24H_FIM),
+    ),
+}
+
+
+def selecionar_curva_huff(duracao_horas: float) -> str:
+    """
+    Seleciona a curva de Huff (chave de CURVAS_HUFF) pela duração da chuva.
+
+    Parâmetros:
+        duracao_horas: Duração total da chuva em horas
+
+    Retorna:
+        'ate_6h', 'ate_12h', 'ate_24h' ou 'acima_24h'
+    """
+    if duracao_horas <= 6:
+        return 'ate_6h'
+    if duracao_horas <= 12:
+        return 'ate_12h'
+    if duracao_horas <= 24:
+        return 'ate_24h'
+    return 'acima_24h'
+
+
+def avaliar_curva_huff(pb, curva: str) -> np.ndarray:
+    """
+    Avalia uma curva de Huff para um array de porcentagens de tempo.
+
+    Os polinômios são avaliados pelo método de Horner
+    (np.polynomial.polynomial.polyval) sobre todo o array de uma vez.
+
+    Parâmetros:
+        pb: Porcentagens do tempo decorrido (0 a 100), escalar ou array
+        curva: Chave de CURVAS_HUFF
+
+    Retorna:
+        Array com a porcentagem acumulada da precipitação (0 a 100)
+    """
+    pb = np.asarray(pb, dtype=np.float64)
+    pb_1d = np.atleast_1d(pb)
+    # NaN (ou qualquer pb fora de todos os trechos) permanece NaN
+    pac = np.full_like(pb_1d, np.nan)
+    restante = (pb_1d > 0) & (pb_1d < 100)
+    for limite, inclusivo, coeficientes in CURVAS_HUFF[curva]:
+        trecho = restante & (pb_1d <= limite if inclusivo else pb_1d < limite)
+        pac[trecho] = np.polynomial.polynomial.polyval(pb_1d[trecho], coeficientes)
+        restante &= ~trecho
+    pac[pb_1d <= 0] = 0.0
+    pac[pb_1d >= 100] = 100.0
+    return np.clip(pac, 0.0, 100.0).reshape(pb.shape)
+
+
+def avaliar_pac_huff(pb, duracao_horas: float) -> np.ndarray:
+    """
+    Calcula a porcentagem acumulada de precipitação para um array de pb.
+
+    Parâmetros:
+        pb: Porcentagens do tempo decorrido (0 a 100), escalar ou array
+        duracao_horas: Duração total da chuva em horas
+
+    Retorna:
+        Array com a porcentagem acumulada da precipitação (0 a 100)
+    """
+    return avaliar_curva_huff(pb, selecionar_curva_huff(duracao_horas))
+
+
+def calcular_pac_huff(pb: float, duracao_horas: float) -> float:
+    """
+    Calcula a porcentagem acumulada de precipitação mm/min usando as curvas de Huff.
+    
+    Parâmetros:
+        pb: Porcentagem do tempo decorrido (0 a 100)
+        duracao_horas: Duração total da chuva em horas
+        
+    Retorna:
+        PAc: Porcentagem acumulada da precipitação (0 a 100)
+    """
+    return float(avaliar_pac_huff(pb, duracao_horas))
+
+
+# Número máximo de hietogramas unitários mantidos em memória
+TAMANHO_CACHE_HIETOGRAMAS = 512
+
+
+def numero_de_passos(duracao_minutos: float, passo_minutos: float = 1) -> int:
+    """
+    Retorna o número de passos de tempo de uma chuva.
+
+    Se a duração não for múltipla do passo, o último passo é parcial
+    (termina na duração da chuva).
+    """
+    if passo_minutos <= 0:
+        raise ValueError(f"passo_minutos deve ser positivo: {passo_minutos}")
+    # A tolerância evita um passo extra por erro de arredondamento (ex: 0.1 min)
+    return max(int(np.ceil(duracao_minutos / passo_minutos - 1e-9)), 1)
+
+
+def tempos_dos_passos(n_passos: int, passo_minutos: float = 1) -> np.ndarray:
+    """
+    Retorna o minuto final de cada passo (1, 2, 3, ... no passo padrão).
+
+    Com passo inteiro o resultado é inteiro; com passo fracionário, float.
+    """
+    if float(passo_minutos).is_integer():
+        return np.arange(1, n_passos + 1) * int(passo_minutos)
+    return np.round(np.arange(1, n_passos + 1) * passo_minutos, 6)
+
+
+@functools.lru_cache(maxsize=TAMANHO_CACHE_HIETOGRAMAS)
+def hietograma_unitario(
+    curva: str, duracao_minutos: int, passo_minutos: float = 1
+) -> np.ndarray:
+    """
+    Calcula o hietograma adimensional de uma curva de Huff.
+
+    Cada valor é a fração da precipitação total que cai no passo de tempo,
+    obtida pela diferença da curva acumulada avaliada diretamente nos
+    limites dos passos (min(k × passo, duração)); não há reamostragem de
+    uma série minuto a minuto. O resultado depende apenas da curva, da
+    duração e do passo, então fica em cache (LRU) e é compartilhado por
+    todos os tempos de retorno: o hietograma em mm é apenas
+    precipitacao_mm × hietograma_unitario(...).
+
+    O array retornado é somente leitura, pois é compartilhado pelo cache.
+
+    Parâmetros:
+        curva: Chave de CURVAS_HUFF (ver selecionar_curva_huff)
+        duracao_minutos: Duração total da chuva em minutos
+        passo_minutos: Intervalo de tempo de cada valor em minutos
+            (ex: 5, 10, 15 ou frações como 0.5 para chuvas curtas)
+
+    Retorna:
+        Array com as frações por passo (soma = 1)
+    """
+    n_passos = numero_de_passos(duracao_minutos, passo_minutos)
+    limites = np.minimum(np.arange(1, n_passos + 1) * passo_minutos, duracao_minutos)
+    pb = (limites / duracao_minutos) * 100
+    fracoes = np.diff(avaliar_curva_huff(pb, curva) / 100, prepend=0.0)
+    fracoes.setflags(write=False)
+    return fracoes
+
+
+def estatisticas_cache_hietogramas() -> dict:
+    """Retorna acertos, falhas e ocupação do cache de hietogramas unitários."""
+    info = hietograma_unitario.cache_info()
+    return {
+        'acertos': info.hits,
+        'falhas': info.misses,
+        'tamanho': info.currsize,
+        'tamanho_maximo': info.maxsize,
+    }
+
+
+def formatar_nome_coluna(tempo_retorno: int, duracao_horas: float) -> str:
+    """
+    Formata o nome da coluna no padrao TR,duracao.
+    
+    Exemplos:
+        100 anos, 0.167h -> "100,10min"
+        100 anos, 1h -> "100,1h"
+        1000 anos, 24h -> "1000,24h"
+    """
+    duracao_minutos = int(round(duracao_horas * 60))
+    if duracao_minutos < 60:
+        return f"{tempo_retorno},{duracao_minutos}min"
+    return f"{tempo_retorno},{duracao_minutos // 60}h"
+
+
+def distribuir_chuva_huff(
+    precipitacao_mm: float, duracao_horas: float, passo_minutos: float = 1
+) -> np.ndarray:
+    """
+    Distribui a precipitação total ao longo do tempo usando o Método de Huff.
+    Calcula o volume de chuva em mm a cada passo utilizando os quartis de Huff.
+    Para encontrar o valor de cada passo, subtrai o volume atual - 1 passo antes.
+
+    Argumentos:
+        precipitacao_mm: Precipitação total em mm (ex: 100)
+        duracao_horas: Duração da chuva em horas (ex: 2)
+        passo_minutos: Intervalo de cada valor em minutos (padrão: 1)
+
+    Retorna:
+        Array com a chuva (mm) de cada passo (1 valor por minuto no padrão)
+    
+    Exemplo:
+        - Minuto 1:  pb=0.83%  → PAc=0.5%  → acum=0.5mm  → intensidade=0.5mm
+        - Minuto 2:  pb=1.67%  → PAc=1.2%  → acum=1.2mm  → intensidade=0.7mm (1.2-0.5)
+        - Minuto 3:  pb=2.50%  → PAc=2.0%  → acum=2.0mm  → intensidade=0.8mm (2.0-1.2)
+        - Minuto 4:  pb=3.33%  → PAc=2.9%  → acum=2.9mm  → intensidade=0.9mm (2.9-2.0)
+        - Minuto 60: pb=50%    → PAc=70%   → acum=70mm   → intensidade=2.0mm (pico)
+        - Minuto 120: pb=100%  → PAc=100%  → acum=100mm  → intensidade=0.3mm
+    """
+    duracao_minutos = int(round(duracao_horas * 60))
+    curva = selecionar_curva_huff(duracao_horas)
+    return precipitacao_mm * hietograma_unitario(curva, duracao_minutos, passo_minutos)
+
+
+def converter_csv_para_huff(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte o formato de saída do Cálculo de Precipitação para o formato Huff.
+    
+    Formato de entrada (Cálculo de Precipitação por Isozonas):
+        Duração;TR 2;TR 5;TR 10;...
+        6 min;12,34;15,67;18,90;...
+        
+    Formato de saída (Huff):
+        tempo_retorno,duracao_horas,precipitacao_mm
+        2,0.1,12.34
+    """
+    dados = []
+    col_duracao = next((col for col in df.columns if 'dura' in col.lower()), None)
+    
+    if col_duracao is None:
+        raise ValueError("Coluna 'Duração' não encontrada no CSV")
+    
+    for _, row in df.iterrows():
+        duracao_str = str(row[col_duracao]).strip()
+        if 'min' in duracao_str:
+            duracao_horas = int(duracao_str.replace('min', '').strip()) / 60
+        elif 'h' in duracao_str:
+            duracao_horas = float(duracao_str.replace('h', '').strip())
+        else:
+            continue
+        
+        for col in df.columns:
+            if col == col_duracao:
+                continue
+            tr_str = col.replace('TR', '').strip()
+            try:
+                tempo_retorno = int(tr_str)
+            except ValueError:
+                continue
+            
+            precip = row[col]
+            if pd.isna(precip) or precip == '':
+                continue
+            if isinstance(precip, str):
+                precip = float(precip.replace(',', '.'))
+            
+            dados.append({
+                'tempo_retorno': tempo_retorno,
+                'duracao_horas': duracao_horas,
+                'precipitacao_mm': precip
+            })
+    
+    return pd.DataFrame(dados)
+
+
+def interpretar_nome_coluna(col: str) -> tuple[int, int]:
+    """
+    Interpreta o nome de uma coluna Huff no padrão TR,duracao.
+
+    Exemplos:
+        "100,10min" -> (100, 10)
+        "1000,24h" -> (1000, 1440)
+
+    Retorna:
+        Tupla (tempo_retorno, duracao_minutos)
+    """
+    tr, dur = col.split(',')
+    if 'min' in dur:
+        return int(tr), int(dur.replace('min', ''))
+    return int(tr), int(dur.replace('h', '')) * 60
+
+
+@medir_etapa('processar_csv_huff')
+def processar_csv_huff(
+    caminho_entrada: str, caminho_saida: str = None, layout: str = 'largo',
+    passo_minutos: float = 1, metodo: str = 'huff'
+) -> pd.DataFrame:
+    """
+    Lê o CSV de entrada e gera o DataFrame de saída com distribuição Huff.
+    
+    Formato de entrada esperado (saída do Cálculo de Precipitação por Isozonas):
+        Duração;TR 2;TR 5;TR 10;...
+        6 min;12,34;15,67;18,90;...
+    
+    Parâmetros:
+        caminho_entrada: Caminho do CSV de entrada
+        caminho_saida: Caminho opcional para salvar o resultado
+            (.csv, .parquet ou .npz; ver gravar_saida_huff)
+        layout: 'largo' (uma coluna por TR/duração) ou 'longo'
+            (tr, duracao_min, minuto, mm) para o arquivo salvo
+        passo_minutos: Intervalo de tempo da distribuição em minutos
+        metodo: Método de distribuição (ver METODOS_DISTRIBUICAO)
+        
+    Retorna:
+        DataFrame com colunas para cada combinação TR/duração
+    """
+    df_entrada = pd.read_csv(caminho_entrada, sep=';', decimal='.')
+    df_saida = processar_tabela_huff(df_entrada, passo_minutos, metodo)
+    
+    if caminho_saida:
+        gravar_saida_huff(df_saida, caminho_saida, layout=layout)
+    
+    return df_saida
+
+
+def processar_tabela_huff(
+    df_tabela: pd.DataFrame, passo_minutos: float = 1, metodo: str = 'huff'
+) -> pd.DataFrame:
+    """
+    Gera a distribuição Huff a partir da tabela de precipitações em DataFrame.
+
+    Parâmetros:
+        df_tabela: Tabela no formato de gerar_tabela (Duração;TR 2;TR 5;...)
+        passo_minutos: Intervalo de tempo da distribuição em minutos
+        metodo: Método de distribuição (ver METODOS_DISTRIBUICAO)
+
+    Retorna:
+        DataFrame com colunas para cada combinação TR/duração
+    """
+    return distribuir_tabela(TabelaIDF.de_dataframe(df_tabela), metodo, passo_minutos)
+
+
+@medir_etapa('distribuir_tabela_huff')
+def distribuir_tabela_huff(tabela: TabelaIDF, passo_minutos: float = 1) -> pd.DataFrame:
+    """
+    Gera a distribuição Huff de todos os cenários (TR × duração) de uma TabelaIDF.
+
+    As colunas saem ordenadas por tempo de retorno e duração, e cada chuva
+    é completada com zeros até a maior duração da tabela.
+
+    Parâmetros:
+        tabela: Tabela de precipitações em memória
+        passo_minutos: Intervalo de tempo de cada linha em minutos (padrão: 1)
+
+    Retorna:
+        DataFrame com a coluna minuto (fim de cada passo) e uma coluna para
+        cada combinação TR/duração
+    """
+    return distribuir_tabela(tabela, 'huff', passo_minutos)
+
+
+# =============================================================================
+# Métodos de Distribuição Temporal
+# =============================================================================
+"""
+Além de Huff, a tabela IDF pode ser distribuída pelos métodos de blocos
+alternados, Chicago e SCS Tipo II. Cada método fornece apenas a sua
+fração acumulada F(t) (0 a 1), avaliada de forma vetorizada nos limites
+dos passos de tempo t (fração da duração, 0 a 1); o motor comum calcula
+as frações por passo, as multiplica pela precipitação e monta a tabela.
+
+Métodos que dependem apenas da duração (Huff, SCS) calculam as frações
+uma vez por duração, compartilhadas por todos os TRs; as de Huff vêm do
+cache de hietograma_unitario (estatisticas_cache_hietogramas). Métodos
+construídos a partir da própria curva IDF (blocos alternados, Chicago)
+recebem a função profundidade(duracoes_h) -> (..., n_tr) e avaliam todos
+os TRs de uma vez.
+
+Novos métodos podem ser incluídos com registrar_metodo.
+"""
+# Razão de posição do pico (fração da duração antes do pico) usada por
+# Chicago e pelos blocos alternados
+RAZAO_PICO_PADRAO = 0.5
+
+# Chuva SCS Tipo II de 24 h (TR-55): horas -> fração acumulada
+SCS_TIPO_II_HORAS = np.array([
+    0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0, 11.0, 11.5, 11.75,
+    12.0, 12.5, 13.0, 13.5, 14.0, 15.0, 16.0, 17.0, 18.0, 19.0, 20.0, 21.0,
+    22.0, 23.0, 24.0,
+])
+SCS_TIPO_II_FRACAO = np.array([
+    0.000, 0.011, 0.022, 0.034, 0.048, 0.063, 0.080, 0.098, 0.120, 0.147, 0.181,
+    0.235, 0.283, 0.357, 0.663, 0.735, 0.772, 0.799, 0.820, 0.854, 0.880, 0.903,
+    0.922, 0.938, 0.952, 0.964, 0.976, 0.988, 1.000,
+])
+
+
+@dataclass(frozen=True)
+class MetodoDistribuicao:
+    """
+    Método de distribuição temporal registrado em METODOS_DISTRIBUICAO.
+
+    Atributos:
+        nome: Nome do método (chave do registro)
+        fracao_acumulada: Função (t, duracao_horas, profundidade) -> F, com t
+            a fração da duração (0 a 1) no fim de cada passo. Retorna forma
+            (n_passos,) ou, se usa_idf, (n_passos, n_tr)
+        usa_idf: Se True, o método recebe profundidade(duracoes_h), que
+            retorna as precipitações da tabela com forma (..., n_tr)
+        descricao: Texto curto exibido na ajuda
+    """
+    nome: str
+    fracao_acumulada: object
+    usa_idf: bool = False
+    descricao: str = ''
+
+
+METODOS_DISTRIBUICAO: dict[str, MetodoDistribuicao] = {}
+
+
+def registrar_metodo(nome: str, fracao_acumulada, usa_idf: bool = False, descricao: str = '') -> None:
+    """Registra (ou substitui) um método de distribuição temporal."""
+    METODOS_DISTRIBUICAO[nome] = MetodoDistribuicao(nome, fracao_acumulada, usa_idf, descricao)
+
+
+def obter_metodo(nome: str) -> MetodoDistribuicao:
+    """
+    Retorna o método registrado com o nome dado.
+
+    Exceções:
+        ValueError: Se o método não estiver registrado.
+    """
+    try:
+        return METODOS_DISTRIBUICAO[nome]
+    except KeyError:
+        raise ValueError(
+            f"Método '{nome}' não encontrado. Métodos: {list(METODOS_DISTRIBUICAO)}"
+        ) from None
+
+
+def _fracao_huff(t: np.ndarray, duracao_horas: float, profundidade=None) -> np.ndarray:
+    """Curva acumulada de Huff do quartil correspondente à duração."""
+    return avaliar_curva_huff(t * 100, selecionar_curva_huff(duracao_horas)) / 100
+
+
+def _fracao_scs_tipo_ii(t: np.ndarray, duracao_horas: float, profundidade=None) -> np.ndarray:
+    """Curva SCS Tipo II de 24 h, escalonada de forma adimensional para a duração."""
+    return np.interp(t * 24.0, SCS_TIPO_II_HORAS, SCS_TIPO_II_FRACAO)
+
+
+def _fracao_chicago(
+    t: np.ndarray, duracao_horas: float, profundidade, razao_pico: float = RAZAO_PICO_PADRAO
+) -> np.ndarray:
+    """
+    Curva de massa da chuva de Chicago (Keifer e Chu) a partir da IDF.
+
+    Com o pico em tp = r·D, a chuva contida em qualquer janela de duração τ
+    que contém o pico, com r·τ antes e (1 - r)·τ depois dele, é P(τ):
+        t ≤ tp:  C(t) = r·[P(D) - P((tp - t) / r)]
+        t > tp:  C(t) = r·P(D) + (1 - r)·P((t - tp) / (1 - r))
+    """
+    r = min(max(razao_pico, 1e-6), 1 - 1e-6)
+    p_total = profundidade(duracao_horas)
+    antes = t <= r
+    tau = np.where(antes, (r - t) / r, (t - r) / (1 - r)) * duracao_horas
+    p_tau = profundidade(tau)
+    acumulada = np.where(
+        antes[:, np.newaxis], r * (p_total - p_tau), r * p_total + (1 - r) * p_tau
+    )
+    return acumulada / p_total
+
+
+def _fracao_blocos_alternados(
+    t: np.ndarray, duracao_horas: float, profundidade, razao_pico: float = RAZAO_PICO_PADRAO
+) -> np.ndarray:
+    """
+    Curva acumulada do método dos blocos alternados a partir da IDF.
+
+    Os incrementos P(t_k) - P(t_k-1) da curva IDF são ordenados do maior para
+    o menor; o maior fica na posição do pico (r·n) e os seguintes alternam
+    à direita e à esquerda dele. Com um último passo parcial, os blocos são
+    tratados como de mesma largura.
+    """
+    n = len(t)
+    incrementos = np.diff(profundidade(t * duracao_horas), axis=0, prepend=0.0)
+    ordem = np.argsort(-incrementos, axis=0, kind='stable')
+
+    # Posições a partir do pico: centro, centro+1, centro-1, centro+2, ...
+    centro = min(int(razao_pico * n), n - 1)
+    k = np.arange(1, n)
+    candidatas = np.empty(2 * n - 1, dtype=int)
+    candidatas[0] = centro
+    candidatas[1::2] = centro + k
+    candidatas[2::2] = centro - k
+    posicoes = candidatas[(candidatas >= 0) & (candidatas < n)][:n]
+
+    blocos = np.empty_like(incrementos)
+    colunas = np.arange(incrementos.shape[1])
+    blocos[posicoes[:, np.newaxis], colunas] = incrementos[ordem, colunas]
+    return np.cumsum(blocos, axis=0) / profundidade(duracao_horas)
+
+
+def fracoes_unitarias(metodo: str, duracao_minutos: int, passo_minutos: float = 1) -> np.ndarray:
+    """
+    Frações da precipitação total por passo, para métodos que não usam a IDF.
+
+    Equivale a hietograma_unitario, mas para qualquer método registrado.
+    O método de Huff é servido pelo próprio hietograma_unitario (array
+    somente leitura, compartilhado pelo cache).
+    """
+    dados_metodo = obter_metodo(metodo)
+    if dados_metodo.fracao_acumulada is _fracao_huff:
+        curva = selecionar_curva_huff(duracao_minutos / 60)
+        return hietograma_unitario(curva, duracao_minutos, passo_minutos)
+    return _fracoes_passos(dados_metodo, duracao_minutos, passo_minutos)
+
+
+def _fracoes_passos(
+    metodo: MetodoDistribuicao, duracao_minutos: int, passo_minutos: float, profundidade=None
+) -> np.ndarray:
+    """Avalia F(t) nos limites dos passos e retorna as frações de cada passo."""
+    n_passos = numero_de_passos(duracao_minutos, passo_minutos)
+    limites = np.minimum(np.arange(1, n_passos + 1) * passo_minutos, duracao_minutos)
+    t = limites / duracao_minutos
+    acumulada = metodo.fracao_acumulada(t, duracao_minutos / 60, profundidade)
+    return np.diff(acumulada, axis=0, prepend=0.0)
+
+
+@medir_etapa('distribuir_tabela')
+def distribuir_tabela(
+    tabela: TabelaIDF, metodo: str = 'huff', passo_minutos: float = 1
+) -> pd.DataFrame:
+    """
+    Distribui todos os cenários (TR × duração) de uma TabelaIDF por um método.
+
+    O formato é o de distribuir_tabela_huff: coluna minuto e uma coluna
+    por TR/duração, ordenadas por TR e duração e completadas com zeros.
+
+    Parâmetros:
+        tabela: Tabela de precipitações em memória
+        metodo: Nome do método em METODOS_DISTRIBUICAO
+        passo_minutos: Intervalo de tempo de cada linha em minutos
+
+    Retorna:
+        DataFrame com a coluna minuto e uma coluna para cada combinação TR/duração
+    """
+    dados_metodo = obter_metodo(metodo)
+    duracoes_minutos = np.rint(tabela.duracoes_horas * 60).astype(int)
+    max_minutos = int(duracoes_minutos.max()) if len(duracoes_minutos) else 0
+    max_passos = numero_de_passos(max_minutos, passo_minutos) if max_minutos else 0
+
+    # Matriz (passos, duração, TR) preenchida duração a duração, todos os TRs juntos
+    chuvas = np.zeros((max_passos, len(duracoes_minutos), len(tabela.tempos_retorno)))
+    for i, duracao_min in enumerate(duracoes_minutos):
+        if dados_metodo.usa_idf:
+            fracoes = _fracoes_passos(
+                dados_metodo, int(duracao_min), passo_minutos, tabela.precipitacao_em
+            )
+        else:
+            fracoes = fracoes_unitarias(metodo, int(duracao_min), passo_minutos)[:, np.newaxis]
+        chuvas[:len(fracoes), i, :] = tabela.valores[i] * fracoes
+
+    ordem_tr = np.argsort(tabela.tempos_retorno, kind='stable')
+    ordem_duracao = np.argsort(duracoes_minutos, kind='stable')
+    nomes, indices = [], []
+    for j in ordem_tr:
+        for i in ordem_duracao:
+            if np.isnan(tabela.valores[i, j]):
+                continue
+            nomes.append(formatar_nome_coluna(int(tabela.tempos_retorno[j]), tabela.duracoes_horas[i]))
+            indices.append((i, j))
+
+    i, j = np.array(indices, dtype=int).reshape(-1, 2).T
+    df = pd.DataFrame(chuvas[:, i, j], columns=nomes)
+    # Colunas repetidas (mesmo TR/duração) como no dicionário original
+    df = _remover_colunas_repetidas(df)
+    df.insert(0, 'minuto', tempos_dos_passos(max_passos, passo_minutos))
+    return df
+
+
+def distribuir_tabela_metodos(
+    tabela: TabelaIDF, metodos: list[str] = None, passo_minutos: float = 1
+) -> dict[str, pd.DataFrame]:
+    """
+    Distribui a tabela por vários métodos (padrão: todos os registrados).
+
+    Retorna:
+        Dicionário método -> DataFrame (formato de distribuir_tabela)
+    """
+    metodos = list(METODOS_DISTRIBUICAO) if metodos is None else metodos
+    return {m: distribuir_tabela(tabela, m, passo_minutos) for m in metodos}
+
+
+registrar_metodo('huff', _fracao_huff, descricao='Quartis de Huff (polinômios)')
+registrar_metodo('blocos_alternados', _fracao_blocos_alternados, usa_idf=True,
+                 descricao='Blocos alternados a partir da IDF')
+registrar_metodo('chicago', _fracao_chicago, usa_idf=True,
+                 descricao='Chuva de Chicago a partir da IDF')
+registrar_metodo('scs_tipo_ii', _fracao_scs_tipo_ii, descricao='SCS Tipo II (TR-55), escalonada')
+
+
+# =============================================================================
+# Gravação da Saída Huff
+# =============================================================================
+"""
+Formatos de saída, escolhidos pela extensão do arquivo:
+    .csv            -> texto com separador ; e 4 casas decimais (padrão)
+    .parquet / .pq  -> colunar, valores em float32
+    .npz            -> arrays NumPy compactados, valores em float32
+
+Layouts:
+    largo -> uma coluna por TR/duração, com zeros após o fim de cada chuva
+    longo -> uma linha por (tr, duracao_min, minuto, mm), sem os zeros
+"""
+FORMATOS_SAIDA = {'.csv': 'csv', '.parquet': 'parquet', '.pq': 'parquet', '.npz': 'npz'}
+
+
+def detectar_formato_saida(caminho: str) -> str:
+    """
+    Detecta o formato de saída pela extensão do arquivo.
+
+    Exceções:
+        ValueError: Se a extensão não for suportada.
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in FORMATOS_SAIDA:
+        raise ValueError(
+            f"Formato de saída não suportado: '{extensao}'. "
+            f"Use: {', '.join(FORMATOS_SAIDA)}"
+        )
+    return FORMATOS_SAIDA[extensao]
+
+
+def _minutos_compactos(minutos: pd.Series) -> np.ndarray:
+    """Coluna minuto em int32 (passo inteiro) ou float32 (passo fracionário)."""
+    minutos = minutos.to_numpy()
+    return minutos.astype(np.int32 if np.issubdtype(minutos.dtype, np.integer) else np.float32)
+
+
+def huff_para_formato_longo(df: pd.DataFrame, sitio=None) -> pd.DataFrame:
+    """
+    Converte a saída Huff larga para o formato longo, sem o preenchimento com zeros.
+
+    Parâmetros:
+        df: DataFrame largo (coluna minuto + uma coluna por TR/duração)
+        sitio: Identificador opcional incluído como primeira coluna
+
+    Retorna:
+        DataFrame com as colunas [sitio,] tr, duracao_min, minuto, mm
+    """
+    colunas = [c for c in df.columns if c not in ('minuto', 'sitio')]
+    cenarios = np.array([interpretar_nome_coluna(c) for c in colunas], dtype=np.int32)
+    cenarios = cenarios.reshape(-1, 2)
+    minutos = _minutos_compactos(df['minuto'])
+    # Um passo pertence à chuva se começa antes do fim dela (o último pode
+    # ser parcial); o passo é o fim do primeiro intervalo.
+    passo = minutos[0] if len(minutos) else 1
+    dentro = (minutos[np.newaxis, :] - passo) < cenarios[:, 1:2] - 1e-6
+
+    valores = df[colunas].to_numpy(dtype=np.float32).T
+    n_por_cenario = dentro.sum(axis=1)
+    longo = {
+        'tr': np.repeat(cenarios[:, 0], n_por_cenario),
+        'duracao_min': np.repeat(cenarios[:, 1], n_por_cenario),
+        'minuto': np.broadcast_to(minutos, dentro.shape)[dentro],
+        'mm': valores[dentro],
+    }
+    df_longo = pd.DataFrame(longo)
+    if sitio is not None:
+        df_longo.insert(0, 'sitio', sitio)
+    return df_longo
+
+
+def _preparar_saida_huff(df: pd.DataFrame, layout: str, sitio=None) -> pd.DataFrame:
+    """Aplica o layout e o tipo compacto (float32) antes da gravação binária."""
+    if layout == 'longo':
+        if 'mm' not in df.columns:
+            return huff_para_formato_longo(df, sitio)
+        # Já está no formato longo (ex: reaproveitado de um cache)
+        if sitio is None:
+            return df
+        return pd.concat([pd.DataFrame({'sitio': np.repeat([sitio], len(df))}), df], axis=1)
+    if layout != 'largo':
+        raise ValueError(f"Layout inválido: '{layout}'. Use 'largo' ou 'longo'")
+    dados = {} if sitio is None else {'sitio': np.repeat([sitio], len(df))}
+    for col in df.columns:
+        if col in ('minuto', 'sitio'):
+            dados[col] = df[col].to_numpy()
+        else:
+            dados[col] = df[col].to_numpy(dtype=np.float32)
+    return pd.DataFrame(dados)
+
+
+@medir_etapa('gravar_saida_huff')
+def gravar_saida_huff(
+    df: pd.DataFrame, caminho: str, formato: str = None, layout: str = 'largo'
+) -> None:
+    """
+    Grava a saída Huff em CSV, Parquet ou NPZ.
+
+    Parâmetros:
+        df: DataFrame largo gerado por processar_csv_huff
+        caminho: Caminho do arquivo de saída
+        formato: 'csv', 'parquet' ou 'npz' (padrão: detectado pela extensão)
+        layout: 'largo' ou 'longo'
+    """
+    formato = formato or detectar_formato_saida(caminho)
+    if formato == 'csv':
+        df_saida = _preparar_saida_huff(df, layout) if layout == 'longo' else df
+        df_saida.round(4).to_csv(caminho, index=False, sep=';', decimal='.')
+        return
+
+    df_saida = _preparar_saida_huff(df, layout)
+    if formato == 'parquet':
+        df_saida.to_parquet(caminho, index=False)
+    elif formato == 'npz':
+        if layout == 'longo':
+            np.savez_compressed(caminho, **{c: df_saida[c].to_numpy() for c in df_saida.columns})
+        else:
+            colunas = [c for c in df_saida.columns if c != 'minuto']
+            np.savez_compressed(
+                caminho,
+                minuto=_minutos_compactos(df_saida['minuto']),
+                colunas=np.array(colunas),
+                valores=df_saida[colunas].to_numpy(dtype=np.float32),
+            )
+    else:
+        raise ValueError(f"Formato de saída não suportado: '{formato}'")
+
+
+class EscritorHuff:
+    """
+    Grava a saída Huff de vários sítios em um único arquivo, sítio a sítio.
+
+    Cada chamada de acrescentar grava o bloco e o descarta, de modo que a
+    memória usada não depende do número de sítios. Suporta CSV e Parquet
+    (NPZ não permite gravação incremental). No layout largo, todos os
+    sítios devem ter as mesmas colunas TR/duração.
+
+    Exemplo:
+        with EscritorHuff('saida.parquet', layout='longo') as escritor:
+            for sitio, df in resultados:
+                escritor.acrescentar(df, sitio)
+
+    Parâmetros:
+        caminho: Caminho do arquivo de saída (.csv, .parquet ou .pq)
+        layout: 'largo' ou 'longo' (padrão)
+    """
+
+    def __init__(self, caminho: str, layout: str = 'longo'):
+        self.caminho = caminho
+        self.layout = layout
+        self.formato = detectar_formato_saida(caminho)
+        if self.formato == 'npz':
+            raise ValueError("O formato NPZ não permite gravação incremental")
+        self.linhas = 0
+        self._escritor_parquet = None
+        self._primeiro_bloco = True
+
+    @medir_etapa('escritor_huff')
+    def acrescentar(self, df: pd.DataFrame, sitio=None) -> None:
+        """
+        Acrescenta a saída Huff de um sítio ao arquivo.
+
+        No layout longo, df pode ser a saída larga de processar_csv_huff
+        ou uma tabela já convertida por huff_para_formato_longo.
+        """
+        df_saida = _preparar_saida_huff(df, self.layout, sitio)
+        if self.formato == 'csv':
+            df_saida.round(4).to_csv(
+                self.caminho, index=False, sep=';', decimal='.',
+                mode='w' if self._primeiro_bloco else 'a',
+                header=self._primeiro_bloco,
+            )
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            tabela = pa.Table.from_pandas(df_saida, preserve_index=False)
+            if self._escritor_parquet is None:
+                self._escritor_parquet = pq.ParquetWriter(self.caminho, tabela.schema)
+            self._escritor_parquet.write_table(tabela)
+        self._primeiro_bloco = False
+        self.linhas += len(df_saida)
+
+    def fechar(self) -> None:
+        """Finaliza o arquivo de saída."""
+        if self._escritor_parquet is not None:
+            self._escritor_parquet.close()
+            self._escritor_parquet = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+# =============================================================================
+# Distribuição Huff em Fluxo (Streaming)
+# =============================================================================
+"""
+Para tabelas de entrada grandes (por exemplo, as tabelas de precipitação
+de muitos sítios empilhadas, com uma coluna sitio), a entrada é lida em
+blocos de linhas e cada bloco gera os hietogramas no formato longo, que
+são gravados e descartados antes da leitura do próximo bloco. A memória
+usada depende do tamanho do bloco, não do tamanho da entrada.
+
+A ordem da saída é a da entrada: linha a linha e, em cada linha, as
+colunas de TR na ordem do cabeçalho, sem ordenação global.
+"""
+TAMANHO_BLOCO_STREAMING = 256
+
+
+def ler_tabela_em_blocos(caminho: str, tamanho_bloco: int = TAMANHO_BLOCO_STREAMING, sep: str = ';'):
+    """
+    Lê uma tabela CSV ou Parquet em blocos de linhas.
+
+    Parâmetros:
+        caminho: CSV (separador sep) ou Parquet
+        tamanho_bloco: Número de linhas por bloco
+        sep: Separador do CSV (padrão: ;, como em gravar_csv)
+
+    Retorna:
+        Gerador de DataFrames com até tamanho_bloco linhas
+    """
+    if detectar_formato_saida(caminho) == 'parquet':
+        import pyarrow.parquet as pq
+        for lote in pq.ParquetFile(caminho).iter_batches(batch_size=tamanho_bloco):
+            yield lote.to_pandas()
+        return
+    # Colunas de texto são lidas como str em todos os blocos, para que o
+    # tipo não mude de um bloco para outro (ex: sitio numérico em um deles)
+    cabecalho = pd.read_csv(caminho, sep=sep, nrows=0).columns
+    colunas_tr, _ = _colunas_tempo_retorno(cabecalho)
+    tipos = {col: str for col in cabecalho if col not in colunas_tr}
+    yield from pd.read_csv(caminho, sep=sep, decimal='.', chunksize=tamanho_bloco, dtype=tipos)
+
+
+def distribuir_bloco_huff(df_bloco: pd.DataFrame, passo_minutos: float = 1) -> pd.DataFrame:
+    """
+    Gera os hietogramas de um bloco de linhas no formato longo.
+
+    Cada linha (Duração, TR 2, TR 5, ...) é um conjunto de chuvas
+    independente, então o bloco não depende dos demais. As chuvas de mesma
+    duração são calculadas juntas (precipitação × hietograma unitário).
+
+    Parâmetros:
+        df_bloco: Linhas no formato de gerar_tabela, com coluna sitio opcional
+        passo_minutos: Intervalo de tempo da distribuição em minutos
+
+    Retorna:
+        DataFrame com as colunas [sitio,] tr, duracao_min, minuto, mm
+    """
+    col_duracao = _encontrar_coluna_duracao(df_bloco)
+    if col_duracao is None:
+        raise ValueError("Coluna 'Duração' não encontrada no CSV")
+    col_sitio = _encontrar_coluna(df_bloco, ('sitio', 'id', 'site', 'codigo'))
+    colunas, tempos_retorno = _colunas_tempo_retorno(
+        [c for c in df_bloco.columns if c not in (col_duracao, col_sitio)]
+    )
+    tempos_retorno = np.array(tempos_retorno, dtype=np.int32)
+    duracoes_h = interpretar_duracoes(df_bloco[col_duracao]).to_numpy()
+    valores = _valores_numericos(df_bloco[colunas]) if colunas else np.empty((len(df_bloco), 0))
+
+    # Cada célula (linha, TR) válida ocupa um trecho contíguo da saída, na
+    # ordem linha a linha; os deslocamentos vêm da soma acumulada dos
+    # números de passos, então as chuvas podem ser calculadas por duração
+    # e gravadas diretamente na posição final, sem ordenação.
+    duracoes_min = np.where(np.isnan(duracoes_h), 0, np.rint(duracoes_h * 60)).astype(int)
+    passos_linha = np.array(
+        [numero_de_passos(d, passo_minutos) if d > 0 else 0 for d in duracoes_min], dtype=np.int64
+    )
+    passos_celula = np.where(~np.isnan(valores), passos_linha[:, np.newaxis], 0).ravel()
+    inicio_celula = np.cumsum(passos_celula) - passos_celula
+    total = int(passos_celula.sum())
+
+    mm = np.empty(total, dtype=np.float32)
+    minuto = np.empty(total, dtype=tempos_dos_passos(1, passo_minutos).dtype)
+    for duracao_min in np.unique(duracoes_min[duracoes_min > 0]):
+        linhas = np.flatnonzero(duracoes_min == duracao_min)
+        unitario = hietograma_unitario(
+            selecionar_curva_huff(duracao_min / 60), int(duracao_min), passo_minutos
+        )
+        linha, coluna = np.nonzero(~np.isnan(valores[linhas]))
+        posicoes = (
+            inicio_celula[linhas[linha] * len(colunas) + coluna][:, np.newaxis]
+            + np.arange(len(unitario))
+        )
+        mm[posicoes] = valores[linhas[linha], coluna][:, np.newaxis] * unitario
+        minuto[posicoes] = tempos_dos_passos(len(unitario), passo_minutos)
+
+    linha_celula = np.repeat(np.arange(len(df_bloco)), len(colunas))
+    linha_saida = np.repeat(linha_celula, passos_celula)
+    df_longo = pd.DataFrame({
+        'tr': np.repeat(np.tile(tempos_retorno, len(df_bloco)), passos_celula),
+        'duracao_min': duracoes_min[linha_saida].astype(np.int32),
+        'minuto': _minutos_compactos(pd.Series(minuto)),
+        'mm': mm,
+    })
+    if col_sitio is not None:
+        df_longo.insert(0, 'sitio', df_bloco[col_sitio].to_numpy()[linha_saida])
+    return df_longo
+
+
+def gerar_blocos_huff(
+    caminho_entrada: str, tamanho_bloco: int = TAMANHO_BLOCO_STREAMING,
+    passo_minutos: float = 1
+):
+    """
+    Gera a distribuição Huff de uma tabela grande, bloco a bloco.
+
+    Parâmetros:
+        caminho_entrada: CSV (;) ou Parquet no formato de gerar_tabela,
+            com coluna sitio opcional (várias tabelas empilhadas)
+        tamanho_bloco: Número de linhas de entrada por bloco
+        passo_minutos: Intervalo de tempo da distribuição em minutos
+
+    Retorna:
+        Gerador de DataFrames no formato longo (ver distribuir_bloco_huff)
+    """
+    for df_bloco in ler_tabela_em_blocos(caminho_entrada, tamanho_bloco):
+        yield distribuir_bloco_huff(df_bloco, passo_minutos)
+
+
+@medir_etapa('processar_huff_streaming')
+def processar_huff_streaming(
+    caminho_entrada: str, caminho_saida: str,
+    tamanho_bloco: int = TAMANHO_BLOCO_STREAMING, passo_minutos: float = 1
+) -> int:
+    """
+    Lê, distribui e grava a saída Huff em fluxo, no formato longo.
+
+    Parâmetros:
+        caminho_entrada: CSV (;) ou Parquet no formato de gerar_tabela
+        caminho_saida: Arquivo de saída (.csv, .parquet ou .pq)
+        tamanho_bloco: Número de linhas de entrada por bloco
+        passo_minutos: Intervalo de tempo da distribuição em minutos
+
+    Retorna:
+        Número de linhas gravadas
+    """
+    with EscritorHuff(caminho_saida, layout='longo') as escritor:
+        for bloco in gerar_blocos_huff(caminho_entrada, tamanho_bloco, passo_minutos):
+            escritor.acrescentar(bloco)
+    return escritor.linhas
+
+
+# Fração da chuva total que define a janela crítica (núcleo mais intenso)
+FRACAO_JANELA_CRITICA = 0.5
+
+
+def _minimo_final(acumulada: np.ndarray) -> np.ndarray:
+    """Mínimo de S[k:n] para cada k = 0..n-1, com S a soma acumulada (n + 1 linhas)."""
+    return np.minimum.accumulate(acumulada[-2::-1], axis=0)[::-1]
+
+
+def _maximo_janela(acumulada: np.ndarray, minimo_final: np.ndarray, w: int) -> np.ndarray:
+    """
+    Chuva máxima da janela de w passos em cada coluna.
+
+    Com S a soma acumulada (n + 1 linhas, S[0] = 0), a chuva da janela que
+    começa em k é S[min(k + w, n)] - S[k]. O máximo das janelas completas
+    sai de uma única subtração das fatias S[w:] - S[:-w]; o das janelas que
+    ultrapassam o fim da chuva (k > n - w) é S[n] menos o mínimo de S[k:n].
+    """
+    n_passos = len(acumulada) - 1
+    maximo = (acumulada[w:] - acumulada[:-w]).max(axis=0)
+    if w > 1:
+        maximo = np.maximum(maximo, acumulada[-1] - minimo_final[n_passos - w + 1])
+    return maximo
+
+
+def _maximos_por_janela(acumulada: np.ndarray, janelas) -> np.ndarray:
+    """
+    Chuva máxima de cada janela (em passos, de 1 a n) em todas as colunas.
+
+    Retorna:
+        Matriz (len(janelas) × colunas), uma linha por janela
+    """
+    minimo_final = _minimo_final(acumulada)
+    maximos = np.empty((len(janelas), acumulada.shape[1]))
+    for i, w in enumerate(janelas):
+        maximos[i] = _maximo_janela(acumulada, minimo_final, w)
+    return maximos
+
+
+def _janela_critica(acumulada: np.ndarray, alvo: np.ndarray) -> np.ndarray:
+    """
+    Menor janela (em passos) cuja chuva máxima atinge alvo, por coluna.
+
+    Percorre as janelas em ordem crescente apenas nas colunas que ainda não
+    atingiram o alvo e para quando todas atingem, sem calcular as janelas
+    maiores. Colunas que nunca atingem ficam com a chuva inteira (n passos).
+    """
+    n_passos, n_colunas = len(acumulada) - 1, acumulada.shape[1]
+    janela = np.full(n_colunas, max(n_passos, 1))
+    minimo_final = _minimo_final(acumulada)
+    pendentes = np.arange(n_colunas)
+    parcial, minimo_parcial = acumulada, minimo_final
+    for w in range(1, n_passos + 1):
+        if not len(pendentes):
+            break
+        atinge = _maximo_janela(parcial, minimo_parcial, w) >= alvo[pendentes]
+        if atinge.any():
+            janela[pendentes[atinge]] = w
+            pendentes = pendentes[~atinge]
+            parcial, minimo_parcial = acumulada[:, pendentes], minimo_final[:, pendentes]
+    return janela
+
+
+@medir_etapa('analisar_janelas_criticas')
+def analisar_janelas_criticas(
+    df: pd.DataFrame, janelas_minutos=None, fracao_critica: float = FRACAO_JANELA_CRITICA
+) -> pd.DataFrame:
+    """
+    Analisa as janelas de chuva máxima de cada cenário de uma saída Huff larga.
+
+    A chuva de qualquer janela é a diferença de duas somas acumuladas, então
+    a chuva máxima de uma janela de w passos, em todas as colunas ao mesmo
+    tempo, é max(S[k + w] - S[k]) sobre a matriz (passos × colunas), sem
+    percorrer as janelas minuto a minuto.
+
+    A janela crítica é a menor janela que contém fracao_critica da chuva
+    total do cenário. As janelas são avaliadas em ordem crescente, cada
+    uma só nos cenários que ainda não atingiram a fração, até que todos
+    atinjam; as janelas maiores não são calculadas. Das demais janelas,
+    só são calculadas as pedidas em janelas_minutos.
+
+    Parâmetros:
+        df: DataFrame largo (coluna minuto + uma coluna por TR/duração)
+        janelas_minutos: Tamanhos de janela em minutos incluídos como colunas
+            max_<w>min (padrão: todas as janelas, de 1 passo até a maior
+            chuva; [] para nenhuma). Valores são arredondados para um número
+            inteiro de passos, de 1 até o total de passos.
+        fracao_critica: Fração da chuva total que define a janela crítica
+
+    Retorna:
+        DataFrame com uma linha por cenário: tr, duracao_min, total_mm,
+        pico_mm, intensidade_pico_mm_h, tempo_pico_min, janela_critica_min,
+        inicio_janela_critica_min e max_<w>min (chuva máxima em cada janela)
+    """
+    colunas = [c for c in df.columns if c not in ('minuto', 'sitio')]
+    minutos = df['minuto'].to_numpy(dtype=float)
+    passo = minutos[0] if len(minutos) else 1.0
+    chuvas = df[colunas].to_numpy(dtype=float)
+    n_passos, n_colunas = chuvas.shape
+    acumulada = np.vstack([np.zeros((1, n_colunas)), np.cumsum(chuvas, axis=0)])
+    indice_colunas = np.arange(n_colunas)
+
+    pico = chuvas.argmax(axis=0) if n_passos else np.zeros(n_colunas, dtype=int)
+    total = acumulada[-1]
+    resultado = {
+        'tr': [interpretar_nome_coluna(c)[0] for c in colunas],
+        'duracao_min': [interpretar_nome_coluna(c)[1] for c in colunas],
+        'total_mm': total,
+        'pico_mm': chuvas[pico, indice_colunas],
+        'intensidade_pico_mm_h': chuvas[pico, indice_colunas] * 60 / passo,
+        'tempo_pico_min': minutos[pico],
+    }
+
+    # Menor janela (em passos) cuja chuva máxima atinge fracao_critica do total,
+    # e o passo em que a primeira dessas janelas começa
+    janela_critica = _janela_critica(acumulada, fracao_critica * total - 1e-12)
+    inicios = np.arange(n_passos)[:, np.newaxis]
+    fins = np.minimum(inicios + janela_critica, n_passos)
+    inicio_critico = (acumulada[fins, indice_colunas] - acumulada[inicios, indice_colunas]).argmax(axis=0)
+    resultado['janela_critica_min'] = janela_critica * passo
+    resultado['inicio_janela_critica_min'] = inicio_critico * passo
+
+    if janelas_minutos is None:
+        janelas_minutos = np.arange(1, n_passos + 1) * passo
+    passos = [min(max(int(round(janela / passo)), 1), n_passos) for janela in janelas_minutos]
+    for janela, maximo in zip(janelas_minutos, _maximos_por_janela(acumulada, passos)):
+        resultado[f'max_{janela:g}min'] = maximo
+
+    return pd.DataFrame(resultado, index=pd.Index(colunas, name='cenario'))
+
+
+def exibir_resumo_huff(df: pd.DataFrame):
+    """Exibe resumo dos resultados Huff no console, com as janelas críticas."""
+    colunas = [c for c in df.columns if c != 'minuto']
+    analise = analisar_janelas_criticas(df, janelas_minutos=[])
+    print(f"\nTotal de cenários processados: {len(colunas)}")
+    print(f"Total de linhas (minutos): {len(df)}")
+    print(f"\nColunas geradas (janela crítica = {FRACAO_JANELA_CRITICA:.0%} da chuva):")
+    for i, (col, linha) in enumerate(analise.iterrows(), 1):
+        print(
+            f"   {i:3d}. {col:<16} | Pacm = {linha['total_mm']:8.2f} mm"
+            f" | Pico = {linha['intensidade_pico_mm_h']:7.1f} mm/h em {linha['tempo_pico_min']:g} min"
+            f" | Crítica = {linha['janela_critica_min']:g} min"
+            f" a partir de {linha['inicio_janela_critica_min']:g} min"
+        )
+    print("\n" + "=" * 70)
+
+
+def executar_Distribuição_Temporal(
+    caminho_entrada: str = None, tabela: TabelaIDF = None,
+    caminho_saida: str = None, layout: str = 'largo', passo_minutos: float = 1,
+    metodo: str = 'huff'
+) -> pd.DataFrame | None:
+    """
+    Executa a Distribuição Temporal - Método Huff.
+
+    Parâmetros:
+        caminho_entrada: CSV gerado pelo Cálculo de Precipitação por Isozonas
+        tabela: TabelaIDF já calculada em memória (dispensa o CSV de entrada)
+        caminho_saida: Arquivo de saída (padrão: CSV_HUFF_SAIDA)
+        layout: 'largo' ou 'longo' (ver gravar_saida_huff)
+        passo_minutos: Intervalo de tempo da distribuição em minutos
+        metodo: Método de distribuição (padrão: huff; ver METODOS_DISTRIBUICAO)
+
+    Retorna:
+        DataFrame da distribuição (formato largo) ou None em caso de erro
+    """
+    print("\n" + "=" * 70)
+    print("   DISTRIBUIÇÃO TEMPORAL - MÉTODO HUFF")
+    print("=" * 70)
+    
+    if caminho_entrada is None:
+        caminho_entrada = CSV_HUFF_ENTRADA
+    if caminho_saida is None:
+        caminho_saida = CSV_HUFF_SAIDA
+    
+    try:
+        if tabela is not None:
+            df = distribuir_tabela(tabela, metodo, passo_minutos)
+            gravar_saida_huff(df, caminho_saida, layout=layout)
+        else:
+            df = processar_csv_huff(
+                caminho_entrada, caminho_saida, layout=layout,
+                passo_minutos=passo_minutos, metodo=metodo
+            )
+        exibir_resumo_huff(df)
+        print(f"\nArquivo salvo em: {caminho_saida}")
+        return df
+    except FileNotFoundError:
+        print(f"ERRO: Arquivo não encontrado: {caminho_entrada}")
+    except Exception as e:
+        print(f"ERRO: Erro ao processar: {e}")
+    return None
+
+
+# =============================================================================
+# Escoamento (SCS-CN + Hidrograma Unitário)
+# =============================================================================
+"""
+Transforma os hietogramas (matriz passos × cenários de processar_csv_huff)
+em hidrogramas de vazão para uma ou mais bacias, todos de uma vez:
+
+    1. Chuva excedente pelo método do Número de Curva (SCS-CN), aplicado à
+       chuva acumulada de todas as colunas ao mesmo tempo:
+           S = 25400 / CN - 254 (mm),  Ia = λ·S,
+           Pe = (P - Ia)² / (P - Ia + S) para P > Ia, senão 0
+    2. Hidrograma unitário adimensional do SCS (NEH-4), com
+       Tp = Δt/2 + tempo de retardo e qp = 0,208·A/Tp (m³/s por mm),
+       normalizado para que 1 mm de excesso gere exatamente 1 mm de volume.
+    3. Convolução de todas as colunas de todas as bacias com o hidrograma
+       unitário de cada bacia por FFT (scipy.signal.fftconvolve, no eixo do
+       tempo), em vez da soma direta O(n²) coluna a coluna.
+"""
+# Hidrograma unitário adimensional do SCS: t/Tp e q/qp
+SCS_HU_TEMPO = np.array([
+    0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4, 1.5,
+    1.6, 1.7, 1.8, 1.9, 2.0, 2.2, 2.4, 2.6, 2.8, 3.0, 3.2, 3.4, 3.6, 3.8, 4.0, 4.5, 5.0,
+])
+SCS_HU_VAZAO = np.array([
+    0.0, 0.030, 0.100, 0.190, 0.310, 0.470, 0.660, 0.820, 0.930, 0.990, 1.000, 0.990,
+    0.930, 0.860, 0.780, 0.680, 0.560, 0.460, 0.390, 0.330, 0.280, 0.207, 0.147, 0.107,
+    0.077, 0.055, 0.040, 0.029, 0.021, 0.015, 0.011, 0.005, 0.0,
+])
+RAZAO_ABSTRACAO_INICIAL = 0.2
+# Bacias por FFT (limita a memória: bacias × passos × cenários)
+TAMANHO_BLOCO_BACIAS = 16
+COLUNAS_BACIAS_ESCOAMENTO = ['bacia', 'cn', 'area_km2', 'tempo_retardo_min']
+
+
+def chuva_excedente_scs(
+    chuva: np.ndarray, cn, razao_abstracao: float = RAZAO_ABSTRACAO_INICIAL
+) -> np.ndarray:
+    """
+    Chuva excedente (mm por passo) pelo método SCS-CN.
+
+    Parâmetros:
+        chuva: Chuva por passo (mm), forma (n_passos, n_colunas)
+        cn: Número de Curva de cada bacia, forma (n_bacias,)
+        razao_abstracao: λ da abstração inicial (Ia = λ·S)
+
+    Retorna:
+        Array (n_bacias, n_passos, n_colunas)
+    """
+    cn = np.atleast_1d(np.asarray(cn, dtype=float))
+    if np.any((cn <= 0) | (cn > 100)):
+        raise ValueError("CN deve estar no intervalo (0, 100]")
+    s = (25400.0 / cn - 254.0)[:, np.newaxis, np.newaxis]
+    ia = razao_abstracao * s
+    acumulada = np.cumsum(np.nan_to_num(chuva), axis=0)[np.newaxis]
+    excesso = np.clip(acumulada - ia, 0.0, None)
+    excesso_acumulado = np.divide(
+        excesso ** 2, excesso + s, out=np.zeros(np.broadcast_shapes(excesso.shape, s.shape)),
+        where=(excesso + s) > 0,
+    )
+    return np.diff(excesso_acumulado, axis=1, prepend=0.0)
+
+
+def hidrograma_unitario_scs(area_km2, tempo_retardo_min, passo_minutos: float = 1) -> np.ndarray:
+    """
+    Hidrogramas unitários do SCS (m³/s por mm de excesso) de várias bacias.
+
+    A ordenada j corresponde ao tempo (j + 1)·Δt. Cada hidrograma é
+    normalizado para que sua soma × Δt seja o volume de 1 mm sobre a bacia.
+
+    Parâmetros:
+        area_km2: Área de cada bacia (km²), forma (n_bacias,)
+        tempo_retardo_min: Tempo de retardo de cada bacia (minutos)
+        passo_minutos: Intervalo de tempo em minutos
+
+    Retorna:
+        Array (n_bacias, n_ordenadas), completado com zeros após 5·Tp
+    """
+    area = np.atleast_1d(np.asarray(area_km2, dtype=float))
+    retardo = np.broadcast_to(np.asarray(tempo_retardo_min, dtype=float), area.shape)
+    tp = passo_minutos / 2 + retardo
+    n = int(np.ceil(SCS_HU_TEMPO[-1] * tp.max() / passo_minutos))
+    t = (np.arange(n) + 1) * passo_minutos
+    forma = np.interp(t[np.newaxis, :] / tp[:, np.newaxis], SCS_HU_TEMPO, SCS_HU_VAZAO)
+    volume_mm = forma.sum(axis=1, keepdims=True) * passo_minutos * 60
+    # Volume de 1 mm sobre a bacia: área (km²) × 1e6 m²/km² × 1e-3 m
+    return forma * (area[:, np.newaxis] * 1e3 / volume_mm)
+
+
+@dataclass(frozen=True)
+class ResultadoEscoamento:
+    """
+    Hidrogramas e picos de vazão de todas as bacias e cenários.
+
+    Atributos:
+        bacias: Identificadores das bacias, forma (n_bacias,).
+        colunas: Cenários (colunas da saída Huff, ex: "10,2h").
+        minutos: Tempo do fim de cada passo, forma (n_passos,).
+        precipitacao_mm: Chuva total de cada cenário, forma (n_colunas,).
+        escoamento_mm: Chuva excedente total, forma (n_bacias, n_colunas).
+        pico_m3s: Vazão de pico, forma (n_bacias, n_colunas).
+        tempo_pico_min: Instante do pico, forma (n_bacias, n_colunas); NaN
+            quando não há escoamento.
+        vazoes_m3s: Hidrogramas (n_bacias, n_passos, n_colunas), ou None
+            se calculados sem retornar_hidrogramas.
+    """
+    bacias: np.ndarray
+    colunas: list
+    minutos: np.ndarray
+    precipitacao_mm: np.ndarray
+    escoamento_mm: np.ndarray
+    pico_m3s: np.ndarray
+    tempo_pico_min: np.ndarray
+    vazoes_m3s: np.ndarray | None = None
+
+    def resumo(self) -> pd.DataFrame:
+        """Uma linha por (bacia, cenário) com chuva, escoamento e pico."""
+        n_bacias, n_colunas = self.pico_m3s.shape
+        tr, duracao = zip(*(interpretar_nome_coluna(c) for c in self.colunas)) if n_colunas else ((), ())
+        return pd.DataFrame({
+            'bacia': np.repeat(self.bacias, n_colunas),
+            'tr': np.tile(tr, n_bacias),
+            'duracao_min': np.tile(duracao, n_bacias),
+            'precipitacao_mm': np.tile(self.precipitacao_mm, n_bacias),
+            'escoamento_mm': self.escoamento_mm.ravel(),
+            'pico_m3s': self.pico_m3s.ravel(),
+            'tempo_pico_min': self.tempo_pico_min.ravel(),
+        })
+
+    def hidrograma(self, bacia=None) -> pd.DataFrame:
+        """
+        Hidrogramas de uma bacia no layout largo (minuto + uma coluna por cenário).
+
+        Exceções:
+            ValueError: Se os hidrogramas não foram retornados.
+        """
+        if self.vazoes_m3s is None:
+            raise ValueError("Hidrogramas não calculados (use retornar_hidrogramas=True)")
+        i = 0 if bacia is None else int(np.flatnonzero(self.bacias == bacia)[0])
+        df = pd.DataFrame(self.vazoes_m3s[i], columns=self.colunas)
+        df.insert(0, 'minuto', self.minutos)
+        return df
+
+
+@medir_etapa('calcular_escoamento')
+def calcular_escoamento(
+    df_huff: pd.DataFrame, cn, area_km2, tempo_retardo_min, bacias=None,
+    razao_abstracao: float = RAZAO_ABSTRACAO_INICIAL, retornar_hidrogramas: bool = True,
+    tamanho_bloco: int = TAMANHO_BLOCO_BACIAS
+) -> ResultadoEscoamento:
+    """
+    Calcula os hidrogramas de todos os cenários Huff para uma ou mais bacias.
+
+    Parâmetros:
+        df_huff: Saída larga de processar_csv_huff (minuto + uma coluna por cenário)
+        cn: Número de Curva (escalar ou um por bacia)
+        area_km2: Área da bacia em km² (escalar ou uma por bacia)
+        tempo_retardo_min: Tempo de retardo em minutos (escalar ou um por bacia)
+        bacias: Identificadores das bacias (padrão: posição)
+        razao_abstracao: λ da abstração inicial (padrão: 0,2)
+        retornar_hidrogramas: Se False, guarda apenas os picos (menos memória)
+        tamanho_bloco: Bacias processadas por FFT
+
+    Retorna:
+        ResultadoEscoamento
+    """
+    from scipy.signal import fftconvolve
+
+    colunas = [c for c in df_huff.columns if c not in ('minuto', 'sitio')]
+    chuva = np.nan_to_num(df_huff[colunas].to_numpy(dtype=float))
+    passo = float(df_huff['minuto'].iloc[0]) if len(df_huff) else 1.0
+    cn, area, retardo = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(cn, dtype=float)),
+        np.atleast_1d(np.asarray(area_km2, dtype=float)),
+        np.atleast_1d(np.asarray(tempo_retardo_min, dtype=float)),
+    )
+    n_bacias = len(cn)
+    bacias = np.arange(n_bacias) if bacias is None else np.asarray(bacias)
+
+    hidrogramas = hidrograma_unitario_scs(area, retardo, passo)
+    minutos = tempos_dos_passos(len(chuva) + hidrogramas.shape[1] - 1, passo)
+    escoamento = np.empty((n_bacias, len(colunas)))
+    pico = np.empty_like(escoamento)
+    tempo_pico = np.empty_like(escoamento)
+    vazoes = (
+        np.empty((n_bacias, len(minutos), len(colunas)), dtype=np.float32)
+        if retornar_hidrogramas else None
+    )
+    for inicio in range(0, n_bacias, tamanho_bloco):
+        bloco = slice(inicio, inicio + tamanho_bloco)
+        excesso = chuva_excedente_scs(chuva, cn[bloco], razao_abstracao)
+        # Convolução no eixo do tempo de (b, n, c) com (b, m, 1); o corte em
+        # zero remove o ruído de arredondamento da FFT
+        vazao = np.clip(fftconvolve(excesso, hidrogramas[bloco, :, np.newaxis], axes=1), 0.0, None)
+        if retornar_hidrogramas:
+            vazoes[bloco] = vazao
+        escoamento[bloco] = excesso.sum(axis=1)
+        indice_pico = vazao.argmax(axis=1)
+        pico[bloco] = np.take_along_axis(vazao, indice_pico[:, np.newaxis], axis=1)[:, 0]
+        tempo_pico[bloco] = np.where(pico[bloco] > 0, minutos[indice_pico], np.nan)
+
+    return ResultadoEscoamento(
+        bacias=bacias, colunas=colunas, minutos=minutos,
+        precipitacao_mm=chuva.sum(axis=0), escoamento_mm=escoamento,
+        pico_m3s=pico, tempo_pico_min=tempo_pico, vazoes_m3s=vazoes,
+    )
+
+
+# =============================================================================
+# Armazém Pré-calculado (Binário)
+# =============================================================================
+"""
+Todas as tabelas IDF e todos os hietogramas Huff de todas as zonas,
+calculados uma única vez e gravados em um único arquivo binário, lido
+com np.memmap: as consultas retornam fatias do arquivo, sem cópia.
+
+Layout do arquivo:
+    MAGIC (8 bytes) | tamanho do cabeçalho (uint64) | cabeçalho JSON |
+    blocos de dados alinhados em 64 bytes
+
+O cabeçalho traz o hash das entradas (CSVs, coeficientes de Huff,
+durações e FATOR_1DIA_24H), as zonas, os tempos de retorno, as durações e a posição de cada
+bloco:
+    idf       float64 (n_zonas, n_duracoes, n_tr)   precipitações em mm
+    indice    int64   (n_zonas, n_duracoes, n_tr, 2) início e tamanho de
+                      cada hietograma no bloco huff
+    huff      float64 (total,)                       hietogramas concatenados
+"""
+MAGIC_ARMAZEM_PRECALCULADO = b'PRECIDF1'
+VERSAO_ARMAZEM_PRECALCULADO = 1
+ALINHAMENTO_ARMAZEM = 64
+# Caminho padrão (arquivo recriável, fora das saídas versionadas)
+CAMINHO_ARMAZEM_PRECALCULADO = os.path.join(DIRETORIO_CACHE, 'armazem_precalculado.bin')
+
+
+def calcular_hash_entradas(caminho_precipitacao: str = None, caminho_coeficientes: str = None) -> str:
+    """
+    Calcula o hash (sha256) das entradas gravadas no armazém pré-calculado.
+
+    Inclui os dois CSVs, os coeficientes das curvas de Huff, as durações e
+    FATOR_1DIA_24H, de modo que qualquer alteração em um deles invalida os
+    resultados pré-calculados. O shapefile não entra: o armazém é indexado
+    por zona e não depende das geometrias.
+
+    Retorna:
+        Hash hexadecimal
+    """
+    h = hashlib.sha256()
+    _atualizar_hash_arquivos(h, [
+        caminho_precipitacao or CSV_PRECIPITACAO,
+        caminho_coeficientes or CSV_COEFICIENTES,
+    ])
+    _atualizar_hash_curvas_huff(h)
+    h.update(np.asarray(DURACOES_HORAS, dtype=np.float64).tobytes())
+    h.update(np.float64(FATOR_1DIA_24H).tobytes())
+    return h.hexdigest()
+
+
+def _atualizar_hash_curvas_huff(h) -> None:
+    """Acrescenta os coeficientes das curvas de Huff ao hash h."""
+    for curva in sorted(CURVAS_HUFF):
+        for limite, inclusivo, coefs in CURVAS_HUFF[curva]:
+            h.update(f'{curva}|{limite}|{inclusivo}'.encode())
+            h.update(np.asarray(coefs, dtype=np.float64).tobytes())
+
+
+def _alinhar(posicao: int) -> int:
+    return -(-posicao // ALINHAMENTO_ARMAZEM) * ALINHAMENTO_ARMAZEM
+
+
+@medir_etapa('construir_armazem_precalculado')
+def construir_armazem_precalculado(caminho: str) -> 'ArmazemPrecalculado':
+    """
+    Pré-calcula as tabelas IDF e os hietogramas Huff de todas as zonas.
+
+    Parâmetros:
+        caminho: Arquivo binário de saída
+
+    Retorna:
+        ArmazemPrecalculado aberto sobre o arquivo gravado
+    """
+    armazem = obter_armazem()
+    zonas = list(armazem.zonas)
+    tabelas, tempos_retorno, duracoes = _tabelas_por_zona(zonas)
+    idf = np.ascontiguousarray(tabelas[:-1].transpose(0, 2, 1), dtype=np.float64)
+
+    # Hietogramas na ordem (zona, duração, TR); células NaN ficam vazias
+    indice = np.zeros(idf.shape + (2,), dtype=np.int64)
+    hietogramas, posicao = [], 0
+    for (z, d, t), precipitacao in np.ndenumerate(idf):
+        if np.isnan(precipitacao):
+            continue
+        chuva = distribuir_chuva_huff(precipitacao, duracoes[d])
+        indice[z, d, t] = (posicao, len(chuva))
+        hietogramas.append(chuva)
+        posicao += len(chuva)
+    huff = np.concatenate(hietogramas) if hietogramas else np.empty(0)
+
+    blocos = {'idf': idf, 'indice': indice, 'huff': huff}
+    cabecalho = {
+        'versao': VERSAO_ARMAZEM_PRECALCULADO,
+        'hash_entradas': calcular_hash_entradas(
+            armazem.caminho_precipitacao, armazem.caminho_coeficientes
+        ),
+        'zonas': zonas,
+        'tempos_retorno': tempos_retorno.tolist(),
+        'duracoes_horas': duracoes.tolist(),
+        'blocos': {},
+    }
+    # O tamanho do cabeçalho depende dos deslocamentos dos blocos: a reserva
+    # cresce até que o cabeçalho caiba antes do primeiro bloco.
+    reserva = 0
+    while True:
+        inicio = _alinhar(16 + reserva)
+        for nome, dados in blocos.items():
+            cabecalho['blocos'][nome] = {
+                'deslocamento': inicio, 'forma': list(dados.shape), 'dtype': dados.dtype.str,
+            }
+            inicio = _alinhar(inicio + dados.nbytes)
+        texto = json.dumps(cabecalho).encode('utf-8')
+        if len(texto) <= reserva:
+            break
+        reserva = len(texto)
+
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    os.makedirs(diretorio, exist_ok=True)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'wb') as f:
+        f.write(MAGIC_ARMAZEM_PRECALCULADO)
+        f.write(np.uint64(len(texto)).tobytes())
+        f.write(texto)
+        for nome, dados in blocos.items():
+            f.seek(cabecalho['blocos'][nome]['deslocamento'])
+            f.write(dados.tobytes())
+    os.replace(temporario, caminho)
+    return ArmazemPrecalculado(caminho)
+
+
+class ArmazemPrecalculado:
+    """
+    Tabelas IDF e hietogramas Huff pré-calculados, lidos com np.memmap.
+
+    Abrir o arquivo lê apenas o cabeçalho; tabela() e hietograma() retornam
+    fatias somente leitura do mapeamento, sem copiar nem recalcular.
+    esta_atualizado() só recalcula o hash das entradas quando o mtime ou o
+    tamanho de um dos CSVs muda.
+
+    Parâmetros:
+        caminho: Arquivo gravado por construir_armazem_precalculado
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        with open(caminho, 'rb') as f:
+            if f.read(8) != MAGIC_ARMAZEM_PRECALCULADO:
+                raise ValueError(f"Arquivo não é um armazém pré-calculado: {caminho}")
+            tamanho = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            self.cabecalho = json.loads(f.read(tamanho).decode('utf-8'))
+        if self.cabecalho.get('versao') != VERSAO_ARMAZEM_PRECALCULADO:
+            raise ValueError(f"Versão do armazém não suportada: {self.cabecalho.get('versao')}")
+
+        self.hash_entradas = self.cabecalho['hash_entradas']
+        self.zonas = self.cabecalho['zonas']
+        self._indice_zonas = {zona: i for i, zona in enumerate(self.zonas)}
+        self.tempos_retorno = np.array(self.cabecalho['tempos_retorno'], dtype=int)
+        self.duracoes_horas = np.array(self.cabecalho['duracoes_horas'], dtype=float)
+        self._indice_tr = {int(tr): i for i, tr in enumerate(self.tempos_retorno)}
+        self._indice_duracao = {round(d * 60): i for i, d in enumerate(self.duracoes_horas)}
+        self.idf = self._mapear('idf')
+        self.indice = self._mapear('indice')
+        self.huff = self._mapear('huff')
+        self._assinatura_verificada = None
+
+    def _mapear(self, nome: str) -> np.ndarray:
+        bloco = self.cabecalho['blocos'][nome]
+        forma = tuple(bloco['forma'])
+        if 0 in forma:
+            return np.empty(forma, dtype=bloco['dtype'])
+        return np.memmap(
+            self.caminho, dtype=bloco['dtype'], mode='r',
+            offset=bloco['deslocamento'], shape=forma,
+        )
+
+    @staticmethod
+    def _assinatura_entradas(caminhos) -> tuple:
+        """(mtime, tamanho) de cada CSV de entrada."""
+        return tuple((estado.st_mtime_ns, estado.st_size) for estado in map(os.stat, caminhos))
+
+    def esta_atualizado(self) -> bool:
+        """
+        Indica se o arquivo corresponde às entradas atuais (hash).
+
+        Enquanto mtime e tamanho dos CSVs forem os da última verificação
+        bem-sucedida, o hash não é recalculado.
+        """
+        armazem = obter_armazem()
+        caminhos = (armazem.caminho_precipitacao, armazem.caminho_coeficientes)
+        assinatura = self._assinatura_entradas(caminhos)
+        if assinatura == self._assinatura_verificada:
+            return True
+        if self.hash_entradas != calcular_hash_entradas(*caminhos):
+            return False
+        self._assinatura_verificada = assinatura
+        return True
+
+    def _posicao(self, zona: str, tempo_retorno: int, duracao_horas: float) -> tuple[int, int, int]:
+        """Converte (zona, TR, duração) em índices dos blocos."""
+        chave_zona = zona.strip().upper()
+        if chave_zona not in self._indice_zonas:
+            raise ValueError(f"Zona '{zona}' não encontrada. Zonas: {self.zonas}")
+        try:
+            return (
+                self._indice_zonas[chave_zona],
+                self._indice_duracao[round(duracao_horas * 60)],
+                self._indice_tr[int(tempo_retorno)],
+            )
+        except KeyError as e:
+            raise KeyError(f"TR ou duração não pré-calculados: {e}") from None
+
+    def tabela(self, zona: str) -> TabelaIDF:
+        """Retorna a TabelaIDF da zona (valores sem cópia)."""
+        chave_zona = zona.strip().upper()
+        if chave_zona not in self._indice_zonas:
+            raise ValueError(f"Zona '{zona}' não encontrada. Zonas: {self.zonas}")
+        return TabelaIDF(
+            self.duracoes_horas, self.tempos_retorno, self.idf[self._indice_zonas[chave_zona]]
+        )
+
+    def precipitacao(self, zona: str, tempo_retorno: int, duracao_horas: float) -> float:
+        """Retorna a precipitação (mm) de uma zona, TR e duração."""
+        return float(self.idf[self._posicao(zona, tempo_retorno, duracao_horas)])
+
+    def hietograma(self, zona: str, tempo_retorno: int, duracao_horas: float) -> np.ndarray:
+        """
+        Retorna o hietograma Huff (mm por minuto) sem cópia.
+
+        Equivale a distribuir_chuva_huff(precipitacao(...), duracao_horas).
+        """
+        inicio, tamanho = self.indice[self._posicao(zona, tempo_retorno, duracao_horas)]
+        return self.huff[inicio:inicio + tamanho]
+
+
+# Armazéns pré-calculados já abertos, por caminho
+_ARMAZENS_PRECALCULADOS: dict[str, ArmazemPrecalculado] = {}
+
+
+def obter_armazem_precalculado(caminho: str = None) -> ArmazemPrecalculado:
+    """
+    Abre o armazém pré-calculado, reconstruindo-o se estiver ausente ou
+    desatualizado em relação às entradas (hash).
+
+    Parâmetros:
+        caminho: Arquivo binário (padrão: CAMINHO_ARMAZEM_PRECALCULADO)
+
+    Retorna:
+        ArmazemPrecalculado válido para as entradas atuais
+    """
+    caminho = caminho or CAMINHO_ARMAZEM_PRECALCULADO
+    armazem = _ARMAZENS_PRECALCULADOS.get(caminho)
+    if armazem is None and os.path.exists(caminho):
+        try:
+            armazem = ArmazemPrecalculado(caminho)
+        except (ValueError, KeyError, json.JSONDecodeError):
+            armazem = None
+    if armazem is None or not armazem.esta_atualizado():
+        armazem = construir_armazem_precalculado(caminho)
+    _ARMAZENS_PRECALCULADOS[caminho] = armazem
+    return armazem
+
+
+# =============================================================================
+# Atualização Incremental das Saídas
+# =============================================================================
+"""
+Regrava em DIRETORIO_SAIDA_INCREMENTAL apenas as saídas cujas entradas mudaram.
+
+Um manifesto (manifesto.json) guarda:
+    entradas   hash de cada (zona, TR): linha de coeficientes da zona e TR,
+               linha de precipitação do TR, FATOR_1DIA_24H e durações
+    artefatos  para cada arquivo gerado, o hash das entradas de que ele
+               depende e a assinatura do arquivo (sha256, tamanho, mtime)
+
+Cada zona gera precipitacao_zona_<Z>.csv (tabela IDF) e
+precipitacao_huff_zona_<Z>.csv (distribuição Huff, que depende também das
+curvas de Huff e do passo). Alterar a linha de uma zona no CSV de
+coeficientes regrava apenas os arquivos dessa zona; alterar a precipitação
+de um TR regrava todas as zonas (todas usam aquele TR). Arquivos que faltam
+ou foram alterados fora do processo também são regravados.
+"""
+ARQUIVO_MANIFESTO = 'manifesto.json'
+VERSAO_MANIFESTO = 1
+
+
+def _hash_texto(*partes) -> str:
+    """sha256 da representação textual das partes."""
+    return hashlib.sha256('|'.join(map(repr, partes)).encode('utf-8')).hexdigest()
+
+
+def _hash_curvas_huff() -> str:
+    """sha256 dos coeficientes das curvas de Huff."""
+    h = hashlib.sha256()
+    _atualizar_hash_curvas_huff(h)
+    return h.hexdigest()
+
+
+def _assinatura_arquivo(caminho: str, sha256: str = None) -> dict:
+    """sha256, tamanho e mtime de um arquivo gerado."""
+    if sha256 is None:
+        h = hashlib.sha256()
+        with open(caminho, 'rb') as f:
+            for bloco in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloco)
+        sha256 = h.hexdigest()
+    estado = os.stat(caminho)
+    return {'sha256': sha256, 'tamanho': estado.st_size, 'mtime_ns': estado.st_mtime_ns}
+
+
+def calcular_hashes_zona_tr(armazem: ArmazemCoeficientes = None) -> dict[str, dict[int, str]]:
+    """
+    Calcula o hash das entradas de cada (zona, TR).
+
+    Parâmetros:
+        armazem: Armazém dos CSVs (padrão: obter_armazem())
+
+    Retorna:
+        Dicionário {zona: {tempo_retorno: hash}}
+    """
+    armazem = armazem or obter_armazem()
+    zonas = armazem.zonas
+    df_precip = armazem.df_precipitacao
+    tempos_retorno = df_precip['tempo_retorno'].to_numpy().astype(int)
+    precipitacoes = df_precip['precipitacao'].to_numpy(dtype=float)
+    c_1h, c_6min = armazem.matriz_coeficientes(zonas, tempos_retorno)
+    comum = _hash_texto(FATOR_1DIA_24H, [float(d) for d in DURACOES_HORAS])
+
+    hashes = {}
+    for i, zona in enumerate(zonas):
+        por_tr = hashes.setdefault(zona, {})
+        for j, tr in enumerate(tempos_retorno.tolist()):
+            linha = _hash_texto(
+                float(precipitacoes[j]), float(c_1h[i, j]), float(c_6min[i, j]), comum
+            )
+            # TR repetido no CSV: o hash cobre todas as linhas
+            por_tr[tr] = _hash_texto(por_tr[tr], linha) if tr in por_tr else linha
+    return hashes
+
+
+def _ler_manifesto(caminho: str) -> dict:
+    """Lê o manifesto; ausente, corrompido ou de outra versão equivale a vazio."""
+    vazio = {'versao': VERSAO_MANIFESTO, 'entradas': {}, 'artefatos': {}}
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            manifesto = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return vazio
+    return manifesto if manifesto.get('versao') == VERSAO_MANIFESTO else vazio
+
+
+def _artefato_atualizado(caminho: str, registro: dict | None, hash_entradas: str) -> bool:
+    """
+    Indica se o arquivo corresponde ao registro do manifesto.
+
+    Tamanho e mtime iguais dispensam a leitura; com mtime diferente, o
+    conteúdo é comparado pelo sha256 (e o registro é atualizado).
+    """
+    if registro is None or registro.get('hash_entradas') != hash_entradas:
+        return False
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        return False
+    if estado.st_size != registro['tamanho']:
+        return False
+    if estado.st_mtime_ns == registro['mtime_ns']:
+        return True
+    if _assinatura_arquivo(caminho)['sha256'] != registro['sha256']:
+        return False
+    registro['mtime_ns'] = estado.st_mtime_ns
+    return True
+
+
+@medir_etapa('atualizar_saidas')
+def atualizar_saidas(
+    diretorio_saida: str = None, zonas=None, passo_minutos: float = 1,
+    huff: bool = True, forcar: bool = False
+) -> dict:
+    """
+    Gera as tabelas e distribuições Huff das zonas, regravando apenas o que mudou.
+
+    Parâmetros:
+        diretorio_saida: Diretório das saídas e do manifesto
+            (padrão: DIRETORIO_SAIDA_INCREMENTAL)
+        zonas: Zonas a atualizar (padrão: todas as do CSV de coeficientes)
+        passo_minutos: Intervalo da distribuição Huff em minutos
+        huff: Se False, gera apenas as tabelas de precipitação
+        forcar: Regrava tudo, ignorando o manifesto
+
+    Retorna:
+        Dicionário com 'gravados' e 'ignorados' (nomes dos arquivos) e
+        'tr_alterados' ({zona: TRs cujas entradas mudaram desde a última execução})
+
+    Exceções:
+        ValueError: Se alguma zona não existir no CSV de coeficientes.
+    """
+    diretorio = diretorio_saida or DIRETORIO_SAIDA_INCREMENTAL
+    os.makedirs(diretorio, exist_ok=True)
+    caminho_manifesto = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    manifesto = _ler_manifesto(caminho_manifesto)
+    hashes = calcular_hashes_zona_tr()
+    if zonas is None:
+        zonas = list(hashes)
+    zonas = [str(z).strip().upper() for z in zonas]
+    desconhecidas = [z for z in zonas if z not in hashes]
+    if desconhecidas:
+        raise ValueError(f"Zonas não encontradas: {desconhecidas}. Zonas: {list(hashes)}")
+
+    hash_curvas = _hash_curvas_huff()
+    relatorio = {'gravados': [], 'ignorados': [], 'tr_alterados': {}}
+    for zona in zonas:
+        por_tr = {str(tr): h for tr, h in hashes[zona].items()}
+        anteriores = manifesto['entradas'].get(zona, {})
+        alterados = sorted(int(tr) for tr, h in por_tr.items() if anteriores.get(tr) != h)
+        if alterados:
+            relatorio['tr_alterados'][zona] = alterados
+
+        hash_tabela = _hash_texto('tabela', sorted(por_tr.items()))
+        artefatos = {f"precipitacao_zona_{zona}.csv": hash_tabela}
+        if huff:
+            artefatos[f"precipitacao_huff_zona_{zona}.csv"] = _hash_texto(
+                'huff', hash_tabela, hash_curvas, float(passo_minutos)
+            )
+
+        tabela = None
+        for nome, hash_entradas in artefatos.items():
+            caminho = os.path.join(diretorio, nome)
+            if not forcar and _artefato_atualizado(
+                caminho, manifesto['artefatos'].get(nome), hash_entradas
+            ):
+                relatorio['ignorados'].append(nome)
+                continue
+            if tabela is None:
+                tabela = calcular_tabela_zona(zona)
+            if nome.startswith('precipitacao_huff_'):
+                gravar_saida_huff(distribuir_tabela_huff(tabela, passo_minutos), caminho)
+            else:
+                tabela.gravar_csv(caminho)
+            manifesto['artefatos'][nome] = {'hash_entradas': hash_entradas, **_assinatura_arquivo(caminho)}
+            relatorio['gravados'].append(nome)
+        manifesto['entradas'][zona] = por_tr
+
+    temporario = caminho_manifesto + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=1, sort_keys=True)
+    os.replace(temporario, caminho_manifesto)
+    return relatorio
+
+
+# =============================================================================
+# Pipeline em Lote (Paralelo)
+# =============================================================================
+"""
+Executa Isozona -> Precipitação -> Distribuição Huff para uma lista de
+sítios, sem interação e sem arquivos intermediários. Os sítios são
+divididos em lotes distribuídos entre processos; cada processo carrega
+o shapefile e os CSVs uma única vez.
+"""
+# Estado de cada processo trabalhador (preenchido por _inicializar_trabalhador)
+_ESTADO_TRABALHADOR = {}
+
+
+def _inicializar_trabalhador(
+    caminho_shapefile: str, caminho_precipitacao: str, caminho_coeficientes: str,
+    caminho_estacoes: str = None, k_estacoes: int = 1
+) -> None:
+    """Carrega shapefile e CSVs uma única vez por processo trabalhador."""
+    _ESTADO_TRABALHADOR.clear()
+    _ESTADO_TRABALHADOR['localizador'] = obter_localizador(caminho_shapefile)
+    _ESTADO_TRABALHADOR['armazem'] = obter_armazem(caminho_precipitacao, caminho_coeficientes)
+    _ESTADO_TRABALHADOR['estacoes'] = (
+        obter_armazem_estacoes(caminho_estacoes) if caminho_estacoes else None
+    )
+    _ESTADO_TRABALHADOR['k_estacoes'] = k_estacoes
+    # Sem precipitação por sítio, todos os sítios de uma zona têm a mesma saída
+    _ESTADO_TRABALHADOR['huff_por_zona'] = {}
+
+
+def _tabelas_por_estacao(resumo: pd.DataFrame) -> dict[int, TabelaIDF]:
+    """
+    Calcula, em lote, a TabelaIDF de cada sítio a partir das estações.
+
+    Preenche as colunas estacao e distancia_km do resumo e retorna as
+    tabelas por posição do sítio no lote (apenas sítios com zona).
+    """
+    estacoes = _ESTADO_TRABALHADOR['estacoes']
+    precipitacoes, indice, distancia = estacoes.consultar_lote(
+        resumo['lat'].to_numpy(), resumo['lon'].to_numpy(), _ESTADO_TRABALHADOR['k_estacoes']
+    )
+    resumo['estacao'] = pd.Series(
+        np.where(indice >= 0, np.asarray(estacoes.estacoes, dtype=object)[indice], None),
+        dtype=object,
+    )
+    resumo['distancia_km'] = distancia
+
+    com_zona = np.flatnonzero(resumo['ZONA'].notna().to_numpy())
+    duracoes = np.asarray(DURACOES_HORAS, dtype=float)
+    valores = calcular_tabelas_sitios(
+        resumo['ZONA'].to_numpy()[com_zona], precipitacoes[com_zona],
+        estacoes.tempos_retorno, duracoes, _ESTADO_TRABALHADOR['armazem'],
+    )
+    return {
+        int(i): TabelaIDF(duracoes, estacoes.tempos_retorno, valores[n])
+        for n, i in enumerate(com_zona)
+    }
+
+
+def _huff_da_zona(zona: str, layout: str, passo_minutos: float = 1) -> pd.DataFrame:
+    """
+    Calcula (ou reaproveita) a distribuição Huff de uma zona no trabalhador,
+    já convertida para o layout de saída.
+    """
+    cache = _ESTADO_TRABALHADOR['huff_por_zona']
+    chave = (zona, layout, passo_minutos)
+    if chave not in cache:
+        df_zona = _ESTADO_TRABALHADOR['armazem'].dados_zona(zona)
+        df_huff = distribuir_tabela_huff(
+            TabelaIDF.de_precipitacao_base(calcular_precipitacao_base(df_zona)), passo_minutos
+        )
+        if layout == 'longo':
+            df_huff = huff_para_formato_longo(df_huff)
+        cache[chave] = df_huff
+    return cache[chave]
+
+
+def _processar_lote_sitios(
+    numero_lote: int, sitios: pd.DataFrame, diretorio_saida: str,
+    formato: str, layout: str, por_sitio: bool, passo_minutos: float = 1
+) -> pd.DataFrame:
+    """
+    Processa um lote de sítios em um trabalhador.
+
+    Retorna:
+        DataFrame de resumo (sitio, ZONA, situacao_isozona, arquivo, erro)
+    """
+    zonas = _ESTADO_TRABALHADOR['localizador'].consultar_lote(
+        sitios['lat'].to_numpy(), sitios['lon'].to_numpy()
+    )
+    resumo = pd.concat([sitios.reset_index(drop=True), zonas], axis=1)
+    resumo['arquivo'] = None
+    resumo['erro'] = None
+
+    tabelas = _tabelas_por_estacao(resumo) if _ESTADO_TRABALHADOR['estacoes'] else None
+    zonas_validas = set(_ESTADO_TRABALHADOR['armazem'].zonas)
+
+    escritor = None
+    if not por_sitio:
+        caminho = os.path.join(diretorio_saida, f"parte_{numero_lote:05d}.{formato}")
+        escritor = EscritorHuff(caminho, layout=layout)
+    try:
+        for i, (sitio, zona, situacao, candidatas) in enumerate(zip(
+            resumo['sitio'], resumo['ZONA'], resumo['situacao_isozona'], resumo['zonas_candidatas']
+        )):
+            if zona is None:
+                if situacao == 'fronteira':
+                    resumo.at[i, 'erro'] = f'coordenada na fronteira entre isozonas ({candidatas})'
+                else:
+                    resumo.at[i, 'erro'] = 'coordenada fora das isozonas'
+                continue
+            try:
+                if tabelas is None:
+                    df_huff = _huff_da_zona(zona, layout, passo_minutos)
+                elif zona.strip().upper() not in zonas_validas:
+                    raise ValueError(f"Zona '{zona}' não encontrada. Zonas: {sorted(zonas_validas)}")
+                else:
+                    df_huff = distribuir_tabela_huff(tabelas[i], passo_minutos)
+                    if layout == 'longo':
+                        df_huff = huff_para_formato_longo(df_huff)
+            except ValueError as e:
+                resumo.at[i, 'erro'] = str(e)
+                continue
+            if por_sitio:
+                caminho = os.path.join(diretorio_saida, f"huff_{sitio}.{formato}")
+                gravar_saida_huff(df_huff, caminho, layout=layout)
+            else:
+                escritor.acrescentar(df_huff, sitio)
+            resumo.at[i, 'arquivo'] = caminho
+    finally:
+        if escritor is not None:
+            escritor.fechar()
+    return resumo
+
+
+def executar_pipeline_lote(
+    df_sitios: pd.DataFrame,
+    diretorio_saida: str,
+    processos: int = None,
+    tamanho_lote: int = 1000,
+    formato: str = 'parquet',
+    layout: str = 'longo',
+    por_sitio: bool = False,
+    passo_minutos: float = 1,
+    caminho_estacoes: str = None,
+    k_estacoes: int = 1,
+) -> pd.DataFrame:
+    """
+    Executa o encadeamento completo para vários sítios em paralelo.
+
+    Os sítios são divididos em lotes de tamanho_lote e distribuídos em um
+    ProcessPoolExecutor. A saída Huff de cada lote vai para um arquivo
+    parte_NNNNN (ou um arquivo por sítio com por_sitio=True) em
+    diretorio_saida, e o progresso é exibido conforme os lotes terminam.
+
+    Argumentos:
+        df_sitios: Sítios com colunas lat/lon e, opcionalmente, id/sitio.
+        diretorio_saida: Diretório das saídas (criado se não existir).
+        processos: Número de processos (padrão: número de CPUs; 1 = sem pool).
+        tamanho_lote: Número de sítios por lote.
+        formato: 'parquet' ou 'csv'.
+        layout: 'longo' ou 'largo' (ver gravar_saida_huff).
+        por_sitio: Se True, grava um arquivo por sítio.
+        passo_minutos: Intervalo de tempo da distribuição Huff em minutos.
+        caminho_estacoes: CSV de estações; se informado, cada sítio usa a
+            precipitação da(s) estação(ões) mais próxima(s) (ver ArmazemEstacoes).
+        k_estacoes: Número de estações da média ponderada (1 = mais próxima).
+
+    Retornos:
+        DataFrame de resumo com uma linha por sítio.
+
+    Exceções:
+        ValueError: Se as colunas de latitude/longitude não forem encontradas.
+    """
+    col_lat = _encontrar_coluna(df_sitios, ('lat', 'latitude'))
+    col_lon = _encontrar_coluna(df_sitios, ('lon', 'long', 'longitude'))
+    if col_lat is None or col_lon is None:
+        raise ValueError(
+            "Colunas de coordenadas não encontradas. "
+            "Esperadas: lat/latitude e lon/longitude"
+        )
+    col_id = _encontrar_coluna(df_sitios, ('id', 'sitio', 'site', 'codigo'))
+    sitios = pd.DataFrame({
+        'sitio': df_sitios[col_id].to_numpy() if col_id else np.arange(len(df_sitios)),
+        'lat': pd.to_numeric(df_sitios[col_lat], errors='coerce').to_numpy(),
+        'lon': pd.to_numeric(df_sitios[col_lon], errors='coerce').to_numpy(),
+    })
+    os.makedirs(diretorio_saida, exist_ok=True)
+    processos = processos or os.cpu_count() or 1
+    lotes = [
+        (numero, sitios.iloc[inicio:inicio + tamanho_lote])
+        for numero, inicio in enumerate(range(0, len(sitios), tamanho_lote))
+    ]
+    argumentos_inicio = (
+        SHAPEFILE_PATH, CSV_PRECIPITACAO, CSV_COEFICIENTES, caminho_estacoes, k_estacoes
+    )
+    argumentos_lote = (diretorio_saida, formato, layout, por_sitio, passo_minutos)
+
+    inicio = time.perf_counter()
+    resumos = {}
+    concluidos = 0
+
+    def registrar(numero: int, resumo: pd.DataFrame) -> None:
+        nonlocal concluidos
+        resumos[numero] = resumo
+        concluidos += len(resumo)
+        decorrido = time.perf_counter() - inicio
+        print(
+            f"   {concluidos}/{len(sitios)} sítios "
+            f"({concluidos / decorrido:.1f} sítios/s)", flush=True
+        )
+
+    if processos == 1:
+        _inicializar_trabalhador(*argumentos_inicio)
+        for numero, lote in lotes:
+            registrar(numero, _processar_lote_sitios(numero, lote, *argumentos_lote))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=processos,
+            initializer=_inicializar_trabalhador,
+            initargs=argumentos_inicio,
+        ) as executor:
+            futuros = {
+                executor.submit(_processar_lote_sitios, numero, lote, *argumentos_lote): numero
+                for numero, lote in lotes
+            }
+            for futuro in as_completed(futuros):
+                registrar(futuros[futuro], futuro.result())
+
+    decorrido = time.perf_counter() - inicio
+    resumo = pd.concat(
+        [resumos[numero] for numero in sorted(resumos)], ignore_index=True
+    ) if resumos else sitios
+    print(
+        f"\nConcluído: {len(sitios)} sítios em {decorrido:.2f} s "
+        f"({len(sitios) / max(decorrido, 1e-9):.1f} sítios/s, {processos} processos)"
+    )
+    return resumo
+
+
+# =============================================================================
+# Serviço de Consultas (HTTP)
+# =============================================================================
+"""
+Serviço HTTP/JSON local (apenas biblioteca padrão: asyncio) que mantém em
+memória o shapefile indexado, as tabelas IDF de todas as zonas e o cache
+de hietogramas unitários, evitando a carga a cada consulta.
+
+Endpoints (GET com parâmetros na URL; POST com uma lista JSON de consultas
+com os mesmos parâmetros, respondida em uma única chamada):
+    /isozona   lat, lon                          -> zona
+    /idf       zona ou lat/lon                   -> tabela de precipitação
+    /huff      precipitacao e duracao (horas), ou zona (ou lat/lon), tr e
+               duracao; passo opcional (minutos)  -> hietograma (mm por passo)
+    /metricas                                    -> contagem e latências p50/p99
+
+Todas as consultas (GET e POST) são executadas em um pool de threads; o
+laço de eventos apenas lê e grava as conexões e continua atendendo outros
+clientes durante um lote longo. As consultas só leem a STRtree e as
+geometrias (preparadas uma única vez na carga), então rodam em paralelo
+sem trava.
+
+Exemplo:
+    python Main.py servico --porta 8765
+    curl "http://127.0.0.1:8765/idf?lat=-23.5&lon=-46.6"
+    curl -d '[{"lat": -23.5, "lon": -46.6}, {"lat": -5.48, "lon": -39.2}]' \
+        http://127.0.0.1:8765/isozona
+"""
+PORTA_SERVICO = 8765
+# Latências guardadas por endpoint para o cálculo dos percentis
+JANELA_METRICAS = 10_000
+TAMANHO_MAXIMO_CORPO = 16 * 2**20
+
+
+def _para_json(valores) -> list:
+    """Converte um array em listas JSON, com NaN como null."""
+    valores = np.asarray(valores, dtype=float)
+    saida = valores.astype(object)
+    saida[np.isnan(valores)] = None
+    return saida.tolist()
+
+
+def _mensagem_erro(erro: Exception) -> str:
+    """Mensagem de erro de uma consulta (KeyError = parâmetro ausente)."""
+    if isinstance(erro, KeyError):
+        return f"Parâmetro ausente: {erro.args[0]}"
+    return str(erro)
+
+
+class ServicoConsultas:
+    """
+    Consultas de isozona, tabela IDF e hietograma Huff com dados em memória.
+
+    aquecer() carrega o shapefile e abre o armazém pré-calculado (ver
+    obter_armazem_precalculado), reconstruído se as entradas mudaram. As
+    tabelas IDF e os hietogramas de passo 1 min das durações pré-calculadas
+    são fatias do arquivo; as demais consultas só fazem a busca na STRtree
+    e a interpolação. Alterações nos CSVs exigem reiniciar o serviço.
+
+    Parâmetros:
+        trabalhadores: Número de threads para as consultas
+            (padrão: o do ThreadPoolExecutor)
+        caminho_armazem: Armazém pré-calculado (padrão: CAMINHO_ARMAZEM_PRECALCULADO)
+    """
+
+    def __init__(self, trabalhadores: int = None, caminho_armazem: str = None):
+        self.executor = ThreadPoolExecutor(trabalhadores, thread_name_prefix='consulta')
+        self.caminho_armazem = caminho_armazem
+        self.armazem: ArmazemPrecalculado | None = None
+        self.tabelas: dict[str, TabelaIDF] = {}
+        self.latencias: dict[str, deque] = {}
+        self.contagem: dict[str, int] = {}
+        self.erros = 0
+        self.inicio = time.time()
+        self.rotas = {
+            '/isozona': (self.consultar_isozona, self.consultar_isozona_lote),
+            '/idf': (self.consultar_idf, None),
+            '/huff': (self.consultar_huff, None),
+        }
+
+    @medir_etapa('aquecer_servico')
+    def aquecer(self) -> None:
+        """Carrega o shapefile, abre o armazém pré-calculado e aquece o cache de hietogramas."""
+        obter_localizador()
+        self.armazem = obter_armazem_precalculado(self.caminho_armazem)
+        self.tabelas = {zona: self.armazem.tabela(zona) for zona in self.armazem.zonas}
+        for duracao in DURACOES_HORAS:
+            distribuir_chuva_huff(1.0, duracao)
+
+    # -- consultas (síncronas; rodam no pool de threads) -----------------------
+
+    def _zona(self, consulta: dict) -> str:
+        """Zona informada diretamente (zona) ou pela coordenada (lat, lon)."""
+        if consulta.get('zona'):
+            zona = str(consulta['zona']).strip().upper()
+            if zona not in self.tabelas:
+                raise ValueError(f"Zona '{zona}' não encontrada. Zonas: {list(self.tabelas)}")
+            return zona
+        lat, lon = float(consulta['lat']), float(consulta['lon'])
+        zona = obter_localizador().consultar(lat, lon)
+        if zona is None:
+            raise ValueError(f"Coordenada ({lat}, {lon}) está fora das isozonas.")
+        return zona
+
+    def consultar_isozona(self, consulta: dict) -> dict:
+        """Zona da coordenada (None fora das isozonas)."""
+        lat, lon = float(consulta['lat']), float(consulta['lon'])
+        zona = obter_localizador().consultar(lat, lon)
+        return {'lat': lat, 'lon': lon, 'zona': zona}
+
+    def consultar_isozona_lote(self, consultas: list[dict]) -> list[dict]:
+        """Zona de cada coordenada, com uma única consulta espacial."""
+        lats = np.array([float(c['lat']) for c in consultas])
+        lons = np.array([float(c['lon']) for c in consultas])
+        resultado = obter_localizador().consultar_lote(lats, lons)
+        return [
+            {'lat': lat, 'lon': lon, 'zona': zona, 'situacao': situacao}
+            for lat, lon, zona, situacao in zip(
+                lats.tolist(), lons.tolist(), resultado['ZONA'], resultado['situacao_isozona']
+            )
+        ]
+
+    def consultar_idf(self, consulta: dict) -> dict:
+        """Tabela de precipitação (mm) da zona."""
+        zona = self._zona(consulta)
+        tabela = self.tabelas[zona]
+        return {
+            'zona': zona,
+            'duracoes_horas': tabela.duracoes_horas.tolist(),
+            'tempos_retorno': tabela.tempos_retorno.tolist(),
+            'precipitacao_mm': _para_json(tabela.valores),
+        }
+
+    def consultar_huff(self, consulta: dict) -> dict:
+        """Hietograma Huff de uma precipitação informada ou da tabela da zona."""
+        duracao = float(consulta['duracao'])
+        passo = float(consulta.get('passo', 1))
+        resultado = {'duracao_horas': duracao, 'passo_minutos': passo}
+        chuva = None
+        if 'precipitacao' in consulta:
+            precipitacao = float(consulta['precipitacao'])
+        else:
+            zona = self._zona(consulta)
+            tabela = self.tabelas[zona]
+            tr = int(consulta['tr'])
+            colunas = np.flatnonzero(tabela.tempos_retorno == tr)
+            if len(colunas) == 0:
+                raise ValueError(f"TR {tr} não encontrado. TRs: {tabela.tempos_retorno.tolist()}")
+            precipitacao = float(tabela.precipitacao_em([duracao])[0, colunas[-1]])
+            resultado.update(zona=zona, tr=tr)
+            if passo == 1:
+                try:
+                    chuva = self.armazem.hietograma(zona, tr, duracao)
+                except KeyError:
+                    pass  # duração não pré-calculada: calcula abaixo
+        if chuva is None:
+            chuva = distribuir_chuva_huff(precipitacao, duracao, passo)
+        resultado.update(
+            precipitacao_mm=precipitacao,
+            minutos=tempos_dos_passos(len(chuva), passo).tolist(),
+            chuva_mm=_para_json(chuva),
+        )
+        return resultado
+
+    @staticmethod
+    def _consultar_cada(consultar, consultas: list[dict]) -> list[dict]:
+        """Executa as consultas de um lote; uma consulta inválida não derruba as demais."""
+        resultados = []
+        for consulta in consultas:
+            try:
+                resultados.append(consultar(consulta))
+            except (ValueError, KeyError, TypeError) as e:
+                resultados.append({'erro': _mensagem_erro(e)})
+        return resultados
+
+    def registrar_latencia(self, rota: str, duracao_s: float) -> None:
+        """Acrescenta a latência de uma requisição às métricas da rota."""
+        self.contagem[rota] = self.contagem.get(rota, 0) + 1
+        self.latencias.setdefault(rota, deque(maxlen=JANELA_METRICAS)).append(duracao_s)
+
+    def metricas(self) -> dict:
+        """Contagem de requisições e latências p50/p99 (ms) por rota."""
+        rotas = {}
+        for rota, latencias in self.latencias.items():
+            p50, p99 = np.percentile(np.fromiter(latencias, dtype=float), [50, 99]) * 1000
+            rotas[rota] = {
+                'requisicoes': self.contagem[rota],
+                'p50_ms': round(float(p50), 3),
+                'p99_ms': round(float(p99), 3),
+            }
+        return {
+            'tempo_ativo_s': round(time.time() - self.inicio, 1),
+            'erros': self.erros,
+            'rotas': rotas,
+            'cache_hietogramas': estatisticas_cache_hietogramas(),
+            'zonas': list(self.tabelas),
+        }
+
+    # -- HTTP -----------------------------------------------------------------
+
+    async def _atender(self, metodo: str, alvo: str, corpo: bytes) -> tuple[int, object]:
+        """Executa uma requisição e retorna (status HTTP, objeto JSON)."""
+        url = urllib.parse.urlsplit(alvo)
+        if url.path == '/metricas':
+            return HTTPStatus.OK, self.metricas()
+        if url.path not in self.rotas:
+            return HTTPStatus.NOT_FOUND, {'erro': f"Rota não encontrada: {url.path}"}
+        consultar, consultar_lote = self.rotas[url.path]
+        laco = asyncio.get_running_loop()
+
+        if metodo == 'GET':
+            consulta = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+            return HTTPStatus.OK, await laco.run_in_executor(self.executor, consultar, consulta)
+        if metodo != 'POST':
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'erro': f"Método não suportado: {metodo}"}
+
+        consultas = json.loads(corpo or b'[]')
+        if isinstance(consultas, dict):
+            consultas = consultas.get('consultas', [consultas])
+        if not isinstance(consultas, list) or not all(isinstance(c, dict) for c in consultas):
+            raise ValueError("O corpo deve ser uma lista JSON de consultas")
+        if not consultas:
+            return HTTPStatus.OK, {'resultados': []}
+        if consultar_lote is not None:
+            resultados = await laco.run_in_executor(self.executor, consultar_lote, consultas)
+        else:
+            resultados = await laco.run_in_executor(
+                self.executor, self._consultar_cada, consultar, consultas
+            )
+        return HTTPStatus.OK, {'resultados': resultados}
+
+    async def tratar_conexao(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter) -> None:
+        """Atende as requisições HTTP/1.1 de uma conexão (com keep-alive)."""
+        try:
+            while True:
+                try:
+                    cabecalho = await leitor.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                inicio = time.perf_counter()
+                linhas = cabecalho.decode('latin-1').split('\r\n')
+                try:
+                    metodo, alvo, versao = linhas[0].split(' ', 2)
+                except ValueError:
+                    break
+                campos = {}
+                for linha in linhas[1:]:
+                    nome, _, valor = linha.partition(':')
+                    campos[nome.strip().lower()] = valor.strip()
+                tamanho = int(campos.get('content-length') or 0)
+                if tamanho > TAMANHO_MAXIMO_CORPO:
+                    status, resposta = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'erro': 'Corpo muito grande'}
+                    campos['connection'] = 'close'
+                else:
+                    corpo = await leitor.readexactly(tamanho) if tamanho else b''
+                    try:
+                        status, resposta = await self._atender(metodo.upper(), alvo, corpo)
+                    except (ValueError, KeyError, TypeError) as e:
+                        status, resposta = HTTPStatus.BAD_REQUEST, {'erro': _mensagem_erro(e)}
+
+                manter = campos.get('connection', '').lower() != 'close' and versao == 'HTTP/1.1'
+                dados = json.dumps(resposta, ensure_ascii=False).encode('utf-8')
+                escritor.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    "Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(dados)}\r\n"
+                    f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n".encode('latin-1')
+                    + dados
+                )
+                await escritor.drain()
+                if status >= 400:
+                    self.erros += 1
+                rota = urllib.parse.urlsplit(alvo).path
+                if rota not in self.rotas and rota != '/metricas':
+                    rota = 'outras'
+                self.registrar_latencia(rota, time.perf_counter() - inicio)
+                if not manter:
+                    break
+        finally:
+            escritor.close()
+
+    async def iniciar(self, host: str = '127.0.0.1', porta: int = PORTA_SERVICO) -> asyncio.Server:
+        """Aquece os caches (no pool de threads) e abre o servidor."""
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.aquecer)
+        return await asyncio.start_server(self.tratar_conexao, host, porta)
+
+
+def executar_servico(host: str = '127.0.0.1', porta: int = PORTA_SERVICO, trabalhadores: int = None) -> None:
+    """
+    Executa o serviço de consultas até ser interrompido (Ctrl+C).
+
+    Parâmetros:
+        host: Endereço de escuta (padrão: apenas a máquina local)
+        porta: Porta TCP
+        trabalhadores: Número de threads para as consultas
+    """
+    if _PERFIL['ativo']:
+        print("Aviso: perfil ativo no serviço. As consultas rodam em paralelo no pool de "
+              "threads; tempos e contagens são por etapa, mas o pico de memória de cada "
+              "etapa inclui as consultas simultâneas.")
+    servico = ServicoConsultas(trabalhadores)
+
+    async def servir():
+        servidor = await servico.iniciar(host, porta)
+        enderecos = ', '.join(str(s.getsockname()[:2]) for s in servidor.sockets)
+        print(f"Serviço de consultas em {enderecos} ({len(servico.tabelas)} zonas em memória)")
+        async with servidor:
+            await servidor.serve_forever()
+
+    try:
+        asyncio.run(servir())
+    except KeyboardInterrupt:
+        print("\nServiço encerrado.")
+    finally:
+        servico.executor.shutdown(wait=False)
+
+
+# =============================================================================
+# MENU PRINCIPAL
+# =============================================================================
+
+def exibir_menu():
+    """Exibe o menu principal."""
+    print("\n" + "=" * 70)
+    print("   SISTEMA DE CÁLCULO DE PRECIPITAÇÃO + DISTRIBUIÇÃO TEMPORAL")
     print("=" * 70)
     print("\n   Opções:")
     print("   [1] Cálculo de Precipitação por Isozonas")
     print("   [2] Distribuição Temporal - Método Huff")
     print("   [3] Executar os dois (Encadeado)")
+    print("   [4] Isozonas em lote (CSV/Parquet de sítios)")
     print("   [0] Sair")
     print("\n" + "-" * 70)
 
 
-def main():
-    """Função principal."""
+def executar_menu():
+    """Executa o menu interativo."""
     while True:
         exibir_menu()
         
@@ -644,12 +4646,18 @@ def main():
             executar_Distribuição_Temporal()
         elif opcao == '3':
             print("\n>>> Executando Precipitação + Distribuição (Encadeado) <<<")
-            caminho_csv = executar_Precipitação_por_Isozonas(salvar_automatico=True)
-            if caminho_csv:
-                print("\n>>> Iniciando Distribuição Temporal com o arquivo gerado <<<")
-                executar_Distribuição_Temporal(caminho_entrada=caminho_csv)
+            tabela = executar_Precipitação_por_Isozonas(
+                salvar_automatico=True, retornar_tabela=True
+            )
+            if tabela is not None:
+                print("\n>>> Iniciando Distribuição Temporal com a tabela gerada <<<")
+                executar_Distribuição_Temporal(tabela=tabela)
             else:
-                print("\nDistribuição Temporal não foi executada pois não há arquivo de entrada.")
+                print("\nDistribuição Temporal não foi executada pois não há tabela de entrada.")
+        elif opcao == '4':
+            caminho_entrada = input("\nArquivo de sítios (CSV/Parquet): ").strip()
+            caminho_saida = input("Arquivo de saída (CSV/Parquet): ").strip()
+            executar_Isozonas_em_Lote(caminho_entrada, caminho_saida)
         elif opcao == '0':
             print("\nSaindo...")
             break
@@ -659,5 +4667,418 @@ def main():
         input("\nPressione Enter para continuar...")
 
 
+def _executar_isozona_cli(args) -> int:
+    """Subcomando 'isozona': um ponto (--lat/--lon) ou uma tabela de sítios."""
+    if args.sitios:
+        df = executar_Isozonas_em_Lote(args.sitios, args.saida)
+        return 0 if df is not None else 1
+
+    try:
+        zona, tabela = calcular_precipitacao_coordenada(
+            args.lat, args.lon, args.estacoes, args.k_estacoes
+        )
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Erro: {e}")
+        return 1
+    exibir_tabela(tabela.para_dataframe(), zona, args.lat, args.lon)
+    if args.saida:
+        tabela.gravar_csv(args.saida)
+        print(f"\nArquivo salvo em: {args.saida}")
+    return 0
+
+
+def _executar_huff_cli(args) -> int:
+    """Subcomando 'huff': distribui uma tabela de precipitação em CSV."""
+    if args.bloco:
+        if args.metodo != 'huff':
+            print("ERRO: O processamento em fluxo (--bloco) usa apenas o método huff")
+            return 1
+        entrada = args.entrada or CSV_HUFF_ENTRADA
+        saida = args.saida or CSV_HUFF_SAIDA
+        inicio = time.perf_counter()
+        try:
+            linhas = processar_huff_streaming(entrada, saida, args.bloco, args.passo)
+        except FileNotFoundError:
+            print(f"ERRO: Arquivo não encontrado: {entrada}")
+            return 1
+        print(f"{linhas} linhas gravadas em {time.perf_counter() - inicio:.2f} s: {saida}")
+        return 0
+    df = executar_Distribuição_Temporal(
+        args.entrada, caminho_saida=args.saida, layout=args.layout,
+        passo_minutos=args.passo, metodo=args.metodo
+    )
+    return 0 if df is not None else 1
+
+
+def _executar_pipeline_cli(args) -> int:
+    """Subcomando 'pipeline': encadeamento completo para um ponto ou tabela de sítios."""
+    if args.sitios:
+        df_sitios = ler_tabela_sitios(args.sitios)
+    else:
+        df_sitios = pd.DataFrame({'sitio': ['ponto'], 'lat': [args.lat], 'lon': [args.lon]})
+    resumo = executar_pipeline_lote(
+        df_sitios, args.saida, processos=args.processos, passo_minutos=args.passo,
+        caminho_estacoes=args.estacoes, k_estacoes=args.k_estacoes
+    )
+    gravar_tabela_sitios(resumo, os.path.join(args.saida, 'resumo_sitios.csv'))
+    return 0
+
+
+def _executar_precalcular_cli(args) -> int:
+    """Subcomando 'precalcular': grava o armazém binário de IDF e Huff e o cache das isozonas."""
+    inicio = time.perf_counter()
+    caminho_cache = caminho_cache_isozonas()
+    compilar_cache_isozonas(caminho_cache=caminho_cache)
+    print(f"Cache das isozonas compilado em {time.perf_counter() - inicio:.2f} s: {caminho_cache}")
+    inicio = time.perf_counter()
+    armazem = construir_armazem_precalculado(args.saida)
+    print(f"Armazém pré-calculado ({len(armazem.zonas)} zonas, "
+          f"{os.path.getsize(args.saida) / 2**20:.1f} MB) gerado em "
+          f"{time.perf_counter() - inicio:.2f} s: {args.saida}")
+    return 0
+
+
+def _executar_incerteza_cli(args) -> int:
+    """Subcomando 'incerteza': tabelas (e faixas Huff) de percentis por Monte Carlo."""
+    zona = args.zona or get_isozona(args.lat, args.lon)
+    if zona is None:
+        print(f"Erro: Coordenada ({args.lat}, {args.lon}) está fora das isozonas.")
+        return 1
+    os.makedirs(args.saida, exist_ok=True)
+    inicio = time.perf_counter()
+    try:
+        # Um único Monte Carlo: as faixas Huff saem das mesmas tabelas gravadas
+        percentis = percentis_necessarios_huff(args.percentis) if args.huff else args.percentis
+        tabelas = simular_tabela_idf(zona, args.amostras, percentis, args.semente)
+        faixas = simular_huff(
+            zona, args.amostras, args.percentis, passo_minutos=args.passo, tabelas=tabelas
+        ) if args.huff else {}
+    except ValueError as e:
+        print(f"Erro: {e}")
+        return 1
+    for q in dict.fromkeys(args.percentis):
+        tabelas[q].gravar_csv(os.path.join(args.saida, f"precipitacao_zona_{zona}_p{q:g}.csv"))
+    for q, df in faixas.items():
+        gravar_saida_huff(df, os.path.join(args.saida, f"huff_zona_{zona}_p{q:g}.csv"))
+    print(f"Zona {zona}: {args.amostras} amostras, percentis {list(args.percentis)} "
+          f"em {time.perf_counter() - inicio:.2f} s: {args.saida}")
+    return 0
+
+
+def _executar_atualizar_cli(args) -> int:
+    """Subcomando 'atualizar': regrava apenas as saídas cujas entradas mudaram."""
+    inicio = time.perf_counter()
+    try:
+        relatorio = atualizar_saidas(
+            args.saida, args.zonas, args.passo, huff=not args.sem_huff, forcar=args.forcar
+        )
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Erro: {e}")
+        return 1
+    for zona, trs in relatorio['tr_alterados'].items():
+        print(f"   Zona {zona}: entradas alteradas nos TRs {trs}")
+    print(f"{len(relatorio['gravados'])} arquivo(s) gravado(s), "
+          f"{len(relatorio['ignorados'])} sem alteração, em {time.perf_counter() - inicio:.3f} s")
+    return 0
+
+
+def _executar_escoamento_cli(args) -> int:
+    """Subcomando 'escoamento': hidrogramas SCS-CN dos cenários Huff de uma tabela."""
+    entrada = args.entrada or CSV_HUFF_ENTRADA
+    try:
+        if args.bacias:
+            df_bacias = carregar_csv_com_decimal(args.bacias)
+            faltando = [c for c in COLUNAS_BACIAS_ESCOAMENTO if c not in df_bacias.columns]
+            if faltando:
+                raise ValueError(f"Colunas ausentes no CSV de bacias: {faltando}")
+            parametros = [df_bacias[c].to_numpy() for c in COLUNAS_BACIAS_ESCOAMENTO]
+        else:
+            parametros = [None, args.cn, args.area, args.retardo]
+        inicio = time.perf_counter()
+        df_huff = processar_csv_huff(entrada, passo_minutos=args.passo)
+        resultado = calcular_escoamento(
+            df_huff, *parametros[1:], bacias=parametros[0],
+            retornar_hidrogramas=args.hidrogramas,
+        )
+    except FileNotFoundError as e:
+        print(f"ERRO: Arquivo não encontrado: {e.filename}")
+        return 1
+    except ValueError as e:
+        print(f"Erro: {e}")
+        return 1
+
+    os.makedirs(args.saida, exist_ok=True)
+    resumo = resultado.resumo()
+    resumo.round(4).to_csv(os.path.join(args.saida, 'resumo_escoamento.csv'), index=False, sep=';')
+    if args.hidrogramas:
+        for bacia in resultado.bacias:
+            gravar_saida_huff(
+                resultado.hidrograma(bacia), os.path.join(args.saida, f"hidrograma_{bacia}.csv")
+            )
+    print(f"{len(resultado.bacias)} bacia(s) × {len(resultado.colunas)} cenários em "
+          f"{time.perf_counter() - inicio:.2f} s: {args.saida}")
+    b, c = np.unravel_index(np.argmax(resultado.pico_m3s), resultado.pico_m3s.shape)
+    print(f"Maior pico: {resultado.pico_m3s[b, c]:.2f} m³/s (bacia {resultado.bacias[b]}, "
+          f"cenário {resultado.colunas[c]}, aos {resultado.tempo_pico_min[b, c]:g} min)")
+    return 0
+
+
+def _executar_bacias_cli(args) -> int:
+    """Subcomando 'bacias': tabelas de precipitação ponderadas pela área das isozonas."""
+    inicio = time.perf_counter()
+    try:
+        ids, geometrias = ler_bacias(args.bacias, args.id)
+    except (OSError, RuntimeError, KeyError) as e:
+        print(f"Erro ao ler as bacias: {e}")
+        return 1
+    fracoes, tempos_retorno, valores = calcular_tabelas_bacias(geometrias, ids)
+    os.makedirs(args.saida, exist_ok=True)
+    fracoes.to_csv(os.path.join(args.saida, 'fracoes_bacias.csv'), index=False, sep=';')
+    empilhar_tabelas(ids, tempos_retorno, valores).round(2).to_csv(
+        os.path.join(args.saida, 'precipitacao_bacias.csv'), index=False, sep=';', decimal='.'
+    )
+    fora = len(ids) - fracoes['bacia'].nunique()
+    print(f"{len(ids)} bacia(s) ({fora} fora das isozonas) em "
+          f"{time.perf_counter() - inicio:.2f} s: {args.saida}")
+    return 0
+
+
+def _executar_grade_cli(args) -> int:
+    """Subcomando 'grade': gera a grade de precipitações em disco."""
+    limites = tuple(args.limites) if args.limites else None
+    inicio = time.perf_counter()
+    grade = gerar_grade_idf(args.saida, resolucao=args.resolucao, limites=limites)
+    n_lat, n_lon = grade.ids.shape
+    print(f"Grade {n_lat} × {n_lon} (resolução {args.resolucao}°) gerada em "
+          f"{time.perf_counter() - inicio:.1f} s: {args.saida}")
+    return 0
+
+
+def _executar_servico_cli(args) -> int:
+    """Subcomando 'servico': serviço HTTP de consultas com dados em memória."""
+    executar_servico(args.host, args.porta, args.trabalhadores)
+    return 0
+
+
+def _adicionar_origem_sitios(parser: argparse.ArgumentParser) -> None:
+    """Opções de entrada dos subcomandos: --lat/--lon ou --sitios."""
+    parser.add_argument('--lat', type=float, help='Latitude do ponto')
+    parser.add_argument('--lon', type=float, help='Longitude do ponto')
+    parser.add_argument('--sitios', metavar='ARQUIVO',
+                        help='CSV/Parquet de sítios com colunas lat e lon')
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    """
+    Cria o parser da linha de comando (subcomandos isozona, huff,
+    escoamento, pipeline, bacias, grade, incerteza, precalcular, atualizar
+    e servico).
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--coeficientes', metavar='CSV',
+                        help=f'CSV de coeficientes (padrão: {CSV_COEFICIENTES})')
+    parser.add_argument('--precipitacao', metavar='CSV',
+                        help=f'CSV de precipitação (padrão: {CSV_PRECIPITACAO})')
+    parser.add_argument('--shapefile', metavar='SHP',
+                        help=f'Shapefile das isozonas (padrão: {SHAPEFILE_PATH})')
+    parser.add_argument('--estacoes', metavar='CSV',
+                        help='CSV de estações (estacao, lat, lon, tempo_retorno, precipitacao); '
+                             'substitui --precipitacao pela estação mais próxima de cada sítio')
+    parser.add_argument('--k-estacoes', type=int, default=1, metavar='K',
+                        help='Média ponderada pelo inverso da distância das K estações mais próximas')
+    parser.add_argument('--perfil', metavar='ARQUIVO', default=os.environ.get('PRECIP_PERFIL'),
+                        help='Grava o perfil das etapas em JSON/trace do Chrome')
+    parser.add_argument('--cprofile', metavar='ARQUIVO', default=os.environ.get('PRECIP_CPROFILE'),
+                        help='Grava as estatísticas do cProfile (.prof)')
+    subparsers = parser.add_subparsers(dest='comando', metavar='COMANDO')
+
+    isozona = subparsers.add_parser(
+        'isozona', help='Isozona e tabela de precipitação de um ponto, ou isozonas de uma tabela de sítios'
+    )
+    _adicionar_origem_sitios(isozona)
+    isozona.add_argument('--saida', metavar='ARQUIVO',
+                         help='CSV da tabela (ponto) ou CSV/Parquet dos sítios com ZONA')
+    isozona.set_defaults(executar=_executar_isozona_cli)
+
+    huff = subparsers.add_parser('huff', help='Distribuição Temporal - Método Huff')
+    huff.add_argument('--entrada', metavar='CSV',
+                      help=f'Tabela de precipitação (padrão: {CSV_HUFF_ENTRADA})')
+    huff.add_argument('--saida', metavar='ARQUIVO',
+                      help=f'Saída .csv/.parquet/.npz (padrão: {CSV_HUFF_SAIDA})')
+    huff.add_argument('--layout', choices=('largo', 'longo'), default='largo',
+                      help='Formato da saída (padrão: largo)')
+    huff.add_argument('--passo', type=float, default=1, metavar='MINUTOS',
+                      help='Intervalo da distribuição em minutos (padrão: 1; ex: 5, 15, 0.5)')
+    huff.add_argument('--metodo', choices=list(METODOS_DISTRIBUICAO), default='huff',
+                      help='Método de distribuição temporal (padrão: huff)')
+    huff.add_argument('--bloco', type=int, metavar='LINHAS',
+                      help='Processa a entrada em fluxo, em blocos de LINHAS linhas '
+                           '(saída no layout longo; aceita coluna sitio)')
+    huff.set_defaults(executar=_executar_huff_cli)
+
+    pipeline = subparsers.add_parser(
+        'pipeline', help='Isozona -> Precipitação -> Huff para um ponto ou tabela de sítios'
+    )
+    _adicionar_origem_sitios(pipeline)
+    pipeline.add_argument('--saida', metavar='DIRETORIO', required=True,
+                          help='Diretório de saída')
+    pipeline.add_argument('--processos', type=int, default=None,
+                          help='Número de processos (padrão: CPUs)')
+    pipeline.add_argument('--passo', type=float, default=1, metavar='MINUTOS',
+                          help='Intervalo da distribuição Huff em minutos (padrão: 1)')
+    pipeline.set_defaults(executar=_executar_pipeline_cli)
+
+    grade = subparsers.add_parser(
+        'grade', help='Grade de precipitações (lat × lon × TR × duração) sobre as isozonas'
+    )
+    grade.add_argument('--saida', metavar='DIRETORIO', required=True,
+                       help='Diretório da grade (metadados.json, zonas.npy, idf.npy)')
+    grade.add_argument('--resolucao', type=float, default=0.05,
+                       help='Tamanho da célula em graus (padrão: 0.05)')
+    grade.add_argument('--limites', type=float, nargs=4,
+                       metavar=('LON_MIN', 'LAT_MIN', 'LON_MAX', 'LAT_MAX'),
+                       help='Extensão da grade (padrão: extensão do shapefile)')
+    grade.set_defaults(executar=_executar_grade_cli)
+
+    incerteza = subparsers.add_parser(
+        'incerteza', help='Percentis das precipitações (e faixas Huff) por Monte Carlo'
+    )
+    incerteza.add_argument('--zona', help='Isozona (alternativa a --lat/--lon)')
+    incerteza.add_argument('--lat', type=float, help='Latitude do ponto')
+    incerteza.add_argument('--lon', type=float, help='Longitude do ponto')
+    incerteza.add_argument('--amostras', type=int, default=10_000, help='Número de amostras (padrão: 10000)')
+    incerteza.add_argument('--percentis', type=float, nargs='+', default=[5, 50, 95],
+                           help='Percentis (padrão: 5 50 95)')
+    incerteza.add_argument('--semente', type=int, default=None, help='Semente dos sorteios')
+    incerteza.add_argument('--huff', action='store_true', help='Grava também as faixas Huff')
+    incerteza.add_argument('--passo', type=float, default=1, metavar='MINUTOS',
+                           help='Intervalo da distribuição Huff em minutos (padrão: 1)')
+    incerteza.add_argument('--saida', metavar='DIRETORIO', required=True, help='Diretório de saída')
+    incerteza.set_defaults(executar=_executar_incerteza_cli)
+
+    precalcular = subparsers.add_parser(
+        'precalcular', help='Armazém binário com as tabelas IDF e hietogramas Huff de todas as zonas'
+    )
+    precalcular.add_argument('--saida', metavar='ARQUIVO', default=CAMINHO_ARMAZEM_PRECALCULADO,
+                             help='Arquivo binário (padrão: .cache/armazem_precalculado.bin, '
+                                  'usado pelo subcomando servico)')
+    precalcular.set_defaults(executar=_executar_precalcular_cli)
+
+    escoamento = subparsers.add_parser(
+        'escoamento', help='Hidrogramas de cheia (SCS-CN + hidrograma unitário) dos cenários Huff'
+    )
+    escoamento.add_argument('--entrada', metavar='CSV',
+                            help=f'Tabela de precipitação (padrão: {CSV_HUFF_ENTRADA})')
+    escoamento.add_argument('--bacias', metavar='CSV',
+                            help='CSV com ' + ', '.join(COLUNAS_BACIAS_ESCOAMENTO) + ' (uma linha por bacia)')
+    escoamento.add_argument('--cn', type=float, help='Número de Curva (sem --bacias)')
+    escoamento.add_argument('--area', type=float, metavar='KM2', help='Área em km² (sem --bacias)')
+    escoamento.add_argument('--retardo', type=float, metavar='MINUTOS',
+                            help='Tempo de retardo em minutos (sem --bacias)')
+    escoamento.add_argument('--passo', type=float, default=1, metavar='MINUTOS',
+                            help='Intervalo da distribuição em minutos (padrão: 1)')
+    escoamento.add_argument('--hidrogramas', action='store_true',
+                            help='Grava também o hidrograma de cada bacia (hidrograma_<bacia>.csv)')
+    escoamento.add_argument('--saida', metavar='DIRETORIO', required=True,
+                            help='Diretório de saída (resumo_escoamento.csv)')
+    escoamento.set_defaults(executar=_executar_escoamento_cli)
+
+    bacias = subparsers.add_parser(
+        'bacias', help='Tabelas de precipitação de bacias ponderadas pela área de cada isozona'
+    )
+    bacias.add_argument('--bacias', metavar='ARQUIVO', required=True,
+                        help='Camada de polígonos das bacias (shapefile, GeoPackage, GeoJSON)')
+    bacias.add_argument('--id', metavar='COLUNA', help='Coluna com o identificador da bacia')
+    bacias.add_argument('--saida', metavar='DIRETORIO', required=True,
+                        help='Diretório de saída (fracoes_bacias.csv, precipitacao_bacias.csv)')
+    bacias.set_defaults(executar=_executar_bacias_cli)
+
+    atualizar = subparsers.add_parser(
+        'atualizar', help='Tabelas e distribuições Huff de todas as zonas, regravando apenas o que mudou'
+    )
+    atualizar.add_argument('--saida', metavar='DIRETORIO', default=DIRETORIO_SAIDA_INCREMENTAL,
+                           help='Diretório das saídas e do manifesto (padrão: Dados de saída incremental)')
+    atualizar.add_argument('--zonas', nargs='+', metavar='ZONA', help='Zonas (padrão: todas)')
+    atualizar.add_argument('--passo', type=float, default=1, metavar='MINUTOS',
+                           help='Intervalo da distribuição Huff em minutos (padrão: 1)')
+    atualizar.add_argument('--sem-huff', action='store_true', help='Gera apenas as tabelas')
+    atualizar.add_argument('--forcar', action='store_true', help='Regrava tudo')
+    atualizar.set_defaults(executar=_executar_atualizar_cli)
+
+    servico = subparsers.add_parser(
+        'servico', help='Serviço HTTP/JSON local de isozona, tabela IDF e hietograma Huff'
+    )
+    servico.add_argument('--host', default='127.0.0.1', help='Endereço de escuta (padrão: 127.0.0.1)')
+    servico.add_argument('--porta', type=int, default=PORTA_SERVICO,
+                         help=f'Porta TCP (padrão: {PORTA_SERVICO})')
+    servico.add_argument('--trabalhadores', type=int, default=None,
+                         help='Threads para as consultas (padrão: automático)')
+    servico.set_defaults(executar=_executar_servico_cli)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Função principal.
+
+    Sem subcomando, abre o menu interativo. Os subcomandos executam sem
+    nenhuma interação, para uso em agendadores e contêineres:
+        python Main.py isozona --lat -23.5 --lon -46.6 --saida tabela.csv
+        python Main.py isozona --sitios sitios.csv --saida sitios_zonas.parquet
+        python Main.py huff --entrada tabela.csv --saida huff.parquet --layout longo
+        python Main.py pipeline --sitios sitios.csv --saida saida_sitios --processos 8
+        python Main.py escoamento --cn 80 --area 120 --retardo 90 --saida saida_escoamento
+        python Main.py bacias --bacias bacias.gpkg --saida saida_bacias
+        python Main.py grade --saida grade_idf --resolucao 0.05
+        python Main.py precalcular --saida armazem.bin
+        python Main.py atualizar
+        python Main.py servico --porta 8765
+
+    As opções globais --coeficientes, --precipitacao e --shapefile
+    substituem os caminhos padrão (ver configurar_caminhos). Com --perfil
+    (ou PRECIP_PERFIL), grava ao final o relatório das etapas; com
+    --cprofile (ou PRECIP_CPROFILE), grava as estatísticas do cProfile.
+
+    Retornos:
+        Código de saída (0 em caso de sucesso).
+    """
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    if args.comando in ('isozona', 'pipeline'):
+        if args.sitios is None and (args.lat is None or args.lon is None):
+            parser.error(f'{args.comando}: informe --lat e --lon ou --sitios')
+        if args.sitios and not args.saida:
+            parser.error(f'{args.comando}: --saida é obrigatório com --sitios')
+    if args.comando == 'incerteza' and args.zona is None and (args.lat is None or args.lon is None):
+        parser.error('incerteza: informe --zona ou --lat e --lon')
+    if args.comando == 'escoamento' and args.bacias is None and None in (args.cn, args.area, args.retardo):
+        parser.error('escoamento: informe --bacias ou --cn, --area e --retardo')
+
+    configurar_caminhos(
+        coeficientes=args.coeficientes, precipitacao=args.precipitacao,
+        shapefile=args.shapefile
+    )
+    if args.perfil and not _PERFIL['ativo']:
+        ativar_perfil()
+    perfilador = cProfile.Profile() if args.cprofile else None
+    if perfilador is not None:
+        perfilador.enable()
+
+    try:
+        if args.comando is None:
+            executar_menu()
+            return 0
+        return args.executar(args)
+    finally:
+        if perfilador is not None:
+            perfilador.disable()
+            perfilador.dump_stats(args.cprofile)
+            print(f"\nEstatísticas do cProfile salvas em: {args.cprofile}")
+        if args.perfil:
+            exibir_relatorio_perfil()
+            gravar_relatorio_perfil(args.perfil)
+            print(f"Relatório de perfil salvo em: {args.perfil}")
+
+
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -0,0 +1,351 @@
+"""
+Benchmarks do Cálculo de Precipitação e Distribuição Temporal
+
+Mede o tempo das etapas de Main.py com cargas sintéticas (sítios sorteados
+dentro das isozonas do shapefile e tabelas de precipitação aleatórias),
+registrando vazão e pico de memória (RSS). Antes das medições, confere
+as saídas com os arquivos de referência em "Dados de saída", para que
+uma otimização não altere os resultados sem ser notada.
+
+Uso:
+    python benchmark.py                         # 1, 100, 10k e 100k sítios
+    python benchmark.py --tamanhos 1 100 --json resultados.json
+    python benchmark.py --idf-escalar           # compara com o cálculo escalar
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import Main
+
+
+# =============================================================================
+# CONFIGURAÇÃO
+# =============================================================================
+DIRETORIO_REFERENCIA = Main.DIRETORIO_SAIDA
+
+TAMANHOS_PADRAO = [1, 100, 10_000, 100_000]
+
+# A etapa Huff gera 1440 × 176 valores por sítio; acima deste número de
+# sítios ela (e o encadeamento completo) é pulada, salvo --max-sitios-huff.
+MAX_SITIOS_HUFF = 1_000
+
+# Tolerância (mm) da comparação com a saída Huff de referência. O arquivo
+# foi gravado com 4 casas decimais (erro de até 5e-5) e os polinômios de
+# Huff, de grau até 19, têm ruído de arredondamento da ordem de 1e-6 da
+# precipitação total (até ~2.5e-4 mm nas chuvas de 400 mm).
+TOLERANCIA_HUFF = 5e-4
+
+
+# =============================================================================
+# Dados sintéticos
+# =============================================================================
+
+def gerar_sitios(n_sitios: int, semente: int = 0) -> pd.DataFrame:
+    """
+    Sorteia sítios dentro das isozonas do shapefile.
+
+    Os pontos são sorteados no retângulo envolvente das isozonas e apenas
+    os que caem dentro de alguma zona são mantidos.
+
+    Retornos:
+        DataFrame com as colunas id, lat e lon.
+    """
+    localizador = Main.obter_localizador()
+    lon_min, lat_min, lon_max, lat_max = localizador.extensao
+    rng = np.random.default_rng(semente)
+    lats, lons = [], []
+    restantes = n_sitios
+    while restantes > 0:
+        lote = max(2 * restantes, 100)
+        lat = rng.uniform(lat_min, lat_max, lote)
+        lon = rng.uniform(lon_min, lon_max, lote)
+        dentro = localizador.consultar_lote(lat, lon)['situacao_isozona'].to_numpy() == 'dentro'
+        lats.append(lat[dentro][:restantes])
+        lons.append(lon[dentro][:restantes])
+        restantes -= len(lats[-1])
+    return pd.DataFrame({
+        'id': [f"s{i}" for i in range(n_sitios)],
+        'lat': np.concatenate(lats),
+        'lon': np.concatenate(lons),
+    })
+
+
+def gerar_precipitacoes_base(n_sitios: int, n_tr: int = 11, semente: int = 0) -> tuple:
+    """
+    Gera precipitações base (6 min, 1 h, 24 h) para n_sitios × n_tr.
+
+    Os valores respeitam a ordem p_6min < p_1h < p_24h, como nos dados reais.
+
+    Retornos:
+        Tupla (p_6min, p_1h, p_24h), cada uma com forma (n_sitios, n_tr).
+    """
+    rng = np.random.default_rng(semente)
+    p_24h = np.sort(rng.uniform(20.0, 400.0, size=(n_sitios, n_tr)), axis=1)
+    p_1h = p_24h * rng.uniform(0.30, 0.50, size=(n_sitios, n_tr))
+    p_6min = p_24h * rng.uniform(0.06, 0.16, size=(n_sitios, n_tr))
+    return p_6min, p_1h, p_24h
+
+
+def gerar_tabelas_idf(n_sitios: int, semente: int = 0) -> list:
+    """Gera n_sitios TabelaIDF sintéticas com os TRs do CSV de exemplo."""
+    tempos_retorno = np.array([2, 5, 10, 20, 25, 50, 100, 200, 500, 1000, 10000])
+    p_6min, p_1h, p_24h = gerar_precipitacoes_base(n_sitios, len(tempos_retorno), semente)
+    valores, _ = Main.calcular_tabela_idf(p_6min, p_1h, p_24h)
+    duracoes = np.asarray(Main.DURACOES_HORAS, dtype=float)
+    return [Main.TabelaIDF(duracoes, tempos_retorno, v) for v in valores]
+
+
+# =============================================================================
+# Conferência com a saída de referência
+# =============================================================================
+
+def conferir_saidas_referencia() -> dict:
+    """
+    Recalcula as saídas de "Dados de saída" e compara com os arquivos gravados.
+
+    - precipitacao_zona_E.csv: tabela da zona E (tolerância 1e-9)
+    - precipitacao_huff_saida.csv: Huff da tabela acima (tolerância TOLERANCIA_HUFF)
+
+    Retornos:
+        Dicionário com as maiores diferenças e se cada conferência passou.
+    """
+    caminho_tabela = os.path.join(DIRETORIO_REFERENCIA, "precipitacao_zona_E.csv")
+    caminho_huff = os.path.join(DIRETORIO_REFERENCIA, "precipitacao_huff_saida.csv")
+
+    referencia = pd.read_csv(caminho_tabela, sep=';')
+    tabela = Main.gerar_tabela(Main.calcular_precipitacao_base(Main.carregar_dados('E')))
+    mesma_forma = list(tabela.columns) == list(referencia.columns) and (
+        tabela['Duração'].tolist() == referencia['Duração'].tolist()
+    )
+    diferenca_tabela = float(np.abs(
+        tabela.iloc[:, 1:].to_numpy() - referencia.iloc[:, 1:].to_numpy()
+    ).max()) if mesma_forma else float('inf')
+
+    referencia_huff = pd.read_csv(caminho_huff, sep=';')
+    huff = Main.processar_csv_huff(caminho_tabela)
+    mesma_forma_huff = list(huff.columns) == list(referencia_huff.columns) and (
+        huff.shape == referencia_huff.shape
+    )
+    diferenca_huff = float(np.abs(
+        huff.to_numpy() - referencia_huff.to_numpy()
+    ).max()) if mesma_forma_huff else float('inf')
+
+    return {
+        'tabela_diferenca_maxima': diferenca_tabela,
+        'tabela_ok': diferenca_tabela <= 1e-9,
+        'huff_diferenca_maxima': diferenca_huff,
+        'huff_ok': diferenca_huff <= TOLERANCIA_HUFF,
+    }
+
+
+# =============================================================================
+# Medição das etapas
+# =============================================================================
+
+def pico_rss_mb() -> float:
+    """Pico de memória residente do processo (MB)."""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS em bytes
+    return pico / 2**20 if sys.platform == 'darwin' else pico / 2**10
+
+
+def medir(etapa: str, n_sitios: int, funcao, *args) -> dict:
+    """Executa funcao(*args) e retorna tempo, vazão e pico de RSS."""
+    inicio = time.perf_counter()
+    funcao(*args)
+    duracao = time.perf_counter() - inicio
+    return {
+        'etapa': etapa,
+        'sitios': n_sitios,
+        'tempo_s': duracao,
+        'sitios_por_s': n_sitios / duracao if duracao > 0 else float('inf'),
+        'pico_rss_mb': pico_rss_mb(),
+    }
+
+
+def _isozona_por_ponto(sitios: pd.DataFrame) -> None:
+    for lat, lon in zip(sitios['lat'], sitios['lon']):
+        Main.get_isozona(lat, lon)
+
+
+def _tabela_idf_por_sitio(sitios: pd.DataFrame) -> None:
+    zonas = Main.obter_localizador().consultar_lote(sitios['lat'], sitios['lon'])['ZONA']
+    for zona in zonas:
+        Main.gerar_tabela(Main.calcular_precipitacao_base(Main.carregar_dados(zona)))
+
+
+def _huff(tabelas: list) -> None:
+    for tabela in tabelas:
+        Main.distribuir_tabela_huff(tabela)
+
+
+def _encadeamento(sitios: pd.DataFrame) -> None:
+    with tempfile.TemporaryDirectory() as diretorio:
+        Main.executar_pipeline_lote(sitios, diretorio, processos=1)
+
+
+def benchmark_etapas(tamanhos: list, max_sitios_huff: int = MAX_SITIOS_HUFF) -> list:
+    """
+    Mede cada etapa e o encadeamento completo para cada número de sítios.
+
+    Etapas:
+        isozona_lote      - consultar_lote (junção espacial única)
+        isozona_ponto     - get_isozona ponto a ponto (até 10k sítios)
+        tabela_idf_lote   - calcular_tabela_idf com todos os sítios empilhados
+        tabela_idf_sitio  - carregar_dados + gerar_tabela por sítio (até 10k)
+        huff              - distribuir_tabela_huff por sítio
+        encadeamento      - executar_pipeline_lote (1 processo, com gravação)
+
+    Retornos:
+        Lista de dicionários com os resultados.
+    """
+    Main.obter_localizador()
+    Main.obter_armazem()
+    resultados = []
+    for n in tamanhos:
+        sitios = gerar_sitios(n)
+        p_6min, p_1h, p_24h = gerar_precipitacoes_base(n)
+        resultados.append(medir(
+            'isozona_lote', n, Main.obter_localizador().consultar_lote,
+            sitios['lat'], sitios['lon']
+        ))
+        if n <= 10_000:
+            resultados.append(medir('isozona_ponto', n, _isozona_por_ponto, sitios))
+        resultados.append(medir(
+            'tabela_idf_lote', n, Main.calcular_tabela_idf, p_6min, p_1h, p_24h
+        ))
+        if n <= 10_000:
+            resultados.append(medir('tabela_idf_sitio', n, _tabela_idf_por_sitio, sitios))
+        if n <= max_sitios_huff:
+            resultados.append(medir('huff', n, _huff, gerar_tabelas_idf(n)))
+            resultados.append(medir('encadeamento', n, _encadeamento, sitios))
+    return resultados
+
+
+# =============================================================================
+# Tabela IDF: vetorizado × escalar
+# =============================================================================
+
+def benchmark_tabela_idf(n_sitios: int = 10_000, n_amostra_escalar: int = 20,
+                         tamanho_bloco: int = 500) -> dict:
+    """
+    Compara calcular_tabela_idf com interpolar_precipitacao célula a célula.
+
+    Usa todas as durações de minuto em minuto entre 6 min e 24 h.
+    O cálculo escalar é medido em uma amostra de sítios e extrapolado,
+    pois levaria horas para a carga completa.
+
+    Retornos:
+        Dicionário com tempos, aceleração e maior diferença absoluta.
+    """
+    duracoes = np.arange(6, 1441) / 60
+    p_6min, p_1h, p_24h = gerar_precipitacoes_base(n_sitios)
+
+    inicio = time.perf_counter()
+    soma = 0.0
+    for i in range(0, n_sitios, tamanho_bloco):
+        valores, _ = Main.calcular_tabela_idf(
+            p_6min[i:i + tamanho_bloco], p_1h[i:i + tamanho_bloco],
+            p_24h[i:i + tamanho_bloco], duracoes
+        )
+        soma += float(valores.sum())
+    tempo_vetorizado = time.perf_counter() - inicio
+
+    amostra = slice(0, n_amostra_escalar)
+    inicio = time.perf_counter()
+    escalar = np.array([
+        [
+            [Main.interpolar_precipitacao(d, p6, p1, p24)
+             for p6, p1, p24 in zip(p_6min[s], p_1h[s], p_24h[s])]
+            for d in duracoes
+        ]
+        for s in range(n_amostra_escalar)
+    ])
+    tempo_escalar = (time.perf_counter() - inicio) * n_sitios / n_amostra_escalar
+
+    valores, _ = Main.calcular_tabela_idf(
+        p_6min[amostra], p_1h[amostra], p_24h[amostra], duracoes
+    )
+    return {
+        'sitios': n_sitios,
+        'duracoes': len(duracoes),
+        'tempos_retorno': p_6min.shape[1],
+        'tempo_escalar_estimado_s': tempo_escalar,
+        'tempo_vetorizado_s': tempo_vetorizado,
+        'aceleracao': tempo_escalar / tempo_vetorizado,
+        'diferenca_maxima': float(np.abs(valores - escalar).max()),
+        'soma_controle': soma,
+    }
+
+
+# =============================================================================
+# EXECUÇÃO
+# =============================================================================
+
+def exibir_resultado(nome: str, resultado: dict) -> None:
+    """Exibe o resultado de um benchmark no console."""
+    print(f"\n{nome}")
+    print("-" * 70)
+    for chave, valor in resultado.items():
+        if isinstance(valor, float):
+            print(f"   {chave:<28}: {valor:.6g}")
+        else:
+            print(f"   {chave:<28}: {valor}")
+
+
+def exibir_etapas(resultados: list) -> None:
+    """Exibe a tabela de resultados das etapas."""
+    print("\nETAPAS")
+    print("-" * 70)
+    print(f"{'Etapa':<20}{'Sítios':>10}{'Tempo (s)':>12}{'Sítios/s':>14}{'RSS (MB)':>12}")
+    for r in resultados:
+        print(
+            f"{r['etapa']:<20}{r['sitios']:>10}{r['tempo_s']:>12.4f}"
+            f"{r['sitios_por_s']:>14.1f}{r['pico_rss_mb']:>12.1f}"
+        )
+
+
+def main(argv: list[str] | None = None):
+    """Executa a conferência de referência e os benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmarks de Main.py")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO,
+                        help='Números de sítios sintéticos (padrão: 1 100 10000 100000)')
+    parser.add_argument('--max-sitios-huff', type=int, default=MAX_SITIOS_HUFF,
+                        help='Maior número de sítios nas etapas Huff e encadeamento')
+    parser.add_argument('--idf-escalar', type=int, nargs='?', const=10_000, metavar='SITIOS',
+                        help='Compara a tabela IDF vetorizada com o cálculo escalar')
+    parser.add_argument('--json', metavar='ARQUIVO', help='Grava os resultados em JSON')
+    args = parser.parse_args(argv)
+
+    referencia = conferir_saidas_referencia()
+    exibir_resultado("CONFERÊNCIA COM \"Dados de saída\"", referencia)
+    if not (referencia['tabela_ok'] and referencia['huff_ok']):
+        raise SystemExit("ERRO: saídas diferentes da referência")
+
+    resultados = {'referencia': referencia}
+    resultados['etapas'] = benchmark_etapas(args.tamanhos, args.max_sitios_huff)
+    exibir_etapas(resultados['etapas'])
+
+    if args.idf_escalar:
+        resultados['tabela_idf'] = benchmark_tabela_idf(args.idf_escalar)
+        exibir_resultado("TABELA IDF (sítios × 1435 durações × 11 TR)", resultados['tabela_idf'])
+        if resultados['tabela_idf']['diferenca_maxima'] > 1e-9:
+            raise SystemExit("ERRO: tabela vetorizada difere do cálculo escalar")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, indent=1, default=float)
+        print(f"\nResultados salvos em: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Compara avaliar_curva_huff (Horner vetorizado) com o polinômio escalar
+original de calcular_pac_huff, escrito termo a termo como no código base.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Main  # noqa: E402
+
+
+def pac_huff_escalar(pb: float, duracao_horas: float) -> float:
+    """calcular_pac_huff original (potências explícitas, um pb por vez)."""
+    if pb <= 0:
+        return 0.0
+    if pb >= 100:
+        return 100.0
+    if duracao_horas <= 6:
+        pac = (4.02817498644692E-26 * pb**17 - 3.52064227661328E-23 * pb**16 +
+               1.40597068416381E-20 * pb**15 - 3.39749477703355E-18 * pb**14 +
+               5.54497997392431E-16 * pb**13 - 6.45955102401168E-14 * pb**12 +
+               5.53311153502673E-12 * pb**11 - 3.53601335024796E-10 * pb**10 +
+               1.69157185342832E-08 * pb**9 - 6.01477294241886E-07 * pb**8 +
+               1.55857516691692E-05 * pb**7 - 2.82804931812996E-04 * pb**6 +
+               3.30423804127657E-03 * pb**5 - 1.95440226611134E-02 * pb**4 -
+               1.78285694295392E-02 * pb**3 + 0.843704743033219 * pb**2 +
+               0.460519860597484 * pb + 0.105509396306812)
+    elif duracao_horas <= 12:
+        pac = (1.38673921100494E-29 * pb**19 - 1.21613849024923E-26 * pb**18 +
+               4.81175587207619E-24 * pb**17 - 1.13061048055895E-21 * pb**16 +
+               1.74322289744585E-19 * pb**15 - 1.82955175694565E-17 * pb**14 +
+               1.29362605433794E-15 * pb**13 - 5.57716800214043E-14 * pb**12 +
+               7.05502076331805E-13 * pb**11 + 8.26435609777427E-11 * pb**10 -
+               6.63085914357193E-09 * pb**9 + 2.63606231276545E-07 * pb**8 -
+               6.63478625779216E-06 * pb**7 + 1.10122543439505E-04 * pb**6 -
+               1.19013879689829E-03 * pb**5 + 8.05401322603745E-03 * pb**4 -
+               3.34138101445273E-02 * pb**3 + 0.107328692602926 * pb**2 +
+               0.434452891319131 * pb - 9.29064257700887E-03)
+    elif duracao_horas <= 24:
+        if pb <= 56:
+            pac = (-7.60644888142597E-19 * pb**13 + 2.26532324896959E-16 * pb**12 -
+                   2.77322200030732E-14 * pb**11 + 1.74614948354883E-12 * pb**10 -
+                   5.42723072107129E-11 * pb**9 + 2.88453725150229E-10 * pb**8 +
+                   3.40120100322963E-08 * pb**7 - 9.87326768780573E-07 * pb**6 +
+                   4.6775676050966E-06 * pb**5 + 2.53896092445158E-04 * pb**4 -
+                   5.65737144328779E-03 * pb**3 + 5.39029497668964E-02 * pb**2 +
+                   0.359808518609887 * pb - 5.32553512302088E-12)
+        else:
+            pac = (7.93878771768824E-11 * pb**8 - 5.24871539129577E-08 * pb**7 +
+                   1.51310191157137E-05 * pb**6 - 2.48406960877551E-03 * pb**5 +
+                   0.25398132631186 * pb**4 - 16.5564133934408 * pb**3 +
+                   671.654540274205 * pb**2 - 15489.8757952666 * pb + 155336.538705823)
+    else:
+        if pb < 78:
+            pac = (4.45646156443285E-20 * pb**13 - 2.22681580593717E-17 * pb**12 +
+                   4.96794969032244E-15 * pb**11 - 6.5250621619299E-13 * pb**10 +
+                   5.59641539762932E-11 * pb**9 - 3.28222385169418E-09 * pb**8 +
+                   1.33763527344691E-07 * pb**7 - 3.76248289158519E-06 * pb**6 +
+                   7.06366898909776E-05 * pb**5 - 8.12975145227206E-04 * pb**4 +
+                   4.3426645265125E-03 * pb**3 + 1.05914948857879E-02 * pb**2 +
+                   0.30574957410383 * pb + 2.4217656685223E-04)
+        else:
+            pac = (4.81964349956249E-10 * pb**8 - 2.71720789296904E-07 * pb**7 +
+                   6.08665963510088E-05 * pb**6 - 0.006357548911514 * pb**5 +
+                   0.185523370306902 * pb**4 + 25.3341694344528 * pb**3 -
+                   2889.70554544436 * pb**2 + 119076.774334982 * pb - 1835700.24767339)
+    return max(0.0, min(100.0, pac))
+
+
+# Uma duração representativa de cada curva
+DURACAO_POR_CURVA = {'ate_6h': 2.0, 'ate_12h': 8.0, 'ate_24h': 18.0, 'acima_24h': 36.0}
+# Os polinômios de grau 17 e 19 somam termos da ordem de 1e8 perto de
+# pb = 100; Horner e a soma de potências diferem por arredondamento
+TOLERANCIA = 1e-6
+TOLERANCIA_RELATIVA = 1e-6
+
+
+def _pontos(curva: str) -> np.ndarray:
+    """Grade fina, extremos e os limites dos trechos (com vizinhos imediatos)."""
+    limites = [limite for limite, _, _ in Main.CURVAS_HUFF[curva]]
+    especiais = [-5.0, 0.0, 1e-9, 100.0 - 1e-9, 100.0, 120.0]
+    for limite in limites:
+        especiais += [np.nextafter(limite, -np.inf), limite, np.nextafter(limite, np.inf)]
+    return np.concatenate([np.linspace(0, 100, 2001), especiais])
+
+
+@pytest.mark.parametrize('curva', sorted(Main.CURVAS_HUFF))
+def test_curva_igual_ao_polinomio_escalar(curva):
+    duracao = DURACAO_POR_CURVA[curva]
+    assert Main.selecionar_curva_huff(duracao) == curva
+    pb = _pontos(curva)
+    esperado = np.array([pac_huff_escalar(p, duracao) for p in pb])
+    np.testing.assert_allclose(Main.avaliar_curva_huff(pb, curva), esperado, rtol=TOLERANCIA_RELATIVA, atol=TOLERANCIA)
+
+
+@pytest.mark.parametrize('curva, limite, inclusivo', [
+    (curva, limite, inclusivo)
+    for curva, trechos in sorted(Main.CURVAS_HUFF.items())
+    for limite, inclusivo, _ in trechos[:-1]
+])
+def test_limite_do_trecho_usa_o_polinomio_correto(curva, limite, inclusivo):
+    """pb igual ao limite fica no primeiro trecho se inclusivo, senão no seguinte."""
+    trechos = Main.CURVAS_HUFF[curva]
+    indice = [t[0] for t in trechos].index(limite)
+    coeficientes = trechos[indice if inclusivo else indice + 1][2]
+    esperado = np.clip(np.polynomial.polynomial.polyval(limite, coeficientes), 0, 100)
+    assert Main.avaliar_curva_huff(limite, curva) == pytest.approx(esperado, abs=1e-12)
+    assert Main.avaliar_curva_huff(limite, curva) == pytest.approx(
+        pac_huff_escalar(limite, DURACAO_POR_CURVA[curva]), rel=TOLERANCIA_RELATIVA, abs=TOLERANCIA
+    )
+
+
+@pytest.mark.parametrize('curva', sorted(Main.CURVAS_HUFF))
+def test_extremos(curva):
+    assert Main.avaliar_curva_huff(0.0, curva) == 0.0
+    assert Main.avaliar_curva_huff(100.0, curva) == 100.0
+    np.testing.assert_array_equal(Main.avaliar_curva_huff([-1.0, 150.0], curva), [0.0, 100.0])
+
+
+@pytest.mark.parametrize('curva', sorted(Main.CURVAS_HUFF))
+def test_nan_permanece_nan(curva):
+    resultado = Main.avaliar_curva_huff(np.array([np.nan, 50.0]), curva)
+    assert np.isnan(resultado[0])
+    assert resultado[1] == pytest.approx(
+        pac_huff_escalar(50.0, DURACAO_POR_CURVA[curva]), rel=TOLERANCIA_RELATIVA, abs=TOLERANCIA
+    )
+
+
+def test_escalar_preserva_forma():
+    assert Main.avaliar_curva_huff(25.0, 'ate_6h').shape == ()
+    assert Main.avaliar_curva_huff(np.full((3, 4), 25.0), 'ate_6h').shape == (3, 4)
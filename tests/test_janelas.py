@@ -0,0 +1,76 @@
+"""
+Compara analisar_janelas_criticas (somas acumuladas, parada antecipada da
+janela crítica) com a busca direta em todas as janelas.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Main  # noqa: E402
+
+
+def maximos_diretos(chuvas: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Chuva máxima e primeiro passo inicial de cada janela w = 1..n, janela a janela."""
+    n, n_colunas = chuvas.shape
+    maximos = np.empty((n, n_colunas))
+    inicios = np.empty((n, n_colunas), dtype=int)
+    for w in range(1, n + 1):
+        for c in range(n_colunas):
+            somas = [chuvas[k:k + w, c].sum() for k in range(n)]
+            inicios[w - 1, c] = int(np.argmax(somas))
+            maximos[w - 1, c] = somas[inicios[w - 1, c]]
+    return maximos, inicios
+
+
+def _saida_huff(chuvas: np.ndarray, passo: float = 1) -> pd.DataFrame:
+    df = pd.DataFrame(chuvas, columns=[f'{tr},1h' for tr in range(2, 2 + chuvas.shape[1])])
+    df.insert(0, 'minuto', np.arange(1, len(chuvas) + 1) * passo)
+    return df
+
+
+@pytest.mark.parametrize('semente', range(40))
+def test_igual_a_busca_direta(semente):
+    rng = np.random.default_rng(semente)
+    n, n_colunas = rng.integers(1, 25), rng.integers(1, 5)
+    if semente % 4 == 0:
+        chuvas = rng.integers(0, 3, size=(n, n_colunas)).astype(float)  # empates
+    else:
+        chuvas = rng.gamma(0.5, size=(n, n_colunas))
+    fracao = rng.uniform(0.1, 1.0)
+    analise = Main.analisar_janelas_criticas(_saida_huff(chuvas, 5), fracao_critica=fracao)
+
+    maximos, inicios = maximos_diretos(chuvas)
+    for w in range(1, n + 1):
+        np.testing.assert_allclose(analise[f'max_{5 * w:g}min'], maximos[w - 1], atol=1e-9)
+    alvo = fracao * chuvas.sum(axis=0) - 1e-12
+    janela = np.array([np.flatnonzero(maximos[:, c] >= alvo[c])[0] + 1 for c in range(n_colunas)])
+    np.testing.assert_array_equal(analise['janela_critica_min'], janela * 5)
+    np.testing.assert_array_equal(
+        analise['inicio_janela_critica_min'], inicios[janela - 1, np.arange(n_colunas)] * 5
+    )
+
+
+def test_chuva_com_valores_negativos():
+    """Pequenas oscilações negativas: janelas parciais no fim também contam."""
+    rng = np.random.default_rng(7)
+    chuvas = rng.normal(size=(30, 3))
+    analise = Main.analisar_janelas_criticas(_saida_huff(chuvas))
+    maximos, _ = maximos_diretos(chuvas)
+    for w in range(1, 31):
+        np.testing.assert_allclose(analise[f'max_{w:g}min'], maximos[w - 1], atol=1e-9)
+
+
+def test_janelas_pedidas_e_nenhuma():
+    chuvas = np.random.default_rng(3).gamma(0.5, size=(60, 4))
+    completa = Main.analisar_janelas_criticas(_saida_huff(chuvas))
+    pedidas = Main.analisar_janelas_criticas(_saida_huff(chuvas), janelas_minutos=[10, 30, 500])
+    assert [c for c in pedidas.columns if c.startswith('max_')] == ['max_10min', 'max_30min', 'max_500min']
+    pd.testing.assert_series_equal(pedidas['max_30min'], completa['max_30min'])
+    pd.testing.assert_series_equal(pedidas['max_500min'], completa['max_60min'], check_names=False)
+    nenhuma = Main.analisar_janelas_criticas(_saida_huff(chuvas), janelas_minutos=[])
+    assert not any(c.startswith('max_') for c in nenhuma.columns)
+    pd.testing.assert_frame_equal(nenhuma, completa[nenhuma.columns])
@@ -0,0 +1,95 @@
+"""
+Serviço de consultas: as consultas rodam no pool de threads, então um GET é
+respondido enquanto um lote POST ainda está em execução.
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import urllib.request
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Main  # noqa: E402
+
+# Tempo máximo de espera por uma resposta (s)
+ESPERA = 10
+
+
+@pytest.fixture(scope='module')
+def servico():
+    """Serviço aquecido em uma porta livre, com o laço em outra thread."""
+    servico = Main.ServicoConsultas(trabalhadores=4)
+    laco = asyncio.new_event_loop()
+    servidor = laco.run_until_complete(servico.iniciar('127.0.0.1', 0))
+    servico.url = f"http://127.0.0.1:{servidor.sockets[0].getsockname()[1]}"
+    thread = threading.Thread(target=laco.run_forever, daemon=True)
+    thread.start()
+    yield servico
+    laco.call_soon_threadsafe(laco.stop)
+    thread.join(ESPERA)
+    servidor.close()
+    servico.executor.shutdown(wait=False)
+
+
+def _requisitar(url: str, corpo: list = None) -> dict:
+    dados = None if corpo is None else json.dumps(corpo).encode('utf-8')
+    with urllib.request.urlopen(url, data=dados, timeout=ESPERA) as resposta:
+        return json.loads(resposta.read())
+
+
+def test_get_respondido_durante_lote(servico, monkeypatch):
+    localizador = Main.obter_localizador()
+    consultar_lote = localizador.consultar_lote
+    iniciado, liberar = threading.Event(), threading.Event()
+
+    def lote_lento(lats, lons):
+        # Mantém o lote "em cálculo" dentro da consulta espacial
+        iniciado.set()
+        assert liberar.wait(ESPERA)
+        return consultar_lote(lats, lons)
+
+    monkeypatch.setattr(localizador, 'consultar_lote', lote_lento)
+    resposta_lote = {}
+    cliente_lote = threading.Thread(target=lambda: resposta_lote.update(_requisitar(
+        servico.url + '/isozona', [{'lat': -15.8, 'lon': -47.9}, {'lat': 0.0, 'lon': 0.0}]
+    )))
+    cliente_lote.start()
+    try:
+        assert iniciado.wait(ESPERA)
+        zona = _requisitar(servico.url + '/isozona?lat=-15.8&lon=-47.9')
+        huff = _requisitar(servico.url + '/huff?precipitacao=50&duracao=1')
+        idf = _requisitar(servico.url + '/idf?lat=-15.8&lon=-47.9')
+        assert not resposta_lote
+    finally:
+        liberar.set()
+        cliente_lote.join(ESPERA)
+
+    assert zona['zona'] == 'E'
+    assert len(huff['chuva_mm']) == 60
+    assert sum(huff['chuva_mm']) == pytest.approx(50)
+    assert idf['zona'] == 'E'
+    assert [r['zona'] for r in resposta_lote['resultados']] == ['E', None]
+
+
+def test_perfil_com_consultas_simultaneas(servico):
+    """Com o perfil ativo, cada thread do pool tem a sua pilha de etapas."""
+    Main.ativar_perfil()
+    try:
+        lotes = [[{'lat': -15.8 + i * 1e-3, 'lon': -47.9}] * 50 for i in range(16)]
+        clientes = [
+            threading.Thread(target=_requisitar, args=(servico.url + '/isozona', lote))
+            for lote in lotes
+        ]
+        for cliente in clientes:
+            cliente.start()
+        for cliente in clientes:
+            cliente.join(ESPERA)
+        etapa = Main.relatorio_perfil()['etapas']['consultar_isozonas_lote']
+        assert etapa['chamadas'] == len(lotes)
+        assert etapa['linhas'] == 50 * len(lotes)
+        assert Main._PERFIL['ativas'] == 0
+    finally:
+        Main.ativar_perfil(False)